@@ -40,6 +40,30 @@ parser.add_argument(
     help="Load smaller tables to use less memory...takes longer to run",
 )
 
+# lookup table caches
+parser.add_argument(
+    "--cache-mb", type=int, default=None, help="Memory budget in MB shared by all lookup table caches and preloads"
+)
+parser.add_argument("--table-cache-mb", type=int, default=None, help="Memory budget in MB for each lookup table cache")
+parser.add_argument(
+    "--cache-stats", default=False, action="store_true", help="Display hits/misses/seeks for the busiest lookup tables"
+)
+
+# parallel IDA search
+parser.add_argument(
+    "--ida-workers", type=int, default=1, help="Number of worker processes to split each C IDA search across"
+)
+parser.add_argument(
+    "--ida-root-split-depth",
+    type=int,
+    default=1,
+    help="Depth of the IDA tree whose nodes are split across the --ida-workers, 1 or 2",
+)
+
+# IDA search budgets
+parser.add_argument("--ida-max-nodes", type=int, default=None, help="Max nodes each C IDA search may explore")
+parser.add_argument("--ida-timeout-ms", type=int, default=None, help="Max milliseconds each C IDA search may run")
+
 action = parser.add_mutually_exclusive_group(required=False)
 parser.add_argument("--openwith", default=None, type=str, help="Colors for sides U, L, etc")
 parser.add_argument("--colormap", default=None, type=str, help="Colors for sides U, L, etc")
@@ -63,6 +87,27 @@ if "G" in args.state:
 if args.debug:
     logger.setLevel(logging.DEBUG)
 
+if args.cache_mb is not None or args.table_cache_mb is not None:
+    # rubiks cube libraries
+    from rubikscubennnsolver.LookupTableCache import set_cache_budget
+
+    set_cache_budget(
+        args.cache_mb * 1024 * 1024 if args.cache_mb is not None else None,
+        args.table_cache_mb * 1024 * 1024 if args.table_cache_mb is not None else None,
+    )
+
+if args.ida_workers > 1:
+    # rubiks cube libraries
+    from rubikscubennnsolver.LookupTableIDAViaGraph import set_ida_search_workers
+
+    set_ida_search_workers(args.ida_workers, args.ida_root_split_depth)
+
+if args.ida_max_nodes is not None or args.ida_timeout_ms is not None:
+    # rubiks cube libraries
+    from rubikscubennnsolver.LookupTableIDAViaGraph import set_ida_search_budget
+
+    set_ida_search_budget(args.ida_max_nodes, args.ida_timeout_ms)
+
 size = int(sqrt((len(args.state) / 6)))
 
 if size == 2:
@@ -123,6 +168,13 @@ else:
 
 cube.solve(solution333)
 end_time = dt.datetime.now()
+
+if args.cache_stats:
+    # rubiks cube libraries
+    from rubikscubennnsolver.LookupTableCache import log_cache_stats
+
+    log_cache_stats()
+
 cube.print_cube("Final Cube")
 cube.print_solution(not args.no_comments)
 
@@ -1,19 +1,30 @@
 # standard libraries
+import array
 import datetime as dt
 import hashlib
 import json
 import logging
+import mmap
 import os
 import resource
 import shutil
+import struct
 import subprocess
+import sys
+from operator import itemgetter
 from pathlib import Path
 from subprocess import call
-from typing import Dict, List, TextIO, Tuple
+from typing import TYPE_CHECKING, Dict, List, Tuple
 
 # rubiks cube libraries
+from rubikscubennnsolver.LookupTableCache import ENTRY_OVERHEAD, LookupTableCache, reserve_bytes
+from rubikscubennnsolver.misc import releases_checkpoints
 from rubikscubennnsolver.RubiksSide import SolveError
 
+if TYPE_CHECKING:
+    # third party libraries
+    import numpy
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,113 +36,76 @@ class NoIDASolution(Exception):
     pass
 
 
-class NoPruneTableState(Exception):
-    pass
-
-
-def find_first_last(
-    linecount: int, cache: Dict[int, str], b_state_to_find: str, state_width: int
-) -> Tuple[List[Tuple[int, str]], int, int]:
+class IDABudgetExhausted(NoIDASolution):
     """
-    Speed up a binary search by using a cache of what states we have seen where in the file. Use this
-    cache to return a narrowed down first and last line numbers to search.
-
-    Args:
-        linecount: the number of lines in the file
-        cache: a list of (offset, state) tuples in the file
-        b_state_to_find: binary form of the state to find
-
-    Returns:
-        an updated cache list
-        the first line number to search
-        the last line number to search
+    The IDA search ran out of its --max-nodes or --timeout-ms budget before it found a solution
     """
-    first = 0
-    last = linecount - 1
-    # logger.info("find_first_last for %s with cache\n%s" % (b_state_to_find, pformat(cache)))
-    offsets = sorted(cache.keys())
-
-    for offset in offsets:
-        line = cache[offset]
-        b_state = line[:state_width]
-
-        if b_state < b_state_to_find:
-            del cache[offset]
-            first = offset
-            # logger.info("state %s < b_state_to_find %s, to_delete %d, first %s" % (state, b_state_to_find, to_delete, first))
-
-        elif b_state == b_state_to_find:
-            first = offset
-            last = offset
-            # logger.info("state %s == b_state_to_find %s, to_delete %d, first %s, last %s" % (state, b_state_to_find, first, last))
-            break
 
-        else:
-            last = offset
-            # logger.info("state %s > b_state_to_find %s, last %s" % (state, b_state_to_find, last))
-            break
+    pass
 
-    # from pprint import pformat
-    # logger.info("find_first_last for %s, first %s, last %s, cache\n%s" % (b_state_to_find, first, last, pformat(cache)))
-    return (first, last)
+
+class NoPruneTableState(Exception):
+    pass
 
 
-def binary_search(fh: TextIO, width: int, state_width: int, linecount: int, state_to_find: str) -> str:
+def binary_search_list(states: List[str], b_state_to_find: str) -> Tuple[bool, int]:
     """
     Args:
-        fh: the file to search
-        width: the width of a line in the file
-        state_width: the width of the state portion of the line
-        linecount: the number of lines in the file
-        state_to_find: the state we are looking for
+        states: a list of strings to search
+        b_state_to_find: the state to look for
 
-    Returns:
-        the value for state_to_find
+    Returns
+        True if we found ``b_state_to_find``
+        the line number for ``b_state_to_find``
     """
     first = 0
+    linecount = len(states)
     last = linecount - 1
 
     while first <= last:
         midpoint = int((first + last) / 2)
-        fh.seek(midpoint * width)
-
-        line = fh.read(width)
-        (b_state, value) = line.rstrip().split(":")
+        b_state = bytearray(states[midpoint], encoding="utf-8")
 
-        if state_to_find < b_state:
+        if b_state_to_find < b_state:
             last = midpoint - 1
 
-        elif state_to_find == b_state:
-            return value
+        # If this is the line we are looking for, then read the entire line
+        elif b_state_to_find == b_state:
+            return (True, midpoint)
 
         else:
             first = midpoint + 1
 
-    return None
+    return (False, first)
 
 
-def binary_search_list(states: List[str], b_state_to_find: str) -> Tuple[bool, int]:
+def binary_search_buffer(
+    buf: bytes, width: int, state_width: int, first: int, last: int, b_state_to_find: bytes
+) -> Tuple[bool, int]:
     """
+    Binary search the fixed width rows of a lookup table that is in memory or mmapped. There are no
+    seeks, no reads and nothing is cached, each probe just compares a slice of ``buf``.
+
     Args:
-        states: a list of strings to search
-        b_state_to_find: the state to look for
+        buf: the contents of the lookup table, bytes or an mmap
+        width: the width of a line in the table
+        state_width: the width of the state portion of the line
+        first: the first line number to search
+        last: the last line number to search
+        b_state_to_find: binary form of the state to find
 
     Returns
         True if we found ``b_state_to_find``
-        the line number for ``b_state_to_find``
+        the line number for ``b_state_to_find``, if it was not found this is where it would be inserted
     """
-    first = 0
-    linecount = len(states)
-    last = linecount - 1
-
     while first <= last:
-        midpoint = int((first + last) / 2)
-        b_state = bytearray(states[midpoint], encoding="utf-8")
+        midpoint = (first + last) // 2
+        state_start = midpoint * width
+        b_state = buf[state_start : state_start + state_width]
 
         if b_state_to_find < b_state:
             last = midpoint - 1
 
-        # If this is the line we are looking for, then read the entire line
         elif b_state_to_find == b_state:
             return (True, midpoint)
 
@@ -141,73 +115,159 @@ def binary_search_list(states: List[str], b_state_to_find: str) -> Tuple[bool, i
     return (False, first)
 
 
-def binary_search_multiple(
-    fh: TextIO, width: int, state_width: int, linecount: int, states_to_find: List[str]
+def binary_search_multiple_buffer(
+    buf: bytes, width: int, state_width: int, linecount: int, states_to_find: List[str], fence: "FenceIndex" = None
 ) -> Dict[str, str]:
     """
     Args:
+        buf: the contents of the lookup table, bytes or an mmap
+        width: the width of a line in the table
+        state_width: the width of the state portion of the line
+        linecount: the number of lines in the table
         states_to_find: a list of states to search for
+        fence: an optional FenceIndex for ``buf``
 
     Returns:
         a dictionary where the state is the key and the value is a move sequence or move count
     """
-    states_to_find = sorted(states_to_find)
-    cache = {}
     results = {}
-    fh.seek(0)
-    line = fh.read(width)
-    cache[0] = line
-    b_state_first = line[:state_width]
-
-    fh.seek((linecount - 1) * width)
-    line = fh.read(width)
-    cache[linecount - 1] = line
-    b_state_last = line[:state_width]
-
-    for state_to_find in states_to_find:
-        b_state_to_find = bytearray(state_to_find, encoding="utf-8")
-
-        # This provides a pretty massive improvement when you are looking for 100k+ states
-        if b_state_to_find < b_state_first:
-            continue
-        elif b_state_to_find > b_state_last:
+    first = 0
+
+    # The states are sorted so each search can start where the previous one left off
+    for state_to_find in sorted(states_to_find):
+        b_state_to_find = bytes(state_to_find, encoding="utf-8")
+
+        if fence is not None:
+            (first, last) = fence.narrow(b_state_to_find, first)
+        else:
+            last = linecount - 1
+
+        (found, line_number) = binary_search_buffer(buf, width, state_width, first, last, b_state_to_find)
+        first = line_number
+
+        if found:
+            line_start = line_number * width
+            (_, value) = buf[line_start : line_start + width].decode("utf-8").rstrip().split(":")
+
+            if value.isdigit():
+                value = int(value)
+
+            results[state_to_find] = value
+
+        elif first >= linecount:
             break
 
-        (first, last) = find_first_last(linecount, cache, b_state_to_find, state_width)
+    return results
 
-        # logger.info("state_to_find %s, first %s, last %s, cache\n%s" % (state_to_find, first, last, pformat(cache)))
-        while first <= last:
-            midpoint = int((first + last) / 2)
 
-            if midpoint in cache:
-                line = cache[midpoint]
-            else:
-                fh.seek(midpoint * width)
+def mmap_file(filename: str) -> mmap.mmap:
+    """
+    Args:
+        filename: the file to mmap
+
+    Returns:
+        a read-only mmap of ``filename`` or None if the file is empty
+    """
+    with open(filename, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return None
 
-                line = fh.read(width)
+        # the mmap stays valid after fh is closed
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
 
-                # We did a read...reads are expensive...cache the read
-                cache[midpoint] = line
 
-            b_state = line[:state_width]
+# The trailer of a .fence file is the rows per fence, the key width, the linecount of the table and a magic number
+FENCE_INDEX_TRAILER = struct.Struct("<IHI4s")
+FENCE_INDEX_MAGIC = b"FNC1"
 
-            if b_state_to_find < b_state:
-                last = midpoint - 1
+# Tables smaller than this are binary searched without a fence index
+FENCE_INDEX_MIN_SIZE = 1024 * 1024
 
-            # If this is the line we are looking for, then read the entire line
-            elif b_state_to_find == b_state:
-                (_, value) = line.decode("utf-8").rstrip().split(":")
 
-                if value.isdigit():
-                    value = int(value)
+class FenceIndex(object):
+    """
+    A sparse index of a sorted table of fixed width rows, it holds the key of every Nth row where N rows
+    fit in one page.  The fence keys are binary searched in memory to narrow a search of the table to
+    the rows between two fences, so a lookup in the table touches a single page (two if the rows straddle
+    a page boundary).
 
-                results[state_to_find] = value
-                break
+    The fence keys are persisted to ``filename`` the first time they are built.
+    """
 
-            else:
-                first = midpoint + 1
+    def __init__(self, buf: bytes, width: int, key_width: int, linecount: int, filename: str):
+        self.key_width = key_width
+        self.linecount = linecount
+        self.rows_per_fence = max(1, mmap.PAGESIZE // width)
+        self.keys = None
+        self.fence_count = 0
 
-    return results
+        if buf is None or (linecount * width) < FENCE_INDEX_MIN_SIZE:
+            return
+
+        if os.path.exists(filename):
+            self.keys = self.load(filename)
+
+        if self.keys is None:
+            self.keys = b"".join(
+                buf[line_start : line_start + key_width]
+                for line_start in range(0, linecount * width, self.rows_per_fence * width)
+            )
+
+            try:
+                with open(filename + ".tmp", "wb") as fh:
+                    fh.write(self.keys)
+                    fh.write(FENCE_INDEX_TRAILER.pack(self.rows_per_fence, key_width, linecount, FENCE_INDEX_MAGIC))
+                os.rename(filename + ".tmp", filename)
+            except OSError as e:
+                logger.warning(f"failed to save fence index {filename}: {e}")
+
+        self.fence_count = len(self.keys) // key_width
+
+    def load(self, filename: str) -> bytes:
+        """
+        Returns:
+            the fence keys in ``filename`` or None if ``filename`` does not match our table
+        """
+        with open(filename, "rb") as fh:
+            data = fh.read()
+
+        if len(data) < FENCE_INDEX_TRAILER.size:
+            return None
+
+        trailer = FENCE_INDEX_TRAILER.unpack_from(data, len(data) - FENCE_INDEX_TRAILER.size)
+
+        if trailer != (self.rows_per_fence, self.key_width, self.linecount, FENCE_INDEX_MAGIC):
+            logger.warning(f"{filename} is stale, rebuilding it")
+            return None
+
+        return data[: -FENCE_INDEX_TRAILER.size]
+
+    def narrow(self, b_key: bytes, first: int = 0) -> Tuple[int, int]:
+        """
+        Args:
+            b_key: the key to search for
+            first: the first line number that ``b_key`` can be on
+
+        Returns:
+            the first and last line numbers to search for ``b_key``, last is less than first if
+            ``b_key`` sorts before the first row of the table
+        """
+        if self.keys is None:
+            return (first, self.linecount - 1)
+
+        (found, fence) = binary_search_buffer(
+            self.keys, self.key_width, self.key_width, first // self.rows_per_fence, self.fence_count - 1, b_key
+        )
+
+        if found:
+            line_number = fence * self.rows_per_fence
+            return (line_number, line_number)
+
+        # b_key is between fence - 1 and fence
+        return (
+            max(first, (fence - 1) * self.rows_per_fence),
+            min(fence * self.rows_per_fence, self.linecount) - 1,
+        )
 
 
 def get_file_vitals(filename: str) -> Tuple[int, int, int]:
@@ -232,6 +292,357 @@ def get_file_vitals(filename: str) -> Tuple[int, int, int]:
         return (width, state_width, linecount)
 
 
+def build_reverse_state_index(filename_state_index: str, filename_reverse_state_index: str) -> None:
+    """
+    Build the companion file for a ``.state_index`` file that maps a state_index back to the line
+    number in the ``.state_index`` file where that state lives. The file is an array of 4-byte
+    little endian line numbers, the Nth entry is the line number for state_index N.
+
+    Args:
+        filename_state_index: the ``.state_index`` file to read
+        filename_reverse_state_index: the file to write
+    """
+    (_, _, linecount) = get_file_vitals(filename_state_index)
+    line_numbers = array.array("I", bytes(4 * linecount))
+
+    with open(filename_state_index, "r") as fh:
+        for line_number, line in enumerate(fh):
+            state_index = int(line.rstrip().split(":")[1])
+            line_numbers[state_index] = line_number
+
+    if sys.byteorder == "big":
+        line_numbers.byteswap()
+
+    with open(filename_reverse_state_index + ".tmp", "wb") as fh:
+        line_numbers.tofile(fh)
+
+    os.rename(filename_reverse_state_index + ".tmp", filename_reverse_state_index)
+
+
+# The trailer of a .state_index_keys file is the state width, the number of states and a magic number
+STATE_INDEX_KEYS_TRAILER = struct.Struct("<II4s")
+STATE_INDEX_KEYS_MAGIC = b"SIK1"
+
+
+def build_state_index_keys(filename_state_index: str, filename_state_index_keys: str) -> None:
+    """
+    Convert a ``.state_index`` file to a ``.state_index_keys`` file.  The ``.state_index_keys`` file is
+    the sorted states back to back with no separators, followed by a 4-byte little endian state_index
+    for each state, followed by ``STATE_INDEX_KEYS_TRAILER``.
+
+    Args:
+        filename_state_index: the ``.state_index`` file to read
+        filename_state_index_keys: the file to write
+    """
+    (_, state_width, linecount) = get_file_vitals(filename_state_index)
+    state_indexes = array.array("I")
+    prev_state = None
+
+    with open(filename_state_index, "r") as fh_state_index:
+        with open(filename_state_index_keys + ".tmp", "wb") as fh:
+            for line in fh_state_index:
+                (state, state_index) = line.rstrip().split(":")
+                assert len(state) == state_width, f"{filename_state_index} state {state} is not {state_width} wide"
+
+                if prev_state is not None and state <= prev_state:
+                    raise Exception(f"{filename_state_index} is not sorted, {state} follows {prev_state}")
+
+                fh.write(state.encode("utf-8"))
+                state_indexes.append(int(state_index))
+                prev_state = state
+
+            assert len(state_indexes) == linecount
+
+            if sys.byteorder == "big":
+                state_indexes.byteswap()
+
+            state_indexes.tofile(fh)
+            fh.write(STATE_INDEX_KEYS_TRAILER.pack(state_width, linecount, STATE_INDEX_KEYS_MAGIC))
+
+    os.rename(filename_state_index_keys + ".tmp", filename_state_index_keys)
+
+
+class StateIndexKeys(object):
+    """
+    A read-only state to state_index map backed by an mmapped ``.state_index_keys`` file, see
+    ``build_state_index_keys()``.  Lookups binary search the mmap, nothing is loaded into python objects.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.mm = mmap_file(filename)
+        (self.state_width, self.linecount, magic) = STATE_INDEX_KEYS_TRAILER.unpack_from(
+            self.mm, len(self.mm) - STATE_INDEX_KEYS_TRAILER.size
+        )
+        assert magic == STATE_INDEX_KEYS_MAGIC, f"{filename} is not a .state_index_keys file"
+        self.state_indexes_start = self.state_width * self.linecount
+        self.fence = FenceIndex(self.mm, self.state_width, self.state_width, self.linecount, filename + ".fence")
+
+    def __len__(self) -> int:
+        return self.linecount
+
+    def _state_index(self, line_number: int) -> int:
+        return struct.unpack_from("<I", self.mm, self.state_indexes_start + (line_number * 4))[0]
+
+    def get(self, state: str) -> int:
+        """
+        Args:
+            state: the state to search for
+
+        Returns:
+            the state_index for ``state`` or None if it is not found
+        """
+        b_state = bytes(state, encoding="utf-8")
+        (first, last) = self.fence.narrow(b_state)
+        (found, line_number) = binary_search_buffer(self.mm, self.state_width, self.state_width, first, last, b_state)
+
+        if found:
+            return self._state_index(line_number)
+
+        return None
+
+    def get_multiple(self, states: List[str]) -> List[int]:
+        """
+        Args:
+            states: a list of states to search for
+
+        Returns:
+            a list of the state_index for each entry in ``states``, None for states that are not found
+        """
+        results = [None] * len(states)
+        first = 0
+
+        # Search in sorted order so each search can start where the previous one left off
+        for index in sorted(range(len(states)), key=states.__getitem__):
+            b_state = bytes(states[index], encoding="utf-8")
+            (first, last) = self.fence.narrow(b_state, first)
+            (found, line_number) = binary_search_buffer(
+                self.mm, self.state_width, self.state_width, first, last, b_state
+            )
+            first = line_number
+
+            if found:
+                results[index] = self._state_index(line_number)
+
+        return results
+
+
+# The trailer of a .packed lookup table is the linecount, state width, key width, value width, max_depth,
+# whether the keys are packed hex, whether the values are costs, the length of the move names and a magic number.
+# The move names (space separated) sit just before the trailer.
+PACKED_TABLE_TRAILER = struct.Struct("<IHHHBBBH4s")
+PACKED_TABLE_MAGIC = b"LTP1"
+HEX_DIGITS = "0123456789abcdef"
+
+
+def convert_lookup_table(filename: str, filename_packed: str) -> None:
+    """
+    Convert a lookup-table .txt file to the .packed format.  Each row of a .packed file is a key
+    followed by a value.
+
+    The key is the state packed two hex digits per byte if every state is lowercase hex, else the
+    state itself.  Both keep the sort order of the .txt file so the rows can be binary searched.
+
+    The value is a cost byte if the .txt file stores costs (see ``use_isdigit``), else one byte per
+    move where each byte is an index (starting at 1) into the list of move names, padded with 0s.
+
+    Args:
+        filename: the lookup-table .txt file to read
+        filename_packed: the .packed file to write
+    """
+    (_, state_width, linecount) = get_file_vitals(filename)
+    hex_keys = True
+    use_isdigit = None
+    moves = set()
+    max_depth = 0
+    value_width = 1
+
+    # pass 1, find the key and value formats
+    with open(filename, "r") as fh:
+        for line in fh:
+            (state, steps) = line.rstrip().split(":")
+
+            if hex_keys and state.strip(HEX_DIGITS):
+                hex_keys = False
+
+            if use_isdigit is None:
+                use_isdigit = steps.isdigit()
+
+            if use_isdigit:
+                max_depth = max(max_depth, int(steps))
+            else:
+                steps = steps.split()
+                moves.update(steps)
+                max_depth = max(max_depth, len(steps))
+                value_width = max(value_width, len(steps))
+
+    moves = sorted(moves)
+    move_codes = {move: code for code, move in enumerate(moves, 1)}
+    moves_blob = " ".join(moves).encode("utf-8")
+    assert len(moves) < 256, f"{filename} has {len(moves)} moves, only 255 are supported"
+    assert max_depth < 256, f"{filename} max_depth {max_depth} does not fit in a byte"
+    key_width = (state_width + 1) // 2 if hex_keys else state_width
+    padding = "0" if state_width % 2 else ""
+    prev_key = None
+
+    # pass 2, write the rows
+    with open(filename, "r") as fh:
+        with open(filename_packed + ".tmp", "wb") as fh_packed:
+            for line in fh:
+                (state, steps) = line.rstrip().split(":")
+                key = bytes.fromhex(padding + state) if hex_keys else state.encode("utf-8")
+
+                if prev_key is not None and key <= prev_key:
+                    raise Exception(f"{filename} is not sorted, {state} is out of order")
+
+                if use_isdigit:
+                    value = bytes((int(steps),))
+                else:
+                    value = bytes(move_codes[step] for step in steps.split()).ljust(value_width, b"\x00")
+
+                fh_packed.write(key)
+                fh_packed.write(value)
+                prev_key = key
+
+            fh_packed.write(moves_blob)
+            fh_packed.write(
+                PACKED_TABLE_TRAILER.pack(
+                    linecount,
+                    state_width,
+                    key_width,
+                    value_width,
+                    max_depth,
+                    hex_keys,
+                    use_isdigit,
+                    len(moves_blob),
+                    PACKED_TABLE_MAGIC,
+                )
+            )
+
+    os.rename(filename_packed + ".tmp", filename_packed)
+
+
+class PackedLookupTable(object):
+    """
+    A read-only, mmapped lookup table in the .packed format, see ``convert_lookup_table()``
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.mm = mmap_file(filename)
+        trailer_start = len(self.mm) - PACKED_TABLE_TRAILER.size
+        (
+            self.linecount,
+            self.state_width,
+            self.key_width,
+            self.value_width,
+            self.max_depth,
+            self.hex_keys,
+            self.use_isdigit,
+            moves_length,
+            magic,
+        ) = PACKED_TABLE_TRAILER.unpack_from(self.mm, trailer_start)
+        assert magic == PACKED_TABLE_MAGIC, f"{filename} is not a .packed lookup table"
+        self.moves = self.mm[trailer_start - moves_length : trailer_start].decode("utf-8").split()
+        self.width = self.key_width + self.value_width
+
+        # the width of a row of the .txt file this was converted from, each value byte is either the cost
+        # or one move plus the space after it
+        if self.use_isdigit:
+            self.txt_width = self.state_width + len(f":{self.max_depth}\n")
+        else:
+            self.txt_width = (
+                self.state_width + 2 + (self.value_width * (max([len(x) for x in self.moves], default=1) + 1))
+            )
+
+        self.padding = "0" if self.hex_keys and self.state_width % 2 else ""
+        self.fence = FenceIndex(self.mm, self.width, self.key_width, self.linecount, filename + ".fence")
+
+    def encode_state(self, state: str) -> bytes:
+        """
+        Returns:
+            the key for ``state`` or None if ``state`` can not be in this table
+        """
+        if len(state) != self.state_width:
+            return None
+
+        if self.hex_keys:
+            if state.strip(HEX_DIGITS):
+                return None
+            return bytes.fromhex(self.padding + state)
+
+        return state.encode("utf-8")
+
+    def decode_key(self, key: bytes) -> str:
+        if self.hex_keys:
+            return key.hex()[len(self.padding) :]
+        return key.decode("utf-8")
+
+    def decode_value(self, value: bytes) -> str:
+        if self.use_isdigit:
+            return str(value[0])
+        return " ".join([self.moves[code - 1] for code in value if code])
+
+    def value(self, state: str) -> bytes:
+        """
+        Returns:
+            the raw value for ``state`` or None if it is not found
+        """
+        key = self.encode_state(state)
+
+        if key is None:
+            return None
+
+        (first, last) = self.fence.narrow(key)
+        (found, line_number) = binary_search_buffer(self.mm, self.width, self.key_width, first, last, key)
+
+        if found:
+            value_start = (line_number * self.width) + self.key_width
+            return self.mm[value_start : value_start + self.value_width]
+
+        return None
+
+    def steps(self, state: str) -> List[str]:
+        """
+        Returns:
+            the steps for ``state`` (a list with the cost for ``use_isdigit`` tables) or None if it is not found
+        """
+        value = self.value(state)
+
+        if value is None:
+            return None
+
+        if self.use_isdigit:
+            return [str(value[0])]
+
+        return [self.moves[code - 1] for code in value if code]
+
+    def cost(self, state: str) -> int:
+        """
+        Returns:
+            the cost for ``state`` or None if it is not found
+        """
+        value = self.value(state)
+
+        if value is None:
+            return None
+
+        if self.use_isdigit:
+            return value[0]
+
+        return self.value_width - value.count(0)
+
+    def lines(self):
+        """
+        Yields:
+            a (state, steps) tuple for each row, steps is formatted as it is in the .txt file
+        """
+        for line_start in range(0, self.linecount * self.width, self.width):
+            key = self.mm[line_start : line_start + self.key_width]
+            value = self.mm[line_start + self.key_width : line_start + self.width]
+            yield (self.decode_key(key), self.decode_value(value))
+
+
 def steps_cancel_out(prev_step: str, step: str) -> bool:
     """
     >>> steps_cancel_out(None, "U")
@@ -440,11 +851,70 @@ def download_file_if_needed(filename: str) -> None:
         call(["gunzip", filename_gz])
 
 
+def get_swaps(size: int) -> Dict[str, List[int]]:
+    """
+    Args:
+        size: the size of the cube
+
+    Returns:
+        the swaps for each move of a ``size`` cube, applying a move sets square ``i`` to the value of
+        square ``swaps[step][i]``
+    """
+    # rubiks cube libraries
+    from rubikscubennnsolver.swaps import swaps_222, swaps_333, swaps_444, swaps_555, swaps_666, swaps_777
+    from rubikscubennnsolver.swaps_nnn import get_swaps_nnn
+
+    swaps = {2: swaps_222, 3: swaps_333, 4: swaps_444, 5: swaps_555, 6: swaps_666, 7: swaps_777}.get(size)
+
+    # swaps.py stops at 7x7x7, build (or load) the swaps for anything bigger
+    if swaps is None:
+        swaps = get_swaps_nnn(size)
+
+    return swaps
+
+
+def project_swaps(positions: Tuple[int], swaps: List[int]) -> Tuple[int]:
+    """
+    Project the swaps of a move onto a lookup table state that is made of ``positions``
+
+    >>> project_swaps((2, 4), [0, 1, 4, 3, 2])
+    (1, 0)
+
+    Args:
+        positions: the squares of the cube that make up the lookup table state, in order
+        swaps: the swaps for a move, see get_swaps()
+
+    Returns:
+        the move as swaps of the lookup table state, applying it sets character ``i`` of the state to
+        character ``result[i]``
+
+    Raises:
+        ValueError: the move brings in a square that is not one of ``positions``
+    """
+    state_index = {position: index for (index, position) in enumerate(positions)}
+    result = []
+
+    for position in positions:
+        source = swaps[position]
+
+        if source not in state_index:
+            raise ValueError(f"square {source} moves to square {position} but it is not one of the positions")
+
+        result.append(state_index[source])
+
+    return tuple(result)
+
+
 class LookupTable(object):
     """
     A base class for all lookup table classes
     """
 
+    # The squares of the parent that state() reads, in order, if each character of state() depends only on
+    # the value of one of these squares. A move then permutes the state the same way it permutes these
+    # squares so projected_move() can apply a move to a state without the parent.
+    state_positions = None
+
     def __init__(
         self,
         parent,
@@ -459,6 +929,7 @@ class LookupTable(object):
         build_state_index: bool = False,
     ):
         self.parent = parent
+        self.projected_moves = {}
         self.sides_all = (
             self.parent.sideU,
             self.parent.sideL,
@@ -474,11 +945,17 @@ class LookupTable(object):
             self.filename = LOOKUP_TABLES + filename
             self.filename_bin = self.filename.replace(".txt", ".bin")
             self.filename_state_index = self.filename.replace(".txt", ".state_index")
+            self.filename_reverse_state_index = self.filename.replace(".txt", ".reverse_state_index")
+            self.filename_state_index_keys = self.filename.replace(".txt", ".state_index_keys")
+            self.filename_packed = self.filename.replace(".txt", ".packed")
             self.filename_gz = filename + ".gz" if filename else None
         else:
             self.filename = None
             self.filename_bin = None
             self.filename_state_index = None
+            self.filename_reverse_state_index = None
+            self.filename_state_index_keys = None
+            self.filename_packed = None
             self.filename_gz = None
 
         self.desc = filename.replace("lookup-table-", "").replace(".txt", "") if filename else ""
@@ -490,16 +967,23 @@ class LookupTable(object):
         self.preloaded_cache_set = False
         self.preloaded_cache_string = False
         self.fh_txt_seek_calls = 0
-        self.fh_txt_cache = {}
         self.cache = {}
         self.cache_set = set()
-        self.cache_list = []
+        self.steps_cache = LookupTableCache(self, "steps")
         self.use_isdigit = False
         self.only_colors = ()
         self.printed_disk_io_warning = False
         self.ida_graph = {}
+        self.ida_graph_rows = None
         self.ida_graph_node = None
-        self.state_index_cache = {}
+        self.state_index_cache = LookupTableCache(self, "state_index")
+        self.mm_state_index = None
+        self.state_index_keys = None
+        self.packed = None
+        self.fence_txt = None
+        self.reverse_state_index_line_numbers = None
+        self.state_index_width = 0
+        self.state_index_state_width = 0
         self.width = 0
         self.state_width = 0
 
@@ -542,10 +1026,19 @@ class LookupTable(object):
                     download_file_if_needed(self.filename_state_index)
                 self.state_width = len(list(self.state_target)[0])
 
+            elif os.path.exists(self.filename_packed):
+                self.packed = PackedLookupTable(self.filename_packed)
+                self.state_width = self.packed.state_width
+                self.width = self.packed.txt_width
+                self.use_isdigit = bool(self.packed.use_isdigit)
+
+                if self.max_depth is None:
+                    self.max_depth = self.packed.max_depth
+
             else:
                 download_file_if_needed(self.filename)
 
-            if "perfect-hash" not in self.filename and os.path.exists(self.filename):
+            if self.packed is None and "perfect-hash" not in self.filename and os.path.exists(self.filename):
                 # Find the state_width for the entries in our .txt file
                 with open(self.filename, "r") as fh:
                     first_line = next(fh)
@@ -560,11 +1053,12 @@ class LookupTable(object):
         self.hex_format = "%" + "0%dx" % self.state_width
         self.filename_exists = True
 
-        # 'rb' mode is about 3x faster than 'r' mode
-        if self.filename and os.path.exists(self.filename):
-            self.fh_txt = open(self.filename, mode="rb")
+        # The rows are fixed width so we binary search the mmapped file directly, the OS page
+        # cache decides how much of the table is resident.
+        if self.packed is None and self.filename and os.path.exists(self.filename):
+            self.mm_txt = mmap_file(self.filename)
         else:
-            self.fh_txt = None
+            self.mm_txt = None
 
         COST_LENGTH = 1
         STATE_INDEX_LENGTH = 4
@@ -575,6 +1069,109 @@ class LookupTable(object):
             return self.desc
         return self.__class__.__name__
 
+    def lookup_many(self, states: List[str]) -> Tuple["numpy.ndarray", "numpy.ndarray", "numpy.ndarray"]:
+        """
+        Look up all of ``states`` with one vectorized ``numpy.searchsorted`` over the mmapped column of
+        states in our .txt or .packed file, or in our .state_index_keys file for tables that only have a .bin.
+        numpy is only required if you call this method.
+
+        Args:
+            states: the states to search for
+
+        Returns:
+            ``states`` as a fixed width bytes array
+            the cost (an int array) for ``use_isdigit`` tables and tables without a .txt file, -1 for states
+            that are not found.  For all other tables the steps (a str array), "" for states that are not found.
+            the state_index (the line number for tables without a .state_index) for each state, -1 for states
+            that are not found
+        """
+        # third party libraries
+        import numpy as np
+
+        b_states = np.array(states, dtype=np.bytes_)
+
+        if self.packed is not None:
+            packed = self.packed
+            keys_to_find = [packed.encode_state(state) for state in states]
+            valid = np.array([key is not None for key in keys_to_find], dtype=bool)
+            b_keys = np.array([key or b"" for key in keys_to_find], dtype=f"S{packed.key_width}")
+            keys = np.ndarray(
+                (packed.linecount,), dtype=f"S{packed.key_width}", buffer=packed.mm, strides=(packed.width,)
+            )
+            line_numbers = np.minimum(np.searchsorted(keys, b_keys), packed.linecount - 1)
+            found = valid & (keys[line_numbers] == b_keys)
+            state_indexes = np.where(found, line_numbers, -1)
+            values = np.ndarray(
+                (packed.linecount, packed.value_width),
+                dtype=np.uint8,
+                buffer=packed.mm,
+                offset=packed.key_width,
+                strides=(packed.width, 1),
+            )[line_numbers]
+
+            if self.use_isdigit:
+                costs = np.where(found, values[:, 0].astype(np.int64), -1)
+                return (b_states, costs, state_indexes)
+
+            steps = np.array(
+                [packed.decode_value(value.tobytes()) if is_found else "" for value, is_found in zip(values, found)],
+                dtype=np.str_,
+            )
+            return (b_states, steps, state_indexes)
+
+        # np.bytes_ arrays are null padded, a state of the wrong width can never match
+        valid = np.char.str_len(b_states) == self.state_width
+
+        if self.mm_txt is not None:
+            keys = np.ndarray(
+                (self.linecount,), dtype=f"S{self.state_width}", buffer=self.mm_txt, strides=(self.width,)
+            )
+        else:
+            if self.state_index_keys is None:
+                self.load_state_index_keys()
+
+            keys = np.frombuffer(
+                self.state_index_keys.mm, dtype=f"S{self.state_width}", count=self.state_index_keys.linecount
+            )
+
+        line_numbers = np.minimum(np.searchsorted(keys, b_states), len(keys) - 1)
+        found = valid & (keys[line_numbers] == b_states)
+
+        if self.mm_txt is not None:
+            state_indexes = np.where(found, line_numbers, -1)
+
+            # the value portion of each line, the trailing newline and padding are stripped below
+            values = np.ndarray(
+                (self.linecount,),
+                dtype=f"S{self.width - self.state_width - 1}",
+                buffer=self.mm_txt,
+                offset=self.state_width + 1,
+                strides=(self.width,),
+            )[line_numbers]
+
+            if self.use_isdigit:
+                costs = np.where(found, values.astype(np.int64), -1)
+                return (b_states, costs, state_indexes)
+
+            steps = np.where(found, np.char.decode(np.char.strip(values), "utf-8"), "")
+            return (b_states, steps, state_indexes)
+
+        else:
+            all_state_indexes = np.frombuffer(
+                self.state_index_keys.mm,
+                dtype="<u4",
+                count=self.state_index_keys.linecount,
+                offset=self.state_index_keys.state_indexes_start,
+            )
+            state_indexes = np.where(found, all_state_indexes[line_numbers].astype(np.int64), -1)
+
+            if not self.ida_graph:
+                self.load_ida_graph()
+
+            all_costs = np.frombuffer(self.ida_graph, dtype=np.uint8)
+            costs = np.where(found, all_costs[np.maximum(state_indexes, 0) * self.ROW_LENGTH].astype(np.int64), -1)
+            return (b_states, costs, state_indexes)
+
     def binary_search_multiple(self, states_to_find: List[str]) -> Dict[str, str]:
         """
         Args:
@@ -583,7 +1180,21 @@ class LookupTable(object):
         Returns:
             a dictionary where the state is the key and the value is a move sequence or move count
         """
-        return binary_search_multiple(self.fh_txt, self.width, self.state_width, self.linecount, states_to_find)
+        return binary_search_multiple_buffer(
+            self.mm_txt, self.width, self.state_width, self.linecount, states_to_find, self.get_fence_txt()
+        )
+
+    def get_fence_txt(self) -> FenceIndex:
+        """
+        Returns:
+            the FenceIndex for our .txt file, it is loaded (or built) on first use
+        """
+        if self.fence_txt is None:
+            self.fence_txt = FenceIndex(
+                self.mm_txt, self.width, self.state_width, self.linecount, self.filename + ".fence"
+            )
+
+        return self.fence_txt
 
     def binary_search(self, state_to_find: str) -> str:
         """
@@ -593,33 +1204,25 @@ class LookupTable(object):
         Returns:
             a move sequence or move count
         """
-        state_to_find = bytes(state_to_find, encoding="utf-8")
-        (first, last) = find_first_last(self.linecount, self.fh_txt_cache, state_to_find, self.state_width)
-
-        while first <= last:
-            midpoint = int((first + last) / 2)
-
-            if midpoint in self.fh_txt_cache:
-                line = self.fh_txt_cache[midpoint]
-            else:
-                self.fh_txt.seek(midpoint * self.width)
-                self.fh_txt_seek_calls += 1
-                line = self.fh_txt.read(self.width)
+        self.fh_txt_seek_calls += 1
 
-                # We did a read...reads are expensive...cache the read
-                self.fh_txt_cache[midpoint] = line
+        if self.packed is not None:
+            value = self.packed.value(state_to_find)
 
-            b_state = line[: self.state_width]
+            if value is None:
+                return None
 
-            if state_to_find < b_state:
-                last = midpoint - 1
+            return f"{state_to_find}:{self.packed.decode_value(value)}"
 
-            # If this is the line we are looking for, then read the entire line
-            elif state_to_find == b_state:
-                return line.decode("utf-8").rstrip()
+        b_state_to_find = bytes(state_to_find, encoding="utf-8")
+        (first, last) = self.get_fence_txt().narrow(b_state_to_find)
+        (found, line_number) = binary_search_buffer(
+            self.mm_txt, self.width, self.state_width, first, last, b_state_to_find
+        )
 
-            else:
-                first = midpoint + 1
+        if found:
+            line_start = line_number * self.width
+            return self.mm_txt[line_start : line_start + self.width].decode("utf-8").rstrip()
 
         return None
 
@@ -631,30 +1234,18 @@ class LookupTable(object):
         Returns:
             a move sequence or move count
         """
-        first = 0
-        last = self.linecount - 1
-
-        state_to_find = bytes(state_to_find, encoding="utf-8")
-
-        while first <= last:
-            midpoint = int((first + last) / 2)
-
-            # Only read the 'state' part of the line (for speed)
-            state_start = midpoint * self.width
-            state_end = state_start + self.state_width
-            state = self.cache_string[state_start:state_end]
-
-            if state_to_find < state:
-                last = midpoint - 1
-
-            # If this is the line we are looking for, then read the entire line
-            elif state_to_find == state:
-                line_end = state_start + self.width
-                line = self.cache_string[state_start:line_end]
-                return line.decode("utf-8").rstrip()
+        (found, line_number) = binary_search_buffer(
+            self.cache_string,
+            self.width,
+            self.state_width,
+            0,
+            self.linecount - 1,
+            bytes(state_to_find, encoding="utf-8"),
+        )
 
-            else:
-                first = midpoint + 1
+        if found:
+            line_start = line_number * self.width
+            return self.cache_string[line_start : line_start + self.width].decode("utf-8").rstrip()
 
         return None
 
@@ -663,10 +1254,16 @@ class LookupTable(object):
         Load a lookup table into a dictionary
         """
         # logger.info("%s: begin preload cache dict" % self)
+        if not reserve_bytes(self, self.linecount * (self.width + (2 * sys.getsizeof("")) + ENTRY_OVERHEAD)):
+            return
+
         memory_pre = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
 
         if "dummy" in self.filename:
             self.cache = {}
+        elif self.packed is not None:
+            for state, steps in self.packed.lines():
+                self.cache[state] = steps
         else:
             # Another option here would be to store a list of (state, step) tuples and
             # then binary search through it. That takes about 1/6 the amount of memory
@@ -690,11 +1287,16 @@ class LookupTable(object):
         Load a lookup table into a set
         """
         # logger.info("%s: begin preload cache set" % self)
+        if not reserve_bytes(self, self.linecount * (self.state_width + sys.getsizeof("") + ENTRY_OVERHEAD)):
+            return
+
         memory_pre = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
         states = []
 
         if "dummy" in self.filename:
             pass
+        elif self.packed is not None:
+            states = [state for (state, _) in self.packed.lines()]
         else:
             # Another option here would be to store a list of (state, step) tuples and
             # then binary search through it. That takes about 1/6 the amount of memory
@@ -716,6 +1318,13 @@ class LookupTable(object):
         Load a lookup table into a string
         """
         # logger.info("%s: begin preload cache string" % self)
+        if self.packed is not None:
+            logger.info(f"{self}: is a .packed table, it is searched via mmap instead of preloading a cache string")
+            return
+
+        if not reserve_bytes(self, self.linecount * self.width):
+            return
+
         memory_pre = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
         self.cache_string = None
 
@@ -754,6 +1363,24 @@ class LookupTable(object):
             else:
                 return None
 
+        # A .packed table decodes the move codes for state_to_find, there is no line of text to split
+        elif self.packed is not None:
+            if self.preloaded_cache_set and state_to_find not in self.cache_set:
+                return None
+
+            steps = self.steps_cache.get(state_to_find)
+
+            if steps is None:
+                steps = self.packed.steps(state_to_find)
+
+                if steps is None:
+                    return None
+
+                steps = tuple(steps)
+                self.steps_cache.put(state_to_find, steps)
+
+            return list(steps)
+
         elif self.preloaded_cache_set:
             if state_to_find in self.cache_set:
                 # Binary search the file to get the value
@@ -776,12 +1403,17 @@ class LookupTable(object):
                 logger.info(f"{self}: is binary searching the disk")
                 self.printed_disk_io_warning = True
 
+            steps = self.steps_cache.get(state_to_find)
+
+            if steps is not None:
+                return steps.split()
+
             line = self.binary_search(state_to_find)
 
             if line:
                 (state, steps) = line.strip().split(":")
-                steps_list = steps.split()
-                return steps_list
+                self.steps_cache.put(state_to_find, steps)
+                return steps.split()
 
         return None
 
@@ -793,6 +1425,13 @@ class LookupTable(object):
         Returns:
             the number of steps to solve ``state_to_find``
         """
+        if self.packed is not None and not self.preloaded_cache_dict and not self.preloaded_cache_set:
+            if state_to_find in self.state_target:
+                return 0
+
+            cost = self.packed.cost(state_to_find)
+            return cost if cost is not None else 0
+
         steps = self.steps(state_to_find)
 
         if steps is None:
@@ -878,6 +1517,27 @@ class LookupTable(object):
     def state(self):
         raise Exception(f"{self} must implement state()")
 
+    def projected_move(self, state: str, step: str) -> str:
+        """
+        Args:
+            state: a state of this lookup table
+            step: the move to apply
+
+        Returns:
+            the state after applying ``step``, this is what state() would return if we applied ``step``
+            to a parent in ``state``
+        """
+        permutation = self.projected_moves.get(step)
+
+        if permutation is None:
+            if self.state_positions is None:
+                raise Exception(f"{self} does not have state_positions")
+
+            permutation = itemgetter(*project_swaps(self.state_positions, get_swaps(self.parent.size)[step]))
+            self.projected_moves[step] = permutation
+
+        return "".join(permutation(state))
+
     def build_ida_graph(self) -> None:
         """
         Build a JSON file that contains all of the nodes in our graph and their transitions to other nodes
@@ -896,31 +1556,48 @@ class LookupTable(object):
                 fh.write("%s:%d\n" % (state, index))
 
         subprocess.call(["./utils/pad-lines.py", self.filename_state_index])
+        build_reverse_state_index(self.filename_state_index, self.filename_reverse_state_index)
+        build_state_index_keys(self.filename_state_index, self.filename_state_index_keys)
         logger.info(f"{self}: state_index end")
 
         logger.info(f"{self}: json begin")
         index = 0
 
+        # If every legal move keeps our state_positions among themselves we can move from state to state
+        # without populating the cube
+        use_projected_moves = self.state_positions is not None
+
+        if use_projected_moves:
+            try:
+                for step in legal_moves:
+                    self.projected_move("." * len(self.state_positions), step)
+            except ValueError:
+                use_projected_moves = False
+
         for state, steps in self.cache.items():
             len_steps = len(steps.split())
 
             if state in self.state_target:
                 len_steps = 0
 
-            parent.nuke_edges()
-            parent.nuke_corners()
-            parent.nuke_centers()
-            self.populate_cube_from_state(state, parent.state, steps)
-
             ida_graph[state] = {"cost": len_steps, "edges": {}}
 
-            baseline_state = parent.state[:]
+            if use_projected_moves:
+                for step in legal_moves:
+                    ida_graph[state]["edges"][step] = self.projected_move(state, step)
 
-            for step in legal_moves:
-                parent.rotate(step)
-                state_for_step = self.state()
-                ida_graph[state]["edges"][step] = state_for_step
-                parent.state = baseline_state[:]
+            else:
+                parent.nuke_edges()
+                parent.nuke_corners()
+                parent.nuke_centers()
+                self.populate_cube_from_state(state, parent.state, steps)
+                baseline_state = parent.state[:]
+
+                for step in legal_moves:
+                    parent.rotate(step)
+                    state_for_step = self.state()
+                    ida_graph[state]["edges"][step] = state_for_step
+                    parent.state = baseline_state[:]
 
             index += 1
 
@@ -943,22 +1620,38 @@ class LookupTable(object):
     def load_ida_graph(self) -> None:
         """
         Load our IDA graph into memory
+
+        The graph is mmapped so it shares the page cache with the C search engine and any other
+        solver process that has the same table loaded.  ACCESS_COPY (vs ACCESS_READ) is used so
+        that ctypes can hand the buffer to ida_search_via_graph.so, we never write to it.
         """
         with open(self.filename_bin, "rb") as fh:
             logger.info(f"{self}: load IDA graph begin")
-            self.ida_graph = fh.read()
+            self.ida_graph = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_COPY)
             logger.info(f"{self}: load IDA graph end")
 
     def load_state_index_cache(self) -> None:
         """
         Load our state index cached into memory
         """
-        self.state_index_cache = {}
+        self.state_index_cache.clear()
 
         with open(self.filename_state_index, "r") as fh:
             for line in fh:
                 (state, state_index) = line.rstrip().split(":")
-                self.state_index_cache[state] = int(state_index)
+                self.state_index_cache.put(state, int(state_index))
+
+    def load_state_index_keys(self) -> None:
+        """
+        mmap our ``.state_index_keys`` file, it is built from our ``.state_index`` file if it does not
+        exist.  utils/build-state-index-keys.py can be used to build them ahead of time.
+        """
+        if not os.path.exists(self.filename_state_index_keys):
+            logger.info(f"{self}: build {self.filename_state_index_keys} begin")
+            build_state_index_keys(self.filename_state_index, self.filename_state_index_keys)
+            logger.info(f"{self}: build {self.filename_state_index_keys} end")
+
+        self.state_index_keys = StateIndexKeys(self.filename_state_index_keys)
 
     def state_index(self, state: str = None) -> int:
         """
@@ -968,31 +1661,43 @@ class LookupTable(object):
         if state is None:
             state = self.state()
 
-        if state in self.state_index_cache:
-            return self.state_index_cache[state]
+        state_index = self.state_index_cache.get(state)
 
-        (width, state_width, linecount) = get_file_vitals(self.filename_state_index)
+        if state_index is not None:
+            return state_index
 
-        with open(self.filename_state_index, "r") as fh:
-            state_index = binary_search(fh, width, state_width, linecount, state)
+        if self.state_index_keys is None:
+            self.load_state_index_keys()
 
-            if state_index is None:
-                self.parent.enable_print_cube = True
-                desc = f"state {state} not found in {self.filename_state_index}"
-                self.parent.print_cube(desc)
-                raise Exception(f"{self}: {desc}")
+        state_index = self.state_index_keys.get(state)
 
-            state_index = int(state_index)
-            self.state_index_cache[state] = state_index
-            return state_index
+        if state_index is None:
+            self.parent.enable_print_cube = True
+            desc = f"state {state} not found in {self.filename_state_index_keys}"
+            self.parent.print_cube(desc)
+            raise Exception(f"{self}: {desc}")
+
+        self.state_index_cache.put(state, state_index)
+        return state_index
+
+    def state_index_multiple(self, states_to_find: List[str]) -> List[int]:
+        """
+        Args:
+            states_to_find: a list of states to search for
+
+        Returns:
+            a list of the state_index for each entry in ``states_to_find``
+        """
+        if self.state_index_keys is None:
+            self.load_state_index_keys()
+
+        results = self.state_index_keys.get_multiple(states_to_find)
+
+        if None in results:
+            state = states_to_find[results.index(None)]
+            raise Exception(f"{self}: state {state} not found in {self.filename_state_index_keys}")
 
-    def state_index_multiple(self, states_to_find: List[str]) -> Dict[str, str]:
-        (width, state_width, linecount) = get_file_vitals(self.filename_state_index)
-        with open(self.filename_state_index, "rb") as fh:
-            results = binary_search_multiple(fh, width, state_width, linecount, states_to_find)
-            for state, state_index in results.items():
-                self.state_index_cache[state] = state_index
-            return results
+        return results
 
     def reverse_state_index(self, state_index: int) -> str:
         """
@@ -1002,14 +1707,114 @@ class LookupTable(object):
         Returns:
             the state for ``state_index``
         """
-        with open(self.filename_state_index, "r") as fh:
-            for line in fh:
-                if line.rstrip().endswith(f":{state_index}"):
-                    return line.split(":")[0]
+        if self.reverse_state_index_line_numbers is None:
+            self.load_reverse_state_index()
+
+        line_start = self.reverse_state_index_line_numbers[state_index] * self.state_index_width
+        return self.mm_state_index[line_start : line_start + self.state_index_state_width].decode("utf-8")
+
+    def load_reverse_state_index(self) -> None:
+        """
+        mmap our ``.state_index`` file and the ``.reverse_state_index`` file that maps a state_index to
+        its line in the ``.state_index`` file.  The ``.reverse_state_index`` file is built if it does not
+        exist, utils/build-reverse-state-index.py can be used to build them ahead of time.
+        """
+        if not os.path.exists(self.filename_reverse_state_index):
+            logger.info(f"{self}: build {self.filename_reverse_state_index} begin")
+            build_reverse_state_index(self.filename_state_index, self.filename_reverse_state_index)
+            logger.info(f"{self}: build {self.filename_reverse_state_index} end")
+
+        (self.state_index_width, self.state_index_state_width, _) = get_file_vitals(self.filename_state_index)
+        self.mm_state_index = mmap_file(self.filename_state_index)
+        line_numbers = memoryview(mmap_file(self.filename_reverse_state_index)).cast("I")
+
+        if sys.byteorder == "big":
+            line_numbers = array.array("I", line_numbers)
+            line_numbers.byteswap()
+
+        self.reverse_state_index_line_numbers = line_numbers
 
     def state_index_cost(self, state_index: int) -> int:
         return self.ida_graph[state_index * self.ROW_LENGTH]
 
+    def next_state_index(self, state_index: int, step: str) -> int:
+        """
+        Args:
+            state_index: the state_index we are at
+            step: one of our legal_moves
+
+        Returns:
+            the state_index we move to via ``step``, read from our IDA graph so the cube is not touched
+        """
+        if not self.ida_graph:
+            self.load_ida_graph()
+
+        offset = (state_index * self.ROW_LENGTH) + 1 + (self.legal_moves.index(step) * 5)
+        return struct.unpack_from("<I", self.ida_graph, offset)[0]
+
+    def load_ida_graph_rows(self) -> None:
+        """
+        View our IDA graph as a numpy structured array with one row per state_index. A row is the
+        cost followed by the state_index and cost we move to for each of our legal_moves.
+        numpy is only required if you call this method.
+        """
+        # third party libraries
+        import numpy as np
+
+        if not self.ida_graph:
+            self.load_ida_graph()
+
+        row = np.dtype([("cost", "u1"), ("edges", [("state_index", "<u4"), ("cost", "u1")], (len(self.legal_moves),))])
+        assert row.itemsize == self.ROW_LENGTH
+        self.ida_graph_rows = np.ndarray((len(self.ida_graph) // self.ROW_LENGTH,), dtype=row, buffer=self.ida_graph)
+
+    def state_index_costs(self, state_indexes: "numpy.ndarray") -> "numpy.ndarray":
+        """
+        Args:
+            state_indexes: an array of state indexes
+
+        Returns:
+            the cost to solve each of ``state_indexes``
+        """
+        if self.ida_graph_rows is None:
+            self.load_ida_graph_rows()
+
+        return self.ida_graph_rows["cost"][state_indexes]
+
+    def next_state_indexes(self, state_indexes: "numpy.ndarray", step: str = None) -> "numpy.ndarray":
+        """
+        Args:
+            state_indexes: an array of state indexes
+            step: one of our legal_moves, None for all of them
+
+        Returns:
+            the state_index we move to from each of ``state_indexes`` via ``step``. If ``step`` is None
+            there is one column per legal move, in the order of our legal_moves.
+        """
+        if self.ida_graph_rows is None:
+            self.load_ida_graph_rows()
+
+        edges = self.ida_graph_rows["edges"]["state_index"]
+
+        if step is None:
+            return edges[state_indexes]
+
+        return edges[state_indexes, self.legal_moves.index(step)]
+
+    def walk_state_indexes(self, state_indexes: "numpy.ndarray", steps: List[str]) -> "numpy.ndarray":
+        """
+        Args:
+            state_indexes: an array of state indexes
+            steps: a sequence of our legal_moves
+
+        Returns:
+            the state_index we end up at from each of ``state_indexes`` after applying ``steps``
+        """
+        for step in steps:
+            state_indexes = self.next_state_indexes(state_indexes, step)
+
+        return state_indexes
+
     def ida_heuristic(self) -> Tuple[str, int]:
         """
         Returns:
@@ -1042,6 +1847,7 @@ class LookupTableIDA(LookupTable):
         max_depth: int = None,
         legal_moves: List = None,
         multiplier: float = None,
+        explored_max: int = 1000000,
     ):
         LookupTable.__init__(self, parent, filename, state_target, linecount, max_depth)
         self.recolor_positions = []
@@ -1051,6 +1857,7 @@ class LookupTableIDA(LookupTable):
         self.nuke_centers = False
         self.min_edge_paired_count = 0
         self.multiplier = multiplier
+        self.explored_max = explored_max
 
         assert self.multiplier is None or self.multiplier >= 1.0
 
@@ -1100,6 +1907,8 @@ class LookupTableIDA(LookupTable):
             if self.nuke_centers:
                 self.parent.nuke_centers()
 
+            self.parent.unshare_state()
+
             for x in self.recolor_positions:
                 x_color = self.parent.state[x]
                 x_new_color = self.recolor_map.get(x_color)
@@ -1107,65 +1916,77 @@ class LookupTableIDA(LookupTable):
                 if x_new_color:
                     self.parent.state[x] = x_new_color
 
-    def ida_search(
-        self, steps_to_here: List[str], threshold: int, prev_step: str, prev_state: str
-    ) -> Tuple[int, bool, List[str]]:
+    def ida_search(self, threshold: int) -> Tuple[bool, List[str]]:
         """
         https://algorithmsinsight.wordpress.com/graph-theory-2/ida-star-algorithm-in-general/
 
+        An iterative depth first search from ``self.original_state``. Each node on the stack is a tuple
+        of the cube state, the moves are applied via the ``itemgetter`` in ``self.ida_permutations`` so
+        the state is permuted in C. The steps to a node are kept in ``steps`` indexed by depth instead of
+        building a new list for every node.
+
         Args:
-            steps_to_here: a list of the steps to get here
             threshold: if f_cost is above this number, stop searching
-            prev_step: the last step we took to get here
-            prev_state: the state of the cube after prev_step was applied
 
         Returns:
-            the f_cost which is the cost_to_here plus the estimated cost to the goal
             True if we found a solution
-            a list of the steps to get here
+            a list of the steps of the solution
         """
-        self.ida_count += 1
+        parent = self.parent
+        explored = self.explored
+        explored_max = self.explored_max
+        multiplier = self.multiplier
+        permutations = self.ida_permutations
+        steps_not_on_same_face_and_layer = self.steps_not_on_same_face_and_layer
+        steps = [None] * (threshold + 1)
+        stack = [(tuple(self.original_state), 0, None)]
 
-        # calculate f_cost which is the cost to where we are plus the estimated cost to reach our goal
-        cost_to_here = len(steps_to_here)
-        self.parent.state = prev_state[:]
-        (lt_state, cost_to_goal) = self.ida_heuristic()
+        while stack:
+            (state, cost_to_here, prev_step) = stack.pop()
 
-        if self.multiplier:
-            cost_to_goal = cost_to_goal * self.multiplier
+            # the nodes are popped depth first so steps[:cost_to_here] is always the path to this node
+            if cost_to_here:
+                steps[cost_to_here - 1] = prev_step
 
-        f_cost = cost_to_here + cost_to_goal
+            self.ida_count += 1
 
-        # ================
-        # Abort Searching?
-        # ================
-        if f_cost >= threshold:
-            return (f_cost, False, [])
+            # ida_heuristic() looks at self.parent.state and may modify it
+            parent.state = list(state)
+            (lt_state, cost_to_goal) = self.ida_heuristic()
 
-        # Are we done?
-        if cost_to_goal == 0:
-            return (f_cost, True, steps_to_here)
+            if multiplier:
+                cost_to_goal = cost_to_goal * multiplier
 
-        # If we have already explored the exact same scenario down another branch
-        # then we can stop looking down this branch
-        explored_cost_to_here = self.explored.get(lt_state, 99)
-        if explored_cost_to_here <= cost_to_here:
-            return (f_cost, False, [])
-        self.explored[lt_state] = cost_to_here
+            # calculate f_cost which is the cost to where we are plus the estimated cost to reach our goal
+            f_cost = cost_to_here + cost_to_goal
 
-        for step in self.steps_not_on_same_face_and_layer[prev_step]:
-            self.parent.state = self.rotate_xxx(prev_state, step)
+            # ================
+            # Abort Searching?
+            # ================
+            if f_cost >= threshold:
+                continue
 
-            (f_cost_tmp, found_solution, solution_steps) = self.ida_search(
-                steps_to_here + [step], threshold, step, self.parent.state[:]
-            )
+            # Are we done?
+            if cost_to_goal == 0:
+                return (True, steps[:cost_to_here])
 
-            if found_solution:
-                return (f_cost_tmp, True, solution_steps)
+            # If we have already explored the exact same scenario down another branch
+            # then we can stop looking down this branch
+            explored_cost_to_here = explored.get(lt_state, 99)
+            if explored_cost_to_here <= cost_to_here:
+                continue
+
+            # once explored is full we only update the states already in it
+            if explored_cost_to_here != 99 or len(explored) < explored_max:
+                explored[lt_state] = cost_to_here
+
+            # push in reverse so the steps are explored in the same order as moves_all
+            for step in reversed(steps_not_on_same_face_and_layer[prev_step]):
+                stack.append((permutations[step](state), cost_to_here + 1, step))
 
-        self.parent.state = prev_state[:]
-        return (f_cost, False, [])
+        return (False, [])
 
+    @releases_checkpoints
     def solve(self, min_ida_threshold: int = None, max_ida_threshold: int = 99) -> bool:
         """
         The goal is to find a sequence of moves that will put the cube in a state that is one of our state_targets
@@ -1177,48 +1998,18 @@ class LookupTableIDA(LookupTable):
         Returns:
             True if we found a solution
         """
-        if self.parent.size == 2:
-            # rubiks cube libraries
-            from rubikscubennnsolver.RubiksCube222 import rotate_222
-
-            self.rotate_xxx = rotate_222
-
-        elif self.parent.size == 4:
-            # rubiks cube libraries
-            from rubikscubennnsolver.RubiksCube444 import rotate_444
-
-            self.rotate_xxx = rotate_444
-
-        elif self.parent.size == 5:
-            # rubiks cube libraries
-            from rubikscubennnsolver.RubiksCube555 import rotate_555
-
-            self.rotate_xxx = rotate_555
-
-        elif self.parent.size == 6:
-            # rubiks cube libraries
-            from rubikscubennnsolver.RubiksCube666 import rotate_666
-
-            self.rotate_xxx = rotate_666
-
-        elif self.parent.size == 7:
-            # rubiks cube libraries
-            from rubikscubennnsolver.RubiksCube777 import rotate_777
-
-            self.rotate_xxx = rotate_777
-
-        else:
-            raise NotImplementedError(f"Need rotate_{self.parent.size}{self.parent.size}{self.parent.size}")
+        swaps = get_swaps(self.parent.size)
+        self.ida_permutations = {step: itemgetter(*swaps[step]) for step in self.moves_all}
 
         # If this is a lookup table that is staging a pair of colors (such as U and D)
         # then recolor the cubies accordingly.
-        self.pre_recolor_state = self.parent.state[:]
-        self.pre_recolor_solution = self.parent.solution[:]
+        pre_recolor = self.parent.checkpoint()
         self.recolor()
 
-        # save cube state
-        self.original_state = self.parent.state[:]
-        self.original_solution = self.parent.solution[:]
+        # save cube state, ida_search() starts from here
+        original = self.parent.checkpoint()
+        original_solution_len = len(self.parent.solution)
+        self.original_state = tuple(self.parent.state)
 
         # Avoiding OLL is done by changing the edge parity from odd to even.
         # The edge parity toggles from odd to even or even to odd with every
@@ -1241,11 +2032,11 @@ class LookupTableIDA(LookupTable):
         # The cube is already in the desired state, nothing to do
         if cost_to_goal == 0:
             logger.info(f"{self}: cube state {state} is in our lookup table")
-            tmp_solution = self.parent.solution[:]
-            self.parent.state = self.pre_recolor_state[:]
-            self.parent.solution = self.pre_recolor_solution[:]
+            tmp_solution = self.parent.solution[original_solution_len:]
+            self.parent.restore(pre_recolor)
+            self.parent.release(pre_recolor)
 
-            for step in tmp_solution[len(self.original_solution) :]:
+            for step in tmp_solution:
                 self.parent.rotate(step)
 
             return True
@@ -1261,14 +2052,11 @@ class LookupTableIDA(LookupTable):
         total_ida_count = 0
 
         for threshold in range(min_ida_threshold, max_ida_threshold + 1):
-            steps_to_here = []
             start_time1 = dt.datetime.now()
             self.ida_count = 0
             self.explored = {}
 
-            (f_cost, found_solution, solution_steps) = self.ida_search(
-                steps_to_here, threshold, None, self.original_state[:]
-            )
+            (found_solution, solution_steps) = self.ida_search(threshold)
             total_ida_count += self.ida_count
 
             end_time1 = dt.datetime.now()
@@ -1279,8 +2067,8 @@ class LookupTableIDA(LookupTable):
             )
 
             if found_solution:
-                self.parent.state = self.pre_recolor_state[:]
-                self.parent.solution = self.pre_recolor_solution[:]
+                self.parent.restore(pre_recolor)
+                self.parent.release(pre_recolor)
 
                 for step in solution_steps:
                     self.parent.rotate(step)
@@ -1291,6 +2079,6 @@ class LookupTableIDA(LookupTable):
                 return True
 
         logger.info(f"{self}: could not find a solution via IDA with max threshold of {max_ida_threshold}")
-        self.parent.state = self.original_state[:]
-        self.parent.solution = self.original_solution[:]
+        self.parent.restore(original)
+        self.parent.release(pre_recolor)
         raise NoIDASolution(f"{self} FAILED with range {min_ida_threshold}->{max_ida_threshold + 1}")
@@ -0,0 +1,187 @@
+# standard libraries
+import logging
+import sys
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# A rough count of the bytes used by an OrderedDict slot and its linked list node
+ENTRY_OVERHEAD = 100
+
+# The byte budget shared by all caches and the default byte budget for each cache, None means no limit
+global_max_bytes = None
+table_max_bytes = None
+
+# The bytes currently used by all caches plus the bytes reserved by preloaded lookup tables
+global_bytes = 0
+
+all_caches = weakref.WeakSet()
+
+
+def set_cache_budget(global_budget: int = None, table_budget: int = None) -> None:
+    """
+    Args:
+        global_budget: the number of bytes that all caches combined may use, None for no limit
+        table_budget: the number of bytes that each cache may use, None for no limit
+    """
+    global global_max_bytes, table_max_bytes
+    global_max_bytes = global_budget
+    table_max_bytes = table_budget
+
+    for cache in list(all_caches):
+        cache.evict()
+
+
+def reserve_bytes(owner: Any, size: int) -> bool:
+    """
+    Reserve ``size`` bytes of the global budget for a preloaded lookup table
+
+    Args:
+        owner: the LookupTable doing the preload
+        size: the number of bytes it expects the preload to use
+
+    Returns:
+        True if ``size`` bytes fit in the global budget
+    """
+    global global_bytes
+
+    if global_max_bytes is not None and global_bytes + size > global_max_bytes:
+        logger.warning(
+            f"{owner}: preload needs ~{size:,} bytes but only {max(0, global_max_bytes - global_bytes):,} bytes "
+            "of the cache budget are available"
+        )
+        return False
+
+    global_bytes += size
+    return True
+
+
+def cache_stats() -> List[Dict]:
+    """
+    Returns:
+        the stats for each cache, the caches with the most misses first.  A table with a lot of
+        misses and seeks is a good candidate for preloading.
+    """
+    return sorted((cache.stats() for cache in list(all_caches)), key=lambda x: (x["misses"], x["seeks"]), reverse=True)
+
+
+def log_cache_stats(count: int = 10) -> None:
+    """
+    Log the stats for the ``count`` caches with the most misses
+    """
+    for stats in cache_stats()[:count]:
+        logger.info(
+            f"{stats['name']}: {stats['hits']:,} hits, {stats['misses']:,} misses, {stats['seeks']:,} seeks, "
+            f"{stats['evictions']:,} evictions, {stats['entries']:,} entries, {stats['bytes']:,} bytes"
+        )
+
+
+class LookupTableCache(object):
+    """
+    A LRU cache of lookup results for a LookupTable.  The cache is bounded by its own byte budget
+    (``table_max_bytes`` by default) and by ``global_max_bytes`` which is shared by all caches.
+    """
+
+    def __init__(self, owner: Any, kind: str, max_bytes: int = None):
+        """
+        Args:
+            owner: the LookupTable that owns this cache, its seek counter is included in our stats
+            kind: what this cache holds, "steps", "state_index", etc
+            max_bytes: the byte budget for this cache, ``table_max_bytes`` is used if this is None
+        """
+        self.owner = owner
+        self.kind = kind
+        self.max_bytes = max_bytes
+        self.data = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        all_caches.add(self)
+
+    def __str__(self) -> str:
+        return f"{self.owner} {self.kind} cache"
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.data
+
+    def __del__(self) -> None:
+        self.clear()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """
+        Returns:
+            the value for ``key`` or ``default`` if ``key`` is not in the cache
+        """
+        value = self.data.get(key, default)
+
+        if value is default:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.data.move_to_end(key)
+
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        global global_bytes
+        size = sys.getsizeof(key) + sys.getsizeof(value) + ENTRY_OVERHEAD
+
+        if key in self.data:
+            self.remove(key)
+
+        self.data[key] = value
+        self.bytes += size
+        global_bytes += size
+        self.evict()
+
+    def remove(self, key: Any) -> None:
+        global global_bytes
+        value = self.data.pop(key)
+        size = sys.getsizeof(key) + sys.getsizeof(value) + ENTRY_OVERHEAD
+        self.bytes -= size
+        global_bytes -= size
+
+    def evict(self) -> None:
+        """
+        Evict the least recently used entries until we are within our budget, then evict from the
+        largest cache until all caches are within the global budget
+        """
+        max_bytes = self.max_bytes if self.max_bytes is not None else table_max_bytes
+
+        while self.data and max_bytes is not None and self.bytes > max_bytes:
+            self.evict_oldest()
+
+        while global_max_bytes is not None and global_bytes > global_max_bytes:
+            largest = max(list(all_caches), key=lambda cache: cache.bytes)
+
+            if not largest.data:
+                break
+
+            largest.evict_oldest()
+
+    def evict_oldest(self) -> None:
+        self.remove(next(iter(self.data)))
+        self.evictions += 1
+
+    def clear(self) -> None:
+        global global_bytes
+        global_bytes -= self.bytes
+        self.bytes = 0
+        self.data.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "name": str(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "seeks": getattr(self.owner, "fh_txt_seek_calls", 0),
+            "evictions": self.evictions,
+            "entries": len(self.data),
+            "bytes": self.bytes,
+        }
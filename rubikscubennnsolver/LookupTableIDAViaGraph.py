@@ -1,18 +1,79 @@
 # standard libraries
+import atexit
+import ctypes
+import json
 import logging
+import mmap
 import os
 import random
-import re
 import string
+import struct
 import subprocess
-from typing import List
+from typing import Dict, Iterator, List, Tuple, Union
 
 # rubiks cube libraries
 from rubikscubennnsolver import reverse_steps
-from rubikscubennnsolver.LookupTable import LookupTable, NoIDASolution, download_file_if_needed
+from rubikscubennnsolver.LookupTable import IDABudgetExhausted, LookupTable, NoIDASolution, download_file_if_needed
+from rubikscubennnsolver.misc import releases_checkpoints
 
 logger = logging.getLogger(__name__)
 
+IDA_SEARCH_BINARY = "./ida_search_via_graph"
+IDA_SEARCH_LIBRARY = "./ida_search_via_graph.so"
+END_OF_SEARCH = "END-OF-SEARCH"
+END_OF_BATCH = "END-OF-BATCH"
+
+# must match MAX_IDA_THRESHOLD, PT_STATES_WIDTH and EXIT_BUDGET_EXHAUSTED in ida_search_via_graph.c
+MAX_IDA_THRESHOLD = 20
+PT_STATES_WIDTH = 5
+EXIT_BUDGET_EXHAUSTED = 2
+
+# The number of worker processes solutions_via_c splits each search across, 1 disables the parallel search.
+# See set_ida_search_workers()
+ida_search_workers = 1
+ida_search_root_split_depth = 1
+
+# struct shared_bound in ida_search_via_graph.c, the lowest f_cost and the number of solutions found by all workers
+SHARED_BOUND_STRUCT = struct.Struct("=BxxxI")
+
+
+# The default --max-nodes and --timeout-ms for every search, see set_ida_search_budget()
+ida_search_max_nodes = None
+ida_search_timeout_ms = None
+
+
+def set_ida_search_budget(max_nodes: int = None, timeout_ms: int = None) -> None:
+    """
+    Set the default budget for every C IDA search. A table's own ``max_nodes``/``timeout_ms`` take
+    precedence so each phase of a solve can have its own budget.
+
+    Args:
+        max_nodes: the number of nodes a search may explore, None for no limit
+        timeout_ms: the number of milliseconds a search may run for, None for no limit
+    """
+    global ida_search_max_nodes, ida_search_timeout_ms
+    ida_search_max_nodes = max_nodes
+    ida_search_timeout_ms = timeout_ms
+
+
+def set_ida_search_workers(workers: int, root_split_depth: int = 1) -> None:
+    """
+    Args:
+        workers: the number of ``ida_search_via_graph --server`` processes to split each search across
+        root_split_depth: the depth of the IDA tree whose nodes are dealt out to the workers, 1 splits
+            on the first move, 2 on the first two moves
+    """
+    global ida_search_workers, ida_search_root_split_depth
+
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, not {workers}")
+
+    if root_split_depth < 1:
+        raise ValueError(f"root_split_depth must be at least 1, not {root_split_depth}")
+
+    ida_search_workers = workers
+    ida_search_root_split_depth = root_split_depth
+
 
 def remove_failed_ida_output(lines: List[str]) -> List[str]:
     """
@@ -43,6 +104,374 @@ def remove_failed_ida_output(lines: List[str]) -> List[str]:
     return result
 
 
+def parse_ida_output(output: str) -> Tuple[str, List[Dict]]:
+    """
+    Args:
+        output: the output of an ``ida_search_via_graph --format jsonl`` search
+
+    Returns:
+        the text log rebuilt from the "log", "solution" and "summary" records
+        the "solution" and "stats" records
+    """
+    lines = []
+    records = []
+
+    for line in output.splitlines():
+        if line.startswith("{"):
+            record = json.loads(line)
+
+            if record["type"] == "log":
+                lines.append(record["message"])
+            elif record["type"] == "summary":
+                lines.append(record["text"])
+            else:
+                records.append(record)
+
+                if record["type"] == "solution":
+                    lines.append(f"SOLUTION ({len(record['moves'])} steps): {' '.join(record['moves'])}\n")
+        else:
+            # ERROR lines are printed as is
+            lines.append(line + "\n")
+
+    return ("".join(lines), records)
+
+
+class IDASearchServer(object):
+    """
+    A long running ``ida_search_via_graph --server`` process. Each prune table is loaded the first
+    time a search uses it and then stays resident for every search after that.
+    """
+
+    def __init__(self, binary: str = IDA_SEARCH_BINARY):
+        self.binary = binary
+        self.pid = os.getpid()
+        self.proc = subprocess.Popen([binary, "--server"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+        # the args of the --solution-batch search that is paused at the end of a batch, if any
+        self.active_batch = None
+
+    def alive(self) -> bool:
+        return self.pid == os.getpid() and self.proc.poll() is None
+
+    def search(self, args: List[str]) -> str:
+        """
+        Args:
+            args: the same args you would pass to ``ida_search_via_graph`` on the command line
+
+        Returns:
+            the output of the search
+        """
+        self.send(args)
+        (returncode, output) = self.receive(args)
+
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, [self.binary] + args, output)
+
+        return output
+
+    def send(self, args: List[str]) -> None:
+        """
+        Start a search, use ``receive()`` to wait for it to finish. A paused --solution-batch search is
+        ended first, the server runs one search at a time.
+        """
+        for arg in args:
+            if "\t" in arg or "\n" in arg:
+                raise ValueError(f"ida_search_via_graph arg {arg} contains a tab or newline")
+
+        self.end_active_batch()
+
+        self.proc.stdin.write(("\t".join(args) + "\n").encode("utf-8"))
+        self.proc.stdin.flush()
+
+    def receive(self, args: List[str]) -> Tuple[int, str]:
+        """
+        Args:
+            args: the args passed to ``send()``, these are only used in the exception if the server exits
+
+        Returns:
+            the return code and output of the search started via ``send()``, the return code is None
+            if a --solution-batch search paused at the end of a batch, see ``resume()``
+        """
+        lines = []
+
+        for line in self.proc.stdout:
+            line = line.decode("utf-8")
+
+            if line.startswith(END_OF_SEARCH):
+                returncode = int(line.split()[1])
+                break
+
+            if line.startswith(END_OF_BATCH):
+                returncode = None
+                self.active_batch = args
+                break
+
+            lines.append(line)
+        else:
+            # the server exited on us
+            raise subprocess.CalledProcessError(self.proc.wait(), [self.binary] + args, "".join(lines))
+
+        return (returncode, "".join(lines))
+
+    def resume(self, more: bool) -> None:
+        """
+        Resume a --solution-batch search that ``receive()`` reported as paused, the search looks for the
+        next batch of solutions if ``more`` is True and ends otherwise. Use ``receive()`` to wait for it.
+        """
+        self.active_batch = None
+        self.proc.stdin.write(b"more\n" if more else b"stop\n")
+        self.proc.stdin.flush()
+
+    def end_active_batch(self) -> None:
+        """
+        End the --solution-batch search that is paused at the end of a batch, if there is one. This
+        happens when its ``solution_batches_via_c()`` generator is dropped without being closed.
+        """
+        if self.active_batch is not None:
+            args = self.active_batch
+            self.resume(False)
+            self.receive(args)
+
+    def close(self) -> None:
+        if self.alive():
+            self.proc.stdin.close()
+            self.proc.wait()
+
+
+_ida_search_server = None
+
+
+def get_ida_search_server() -> IDASearchServer:
+    """
+    Returns:
+        the ``IDASearchServer`` for this process, starting it if needed
+    """
+    global _ida_search_server
+
+    if _ida_search_server is None or not _ida_search_server.alive():
+        _ida_search_server = IDASearchServer()
+        atexit.register(_ida_search_server.close)
+
+    return _ida_search_server
+
+
+_ida_search_servers = []
+
+
+def get_ida_search_servers(count: int) -> List[IDASearchServer]:
+    """
+    Returns:
+        ``count`` ``IDASearchServer`` worker processes for a parallel search, starting them if needed
+    """
+    for index, server in enumerate(_ida_search_servers):
+        if not server.alive():
+            _ida_search_servers[index] = IDASearchServer()
+            atexit.register(_ida_search_servers[index].close)
+
+    while len(_ida_search_servers) < count:
+        _ida_search_servers.append(IDASearchServer())
+        atexit.register(_ida_search_servers[-1].close)
+
+    return _ida_search_servers[:count]
+
+
+def parallel_search(args: List[str], workers: int, root_split_depth: int = 1) -> str:
+    """
+    Split a search across ``workers`` server processes. Each worker walks the same IDA tree but only
+    explores its share of the nodes at depth ``root_split_depth``. The prune tables are mmapped so the
+    workers share the same pages of memory. The workers also share the lowest f_cost and the number of
+    solutions found so far via a small mmapped file, the others stop searching a threshold once enough
+    solutions have been found.
+
+    Args:
+        args: the same args you would pass to ``ida_search_via_graph`` on the command line
+        workers: the number of worker processes
+        root_split_depth: the depth whose nodes are dealt out to the workers
+
+    Returns:
+        the output of every worker
+    """
+    servers = get_ida_search_servers(workers)
+    shared_bound_filename = "/tmp/ida-shared-bound-" + "".join(random.choice(string.ascii_uppercase) for i in range(6))
+    worker_args = [
+        args
+        + [
+            "--root-split",
+            f"{index}/{workers}",
+            "--root-split-depth",
+            str(root_split_depth),
+            "--shared-bound",
+            shared_bound_filename,
+        ]
+        for index in range(workers)
+    ]
+    results = []
+
+    with open(shared_bound_filename, "wb") as fh:
+        fh.write(SHARED_BOUND_STRUCT.pack(0xFF, 0))
+
+    try:
+        for server, server_args in zip(servers, worker_args):
+            server.send(server_args)
+
+        for server, server_args in zip(servers, worker_args):
+            results.append(server.receive(server_args))
+
+    except Exception:
+        # the other workers may still be writing output for this search, start over with fresh workers.
+        # wait() so that alive() sees they are gone and get_ida_search_servers() replaces them.
+        for server in servers:
+            server.proc.kill()
+            server.proc.wait()
+        raise
+
+    finally:
+        os.unlink(shared_bound_filename)
+
+    # A worker whose share of the tree has no solution exits with 1, or EXIT_BUDGET_EXHAUSTED, after it
+    # prints its stats record. A worker that failed (missing table, bad arg, etc) exits before that.
+    for server, server_args, (returncode, output) in zip(servers, worker_args, results):
+        if returncode and '{"type": "stats"' not in output:
+            raise subprocess.CalledProcessError(returncode, [server.binary] + server_args, output)
+
+    output = "".join(output for (_, output) in results)
+    returncodes = [returncode for (returncode, _) in results]
+
+    # the search as a whole only failed if none of the workers found a solution
+    if 0 in returncodes:
+        returncode = 0
+    elif EXIT_BUDGET_EXHAUSTED in returncodes:
+        returncode = EXIT_BUDGET_EXHAUSTED
+    else:
+        returncode = 1
+
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, [servers[0].binary] + args, output)
+
+    return output
+
+
+def buffer_address(buffer: Union[bytes, mmap.mmap]) -> Union[bytes, int]:
+    """
+    Args:
+        buffer: the contents of a prune table, either bytes or a writable (ACCESS_COPY) mmap
+
+    Returns:
+        something that can be used to populate a ctypes.c_char_p
+    """
+    if buffer is None or isinstance(buffer, bytes):
+        return buffer
+
+    return ctypes.addressof(ctypes.c_char.from_buffer(buffer))
+
+
+class IDALibSolution(ctypes.Structure):
+    """
+    struct ida_lib_solution in ida_search_via_graph.c
+    """
+
+    _fields_ = [
+        ("pt_states", ctypes.c_uint * PT_STATES_WIDTH),
+        ("move_count", ctypes.c_ubyte),
+        ("moves", ctypes.c_ubyte * MAX_IDA_THRESHOLD),
+    ]
+
+
+class IDASearchLibrary(object):
+    """
+    A ctypes binding for ``ida_search_via_graph.so``, this runs the search in our process so there is
+    no subprocess, no pt-states temp file and no parsing of the log output to find the solutions.
+    """
+
+    def __init__(self, filename: str = IDA_SEARCH_LIBRARY):
+        self.lib = ctypes.CDLL(os.path.abspath(filename))
+        self.lib.ida_lib_solve.restype = ctypes.c_int
+        self.lib.ida_lib_solve.argtypes = [
+            ctypes.c_int,
+            ctypes.POINTER(ctypes.c_char_p),
+            ctypes.POINTER(ctypes.c_char_p),
+            ctypes.POINTER(ctypes.c_uint),
+            ctypes.c_uint,
+            ctypes.POINTER(ctypes.POINTER(IDALibSolution)),
+            ctypes.POINTER(ctypes.c_uint),
+            ctypes.POINTER(ctypes.c_void_p),
+        ]
+        self.lib.ida_lib_free.restype = None
+        self.lib.ida_lib_free.argtypes = [ctypes.c_void_p]
+
+    def solve(
+        self, args: List[str], prune_tables: List[bytes], pt_states: List[Tuple[int]] = None
+    ) -> Tuple[int, str, List[Tuple[Tuple[int], Tuple[int]]]]:
+        """
+        Args:
+            args: the same args you would pass to ``ida_search_via_graph`` on the command line
+            prune_tables: the contents of each prune table .bin file
+            pt_states: the pt-states rows for a multi-start search
+
+        Returns:
+            the return code of the search
+            the output of the search
+            a list of (move indexes into --legal-moves, pt states) tuples, one per solution found
+        """
+        argv = [IDA_SEARCH_BINARY] + args
+        c_argv = (ctypes.c_char_p * len(argv))(*[x.encode("utf-8") for x in argv])
+        c_prune_tables = (ctypes.c_char_p * PT_STATES_WIDTH)(*[buffer_address(x) for x in prune_tables])
+
+        if pt_states:
+            flat_pt_states = []
+
+            for row in pt_states:
+                flat_pt_states.extend(row)
+                flat_pt_states.extend([0] * (PT_STATES_WIDTH - len(row)))
+
+            c_pt_states = (ctypes.c_uint * len(flat_pt_states))(*flat_pt_states)
+            pt_states_count = len(pt_states)
+        else:
+            c_pt_states = None
+            pt_states_count = 0
+
+        c_solutions = ctypes.POINTER(IDALibSolution)()
+        c_solutions_count = ctypes.c_uint(0)
+        c_output = ctypes.c_void_p()
+
+        returncode = self.lib.ida_lib_solve(
+            len(argv),
+            c_argv,
+            c_prune_tables,
+            c_pt_states,
+            pt_states_count,
+            ctypes.byref(c_solutions),
+            ctypes.byref(c_solutions_count),
+            ctypes.byref(c_output),
+        )
+
+        output = ctypes.string_at(c_output.value).decode("utf-8") if c_output.value else ""
+        self.lib.ida_lib_free(c_output)
+        solutions = []
+
+        for i in range(c_solutions_count.value):
+            solution = c_solutions[i]
+            solutions.append((tuple(solution.moves[: solution.move_count]), tuple(solution.pt_states)))
+
+        return (returncode, output, solutions)
+
+
+_ida_search_library = None
+
+
+def get_ida_search_library() -> IDASearchLibrary:
+    """
+    Returns:
+        the ``IDASearchLibrary`` if ``ida_search_via_graph.so`` has been built, else None
+    """
+    global _ida_search_library
+
+    if _ida_search_library is None and os.path.exists(IDA_SEARCH_LIBRARY):
+        _ida_search_library = IDASearchLibrary()
+
+    return _ida_search_library
+
+
 class LookupTableIDAViaGraph(LookupTable):
     """
     multipliers
@@ -82,8 +511,11 @@ class LookupTableIDAViaGraph(LookupTable):
         pt2_state_max: int = None,
         pt4_state_max: int = None,
         centers_only: bool = False,
-        use_uthash: bool = False,
+        transposition_table_mb: int = None,
         C_ida_type: str = None,
+        madvise: str = None,
+        max_nodes: int = None,
+        timeout_ms: int = None,
     ):
         LookupTable.__init__(self, parent, filename, state_target, linecount, max_depth, filesize)
         self.recolor_positions = []
@@ -97,8 +529,16 @@ class LookupTableIDAViaGraph(LookupTable):
         self.main_table_max_depth = main_table_max_depth
         self.main_table_prune_tables = main_table_prune_tables
         self.centers_only = centers_only
-        self.use_uthash = use_uthash
+        self.transposition_table_mb = transposition_table_mb
         self.C_ida_type = C_ida_type
+        self.madvise = madvise
+        self.max_nodes = max_nodes
+        self.timeout_ms = timeout_ms
+
+        # the --format jsonl "stats" records from the last solutions_via_c(), one per worker
+        self.ida_stats = []
+
+        assert self.madvise in (None, "random", "willneed"), f"invalid madvise {self.madvise}"
 
         if perfect_hash01_filename:
             self.perfect_hash01_filename = "lookup-tables/" + perfect_hash01_filename
@@ -199,6 +639,8 @@ class LookupTableIDAViaGraph(LookupTable):
             if self.nuke_centers:
                 self.parent.nuke_centers()
 
+            self.parent.unshare_state()
+
             for x in self.recolor_positions:
                 x_color = self.parent.state[x]
                 x_new_color = self.recolor_map.get(x_color)
@@ -272,35 +714,51 @@ class LookupTableIDAViaGraph(LookupTable):
                 fh_pt_state.write("\n".join(to_write) + "\n")
                 to_write = []
 
-    def solutions_via_c(
+    @releases_checkpoints
+    def ida_search_cmd(
         self,
         pt_states=[],
+        pt_states_file: bool = True,
         min_ida_threshold: int = None,
         max_ida_threshold: int = None,
         solution_count: int = None,
+        solution_batch: int = None,
         find_extra: bool = False,
         use_kociemba_string: bool = False,
-    ) -> List[List[str]]:
-        cmd = ["./ida_search_via_graph"]
+        max_nodes: int = None,
+        timeout_ms: int = None,
+    ) -> Tuple[List[str], str, str]:
+        """
+        Args:
+            pt_states: the pt-states rows for a multi-start search, they must already be sorted
+            pt_states_file: True if the pt_states should be passed via a --prune-table-states file,
+                the library is handed them directly
+
+        Returns:
+            the ``ida_search_via_graph`` command
+            the command as a string for logging
+            the name of the --prune-table-states file, the caller must remove it
+        """
+        cmd = [IDA_SEARCH_BINARY]
+        pt_states_filename = None
 
         if pt_states:
-            pt_states = sorted(set(pt_states))
-            pt_states_filename = (
-                "/tmp/pt-states-" + "".join(random.choice(string.ascii_uppercase) for i in range(6)) + ".txt"
-            )
-
             for index, pt in enumerate(self.prune_tables):
                 cmd.append("--prune-table-%d-filename" % index)
                 cmd.append(pt.filename_bin)
 
-            with open(pt_states_filename, "w") as fh:
-                for x in pt_states:
-                    fh.write(",".join(map(str, x)) + "\n")
-            cmd.append("--prune-table-states")
-            cmd.append(pt_states_filename)
+            if pt_states_file:
+                pt_states_filename = (
+                    "/tmp/pt-states-" + "".join(random.choice(string.ascii_uppercase) for i in range(6)) + ".txt"
+                )
+
+                with open(pt_states_filename, "w") as fh:
+                    for x in pt_states:
+                        fh.write(",".join(map(str, x)) + "\n")
+                cmd.append("--prune-table-states")
+                cmd.append(pt_states_filename)
         else:
             self.init_ida_graph_nodes()
-            pt_states_filename = None
 
             for index, pt in enumerate(self.prune_tables):
                 cmd.append("--prune-table-%d-filename" % index)
@@ -335,8 +793,7 @@ class LookupTableIDAViaGraph(LookupTable):
                 raise Exception(f"avoid_oll is only supported for orbits 0 or 1, not {self.avoid_oll}")
 
         # If this is a lookup table that is staging a pair of colors (such as U and D) then recolor the cubies accordingly.
-        pre_recolor_state = self.parent.state[:]
-        pre_recolor_solution = self.parent.solution[:]
+        pre_recolor = self.parent.checkpoint()
         self.recolor()
 
         if use_kociemba_string:
@@ -344,6 +801,9 @@ class LookupTableIDAViaGraph(LookupTable):
             cmd.append("--kociemba")
             cmd.append(kociemba_string)
 
+        self.parent.restore(pre_recolor)
+        self.parent.release(pre_recolor)
+
         if self.perfect_hash01_filename:
             cmd.append("--prune-table-perfect-hash01")
             cmd.append(self.perfect_hash01_filename)
@@ -379,20 +839,48 @@ class LookupTableIDAViaGraph(LookupTable):
         if self.centers_only:
             cmd.append("--centers-only")
 
-        if self.use_uthash:
-            cmd.append("--uthash")
+        # the transposition table prunes a state reached again via another path so it drops the extra
+        # solutions that find_extra and solution_count look for, only use it for tables that need one solution
+        if self.transposition_table_mb:
+            cmd.append("--transposition-table-mb")
+            cmd.append(str(self.transposition_table_mb))
 
         if self.C_ida_type is not None:
             cmd.append("--type")
             cmd.append(self.C_ida_type)
 
+        if self.madvise is not None:
+            cmd.append("--madvise")
+            cmd.append(self.madvise)
+
         if solution_count is not None:
             cmd.append("--solution-count")
             cmd.append(str(solution_count))
 
+        if solution_batch is not None:
+            cmd.append("--solution-batch")
+            cmd.append(str(solution_batch))
+
         if find_extra:
             cmd.append("--find-extra")
 
+        if max_nodes is None:
+            max_nodes = self.max_nodes if self.max_nodes is not None else ida_search_max_nodes
+
+        if timeout_ms is None:
+            timeout_ms = self.timeout_ms if self.timeout_ms is not None else ida_search_timeout_ms
+
+        if max_nodes:
+            cmd.append("--max-nodes")
+            cmd.append(str(max_nodes))
+
+        if timeout_ms:
+            cmd.append("--timeout-ms")
+            cmd.append(str(timeout_ms))
+
+        cmd.append("--format")
+        cmd.append("jsonl")
+
         cmd.append("--legal-moves")
         cmd.append(",".join(self.all_moves))
 
@@ -406,50 +894,212 @@ class LookupTableIDAViaGraph(LookupTable):
             cmd.append("--multiplier")
             cmd.append(str(self.multiplier))
 
+        return (cmd, cmd_string, pt_states_filename)
+
+    def solutions_via_c(
+        self,
+        pt_states=[],
+        min_ida_threshold: int = None,
+        max_ida_threshold: int = None,
+        solution_count: int = None,
+        find_extra: bool = False,
+        use_kociemba_string: bool = False,
+        max_nodes: int = None,
+        timeout_ms: int = None,
+    ) -> List[List[str]]:
+        """
+        max_nodes and timeout_ms bound the search, they default to the table's own budget and then to
+        the set_ida_search_budget() budget. If the budget runs out the solutions found so far are
+        returned, IDABudgetExhausted is raised if there are none.
+        """
+        workers = ida_search_workers
+
+        # The library runs the search in our process, a parallel search needs the server processes
+        library = get_ida_search_library() if workers == 1 else None
+
+        if pt_states:
+            pt_states = sorted(set(pt_states))
+
+        (cmd, cmd_string, pt_states_filename) = self.ida_search_cmd(
+            pt_states=pt_states,
+            pt_states_file=library is None,
+            min_ida_threshold=min_ida_threshold,
+            max_ida_threshold=max_ida_threshold,
+            solution_count=solution_count,
+            find_extra=find_extra,
+            use_kociemba_string=use_kociemba_string,
+            max_nodes=max_nodes,
+            timeout_ms=timeout_ms,
+        )
         logger.info(f"{self}: solving via C ida_search\n{cmd_string}\n")
-        output = subprocess.check_output(cmd).decode("utf-8")
+
+        if library is not None:
+            prune_tables = []
+
+            for pt in self.prune_tables:
+                if not pt.ida_graph:
+                    pt.load_ida_graph()
+                prune_tables.append(pt.ida_graph)
+
+            prune_tables.extend([None] * (PT_STATES_WIDTH - len(prune_tables)))
+            (returncode, output, lib_solutions) = library.solve(cmd[1:], prune_tables, pt_states)
+
+            # raise the same exception as the server would
+            if returncode and returncode != EXIT_BUDGET_EXHAUSTED:
+                raise subprocess.CalledProcessError(returncode, cmd, output)
+        else:
+            try:
+                if workers > 1:
+                    output = parallel_search(cmd[1:], workers, ida_search_root_split_depth)
+                else:
+                    output = get_ida_search_server().search(cmd[1:])
+            except subprocess.CalledProcessError as e:
+                if e.returncode != EXIT_BUDGET_EXHAUSTED:
+                    raise
+                output = e.output
+
+        (output, records) = parse_ida_output(output)
         output = "\n".join(remove_failed_ida_output(output.splitlines()))
         self.parent.solve_via_c_output = f"\n{cmd_string}\n{output}\n"
+        self.ida_stats = [x for x in records if x["type"] == "stats"]
         logger.info(f"\n{output}\n\n")
 
         if pt_states_filename is not None:
             os.unlink(pt_states_filename)
 
-        solutions = []
-        pt0_state = None
-        pt1_state = None
-        pt2_state = None
-        pt3_state = None
-        pt4_state = None
-        self.parent.state = pre_recolor_state[:]
-        self.parent.solution = pre_recolor_solution[:]
-        RE_PT_STATES = re.compile(
-            r"pt0_state (\d+), pt1_state (\d+), pt2_state (\d+), pt3_state (\d+), pt4_state (\d+)"
+        # sort so the shortest solutions are first
+        if library is not None:
+            solutions = sorted(
+                (len(moves), tuple(self.all_moves[x] for x in moves), pt_states_for_solution)
+                for (moves, pt_states_for_solution) in lib_solutions
+            )
+        else:
+            solutions = sorted(
+                (len(x["moves"]), tuple(x["moves"]), tuple(x["pt_states"])) for x in records if x["type"] == "solution"
+            )
+
+        if not solutions:
+            if any(x["budget_exhausted"] for x in self.ida_stats):
+                raise IDABudgetExhausted(f"{self}: ran out of budget before finding a solution via\n{cmd_string}\n")
+
+            raise NoIDASolution(f"{self}: did not find a solution via\n{cmd_string}\n{output}\n")
+
+        return [x[1:3] for x in solutions]
+
+    def solution_batches_via_c(
+        self,
+        batch_size: int,
+        pt_states=[],
+        min_ida_threshold: int = None,
+        max_ida_threshold: int = None,
+        solution_count: int = None,
+        find_extra: bool = False,
+        use_kociemba_string: bool = False,
+        max_nodes: int = None,
+        timeout_ms: int = None,
+    ) -> Iterator[List[Tuple[Tuple[str], Tuple[int]]]]:
+        """
+        Like solutions_via_c() but the search is paused after every ``batch_size`` solutions and only
+        resumed when the caller asks for the next batch. Stop iterating once you have the solution you
+        are looking for, the search never explores more of the tree than the batches you consumed.
+
+        The search always runs in the IDASearchServer, the library cannot pause a search and a
+        parallel search does not find its solutions in order. The search can find the same solution
+        again at a higher IDA threshold so a solution is only yielded the first time it is found.
+
+        Args:
+            batch_size: the number of solutions the search finds before it pauses
+            solution_count: the total number of solutions to find, None for no limit
+
+        Yields:
+            each batch of (solution, pt_states) tuples, the shortest solutions of a batch are first
+        """
+        if pt_states:
+            pt_states = sorted(set(pt_states))
+
+        (cmd, cmd_string, pt_states_filename) = self.ida_search_cmd(
+            pt_states=pt_states,
+            min_ida_threshold=min_ida_threshold,
+            max_ida_threshold=max_ida_threshold,
+            solution_count=solution_count,
+            solution_batch=batch_size,
+            find_extra=find_extra,
+            use_kociemba_string=use_kociemba_string,
+            max_nodes=max_nodes,
+            timeout_ms=timeout_ms,
         )
+        logger.info(f"{self}: solving via C ida_search in batches of {batch_size}\n{cmd_string}\n")
 
-        for line in output.splitlines():
-            match = RE_PT_STATES.search(line)
+        server = get_ida_search_server()
+        args = cmd[1:]
+        server.send(args)
+        seen = set()
+        found_solution = False
+        budget_exhausted = False
+        ended_by_another_search = False
 
-            if match:
-                pt0_state = int(match.group(1))
-                pt1_state = int(match.group(2))
-                pt2_state = int(match.group(3))
-                pt3_state = int(match.group(4))
-                pt4_state = int(match.group(5))
+        try:
+            while True:
+                (returncode, output) = server.receive(args)
 
-            elif line.startswith("SOLUTION"):
-                solution = tuple(line.split(":")[1].strip().split())
-                solutions.append((len(solution), solution, (pt0_state, pt1_state, pt2_state, pt3_state, pt4_state)))
+                if returncode and returncode != EXIT_BUDGET_EXHAUSTED:
+                    raise subprocess.CalledProcessError(returncode, cmd, output)
 
-        if solutions:
-            # sort so the shortest solutions are first
-            solutions.sort()
+                (output, records) = parse_ida_output(output)
+                self.parent.solve_via_c_output = f"\n{cmd_string}\n{output}\n"
+                batch = []
 
-            # chop the solutions length
-            solutions = [x[1:3] for x in solutions]
-            return solutions
-        else:
-            raise NoIDASolution(f"Did not find SOLUTION line in\n{output}\n")
+                for x in records:
+                    if x["type"] == "solution":
+                        solution = (tuple(x["moves"]), tuple(x["pt_states"]))
+
+                        if solution not in seen:
+                            seen.add(solution)
+                            batch.append((len(solution[0]), solution))
+
+                    elif x["type"] == "stats":
+                        self.ida_stats = [x]
+                        budget_exhausted = x["budget_exhausted"]
+
+                if batch:
+                    found_solution = True
+                    batch.sort()
+                    yield [x[1] for x in batch]
+
+                # the search finished, otherwise it is paused at the end of a batch
+                if returncode is not None:
+                    break
+
+                # another search ended ours while we were paused, the server has moved on
+                if server.active_batch is not args:
+                    ended_by_another_search = True
+                    break
+
+                server.resume(True)
+
+        except GeneratorExit:
+            # the caller stopped iterating, end the paused search so the server is ready for the next one
+            if server.active_batch is args:
+                server.end_active_batch()
+            raise
+
+        except Exception:
+            # we do not know where the server is in its output for this search, start over with a fresh server
+            server.proc.kill()
+            raise
+
+        finally:
+            if pt_states_filename is not None:
+                os.unlink(pt_states_filename)
+
+        if ended_by_another_search:
+            raise Exception(f"{self}: the paused search was ended by another search via the IDASearchServer")
+
+        if not found_solution:
+            if budget_exhausted:
+                raise IDABudgetExhausted(f"{self}: ran out of budget before finding a solution via\n{cmd_string}\n")
+
+            raise NoIDASolution(f"{self}: did not find a solution via\n{cmd_string}\n")
 
     def solve_via_c(
         self,
@@ -459,6 +1109,8 @@ class LookupTableIDAViaGraph(LookupTable):
         solution_count: int = None,
         find_extra: bool = False,
         use_kociemba_string: bool = False,
+        max_nodes: int = None,
+        timeout_ms: int = None,
     ) -> None:
         solution = self.solutions_via_c(
             pt_states=pt_states,
@@ -467,6 +1119,8 @@ class LookupTableIDAViaGraph(LookupTable):
             solution_count=solution_count,
             find_extra=find_extra,
             use_kociemba_string=use_kociemba_string,
+            max_nodes=max_nodes,
+            timeout_ms=timeout_ms,
         )[0][0]
 
         for step in solution:
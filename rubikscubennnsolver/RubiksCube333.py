@@ -58,6 +58,8 @@ class LookupTable333Phase2Edges(LookupTable):
     Average: 7.601348 moves
     """
 
+    state_positions = edges_333
+
     def __init__(self, parent):
         LookupTable.__init__(
             self,
@@ -100,6 +102,8 @@ class LookupTable333Phase2Corners(LookupTable):
     Average: 8.858929 moves
     """
 
+    state_positions = corners_333
+
     def __init__(self, parent):
         LookupTable.__init__(
             self,
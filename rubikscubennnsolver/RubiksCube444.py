@@ -1,13 +1,16 @@
 # standard libraries
 import itertools
 import logging
+from contextlib import closing
 from typing import List, Tuple
 
 # rubiks cube libraries
 from rubikscubennnsolver import RubiksCube, reverse_steps, wing_str_map, wing_strs_all
-from rubikscubennnsolver.LookupTable import LookupTable
+from rubikscubennnsolver.LookupTable import LookupTable, NoIDASolution
 from rubikscubennnsolver.LookupTableIDAViaGraph import LookupTableIDAViaGraph
+from rubikscubennnsolver.misc import releases_checkpoints
 from rubikscubennnsolver.RubiksCube444Misc import highlow_edge_mapping_combinations
+from rubikscubennnsolver.RubiksCubeBatch import RubiksCubeBatch
 from rubikscubennnsolver.RubiksCubeHighLow import highlow_edge_values_444
 from rubikscubennnsolver.swaps import swaps_444
 
@@ -189,6 +192,8 @@ class LookupTable444UDCentersStage(LookupTable):
     Average: 6.03 moves
     """
 
+    state_positions = centers_444
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -244,6 +249,8 @@ class LookupTable444LRCentersStage(LookupTable):
     Average: 6.03 moves
     """
 
+    state_positions = centers_444
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -512,6 +519,8 @@ class LookupTable444Reduce333FirstTwoCenters(LookupTable):
         "RRRRFFFFLLLLBBBB",
     )
 
+    state_positions = LFRB_centers_444
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -677,6 +686,8 @@ class LookupTable444Reduce333Centers(LookupTable):
 
     state_targets = ("UUUULLLLFFFFRRRRBBBBDDDD",)
 
+    state_positions = centers_444
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -928,14 +939,14 @@ class RubiksCube444(RubiksCube):
         result = "".join(result)
         return result
 
+    @releases_checkpoints
     def highlow_edges_print(self) -> None:
         """
         Print the high/low state of the cube
         """
 
         # save cube state
-        original_state = self.state[:]
-        original_solution = self.solution[:]
+        original = self.checkpoint()
 
         self.nuke_corners()
         self.nuke_centers()
@@ -948,8 +959,8 @@ class RubiksCube444(RubiksCube):
                 orient_edge_state_index += 1
         self.print_cube("high/low edges")
 
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
+        self.release(original)
 
     def lt_init(self) -> None:
         """
@@ -986,36 +997,36 @@ class RubiksCube444(RubiksCube):
         self.lt_phase1.solve_via_c()
         self.print_cube_add_comment("LR centers staged", tmp_solution_len)
 
+    @releases_checkpoints
     def phase2(self) -> None:
-        original_state = self.state[:]
-        original_solution = self.solution[:]
+        original = self.checkpoint()
         tmp_solution_len = len(self.solution)
         pt_state_indexes_to_edge_mapping = {}
 
-        # Use state_index_multiple to populate the state_index_cache dict for each pt
-        for pt in self.lt_phase2.prune_tables:
-            states_to_find = []
-            for edges_to_flip_sets in highlow_edge_mapping_combinations.values():
-                for edge_mapping in edges_to_flip_sets:
-                    self.state = original_state[:]
-                    self.solution = original_solution[:]
-                    self.edge_mapping = edge_mapping
-                    states_to_find.append(pt.state())
-
-            pt.state_index_multiple(states_to_find)
+        # try all 2048 edge mappings, use state_index_multiple to find the state indexes for each pt
+        # in one batch
+        edge_mappings = []
+        states_to_find = [[] for pt in self.lt_phase2.prune_tables]
 
-        # try all 2048 edge mappings
         for edges_to_flip_sets in highlow_edge_mapping_combinations.values():
             for edge_mapping in edges_to_flip_sets:
-                self.state = original_state[:]
-                self.solution = original_solution[:]
+                self.restore(original)
                 self.edge_mapping = edge_mapping
-                pt_state_indexes_to_edge_mapping[
-                    tuple([pt.state_index() for pt in self.lt_phase2.prune_tables])
-                ] = edge_mapping
+                edge_mappings.append(edge_mapping)
+
+                for pt, pt_states_to_find in zip(self.lt_phase2.prune_tables, states_to_find):
+                    pt_states_to_find.append(pt.state())
 
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        pt_state_indexes = [
+            pt.state_index_multiple(pt_states_to_find)
+            for pt, pt_states_to_find in zip(self.lt_phase2.prune_tables, states_to_find)
+        ]
+
+        for edge_mapping, edge_mapping_pt_state_indexes in zip(edge_mappings, zip(*pt_state_indexes)):
+            pt_state_indexes_to_edge_mapping[edge_mapping_pt_state_indexes] = edge_mapping
+
+        self.restore(original)
+        self.release(original)
         phase2_solutions = self.lt_phase2.solutions_via_c(
             pt_states=pt_state_indexes_to_edge_mapping.keys(), solution_count=1
         )
@@ -1029,26 +1040,25 @@ class RubiksCube444(RubiksCube):
         self.highlow_edges_print()
         self.print_cube_add_comment("centers staged, edges EOed into high/low groups", tmp_solution_len)
 
+    @releases_checkpoints
     def phase3(self, wing_str_combo: List[str] = None):
-        original_state = self.state[:]
-        original_solution = self.solution[:]
-        tmp_solution_len = len(original_solution)
+        original = self.checkpoint()
+        tmp_solution_len = len(self.solution)
 
         # phase 3 - search for all wing_strs
         pt_state_indexes = []
         phase3_pt_state_indexes_to_wing_str_combo = {}
 
         for wing_str_combo in itertools.combinations(wing_strs_all, 4):
-            self.state = original_state[:]
-            self.solution = original_solution[:]
+            self.restore(original)
 
             self.lt_phase3_edges.only_colors = wing_str_combo
             wing_str_combo_pt_state_indexes = tuple([pt.state_index() for pt in self.lt_phase3.prune_tables])
             phase3_pt_state_indexes_to_wing_str_combo[wing_str_combo_pt_state_indexes] = wing_str_combo
             pt_state_indexes.append(wing_str_combo_pt_state_indexes)
 
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
+        self.release(original)
         phase3_solutions = self.lt_phase3.solutions_via_c(pt_states=pt_state_indexes)
 
         phase3_solution, (pt0_state, pt1_state, pt2_state, pt3_state, pt4_state) = phase3_solutions[0]
@@ -1060,15 +1070,14 @@ class RubiksCube444(RubiksCube):
 
         self.print_cube_add_comment("x-plane edges paired, LR FB centers vertical bars", tmp_solution_len)
 
+    @releases_checkpoints
     def phase4(self, max_ida_threshold: int = None):
         tmp_solution_len = len(self.solution)
         phase4_solutions = self.lt_phase4.solutions_via_c(max_ida_threshold=max_ida_threshold, solution_count=500)
-        original_state = self.state[:]
-        original_solution = self.solution[:]
+        original = self.checkpoint()
 
         for phase4_solution, (pt0_state, pt1_state, pt2_state, pt3_state, pt4_state) in phase4_solutions:
-            self.state = original_state[:]
-            self.solution = original_solution[:]
+            self.restore(original)
 
             for step in phase4_solution:
                 self.rotate(step)
@@ -1079,38 +1088,38 @@ class RubiksCube444(RubiksCube):
         else:
             logger.info(f"{self}: could not find a phase4 solution that avoids PLL")
 
+        self.release(original)
         self.print_cube_add_comment("last eight edges paired, centers solved", tmp_solution_len)
 
+    @releases_checkpoints
     def phase3_and_4(self, consider_solve_333: bool):
-        original_state = self.state[:]
-        original_solution = self.solution[:]
+        original = self.checkpoint()
 
         # phase 3 - search for all wing_strs
         pt_state_indexes = []
         phase3_pt_state_indexes_to_wing_str_combo = {}
 
-        # Use state_index_multiple to populate the state_index_cache dict for each pt
-        for pt in self.lt_phase3.prune_tables:
-            states_to_find = []
+        # Use state_index_multiple to find the state indexes for each pt in one batch
+        wing_str_combos = list(itertools.combinations(wing_strs_all, 4))
+        states_to_find = [[] for pt in self.lt_phase3.prune_tables]
 
-            for wing_str_combo in itertools.combinations(wing_strs_all, 4):
-                self.state = original_state[:]
-                self.solution = original_solution[:]
-                self.lt_phase3_edges.only_colors = wing_str_combo
-                states_to_find.append(pt.state())
-            pt.state_index_multiple(states_to_find)
+        for wing_str_combo in wing_str_combos:
+            self.restore(original)
+            self.lt_phase3_edges.only_colors = wing_str_combo
 
-        for wing_str_combo in itertools.combinations(wing_strs_all, 4):
-            self.state = original_state[:]
-            self.solution = original_solution[:]
+            for pt, pt_states_to_find in zip(self.lt_phase3.prune_tables, states_to_find):
+                pt_states_to_find.append(pt.state())
 
-            self.lt_phase3_edges.only_colors = wing_str_combo
-            wing_str_combo_pt_state_indexes = tuple([pt.state_index() for pt in self.lt_phase3.prune_tables])
+        pt_state_indexes_per_pt = [
+            pt.state_index_multiple(pt_states_to_find)
+            for pt, pt_states_to_find in zip(self.lt_phase3.prune_tables, states_to_find)
+        ]
+
+        for wing_str_combo, wing_str_combo_pt_state_indexes in zip(wing_str_combos, zip(*pt_state_indexes_per_pt)):
             phase3_pt_state_indexes_to_wing_str_combo[wing_str_combo_pt_state_indexes] = wing_str_combo
             pt_state_indexes.append(wing_str_combo_pt_state_indexes)
 
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
         phase3_solutions = self.lt_phase3.solutions_via_c(
             pt_states=pt_state_indexes, solution_count=5000, find_extra=False
         )
@@ -1119,69 +1128,89 @@ class RubiksCube444(RubiksCube):
         # phase 4 - search for all of the phase3 wing_strs
         pt_state_indexes = []
         phase4_pt_state_indexes_to_phase3_solution = {}
-        phase4_pt_state_indexes_to_wing_str_combo = {}
 
-        for phase3_solution, (pt0_state, pt1_state, pt2_state, pt3_state, pt4_state) in phase3_solutions:
-            wing_str_combo = phase3_pt_state_indexes_to_wing_str_combo[(pt0_state, pt1_state)]
-            self.state = original_state[:]
-            self.solution = original_solution[:]
+        # Apply each phase3 solution to its own copy of the cube, all at once
+        batch = RubiksCubeBatch(self, [self.state] * len(phase3_solutions))
+        batch.rotate_rows([phase3_solution for phase3_solution, _ in phase3_solutions])
+        wing_str_combos = [
+            phase3_pt_state_indexes_to_wing_str_combo[(pt0_state, pt1_state)]
+            for _, (pt0_state, pt1_state, pt2_state, pt3_state, pt4_state) in phase3_solutions
+        ]
 
-            for step in phase3_solution:
-                self.rotate(step)
+        # The edges state depends on the wing_str_combo so that one has to be done a cube at a time
+        centers_states = batch.table_states(self.lt_phase4_centers)
+        edges_states = []
 
+        for index, wing_str_combo in enumerate(wing_str_combos):
+            self.state = batch.state(index)
             self.lt_phase3_edges.only_colors = wing_str_combo
-            wing_str_combo_pt_state_indexes = tuple([pt.state_index() for pt in self.lt_phase4.prune_tables])
-            phase4_pt_state_indexes_to_wing_str_combo[wing_str_combo_pt_state_indexes] = wing_str_combo
+            edges_states.append(self.lt_phase4_edges.state())
+
+        for (phase3_solution, _), wing_str_combo_pt_state_indexes in zip(
+            phase3_solutions,
+            zip(
+                self.lt_phase4_centers.state_index_multiple(centers_states),
+                self.lt_phase4_edges.state_index_multiple(edges_states),
+            ),
+        ):
             phase4_pt_state_indexes_to_phase3_solution[wing_str_combo_pt_state_indexes] = phase3_solution
             pt_state_indexes.append(wing_str_combo_pt_state_indexes)
 
         # find a phase 4 solution that does NOT lead to PLL
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
         solutions_without_pll = []
         solutions_without_pll_states = set()
         solutions_with_pll = set()
-        solution_count = 50
+        phase4_solution_count = 0
 
         # disable INFO messages as we try many phase4 solutions
         logging.getLogger().setLevel(logging.WARNING)
 
-        # If we did not find a PLL free solution then increase solution_count by 1000 and try again.
-        # We do this until we evaluate enough phase4 solutions that one of them happens to be PLL free.
-        while not solutions_without_pll:
-            phase4_solutions = self.lt_phase4.solutions_via_c(
-                pt_states=pt_state_indexes, solution_count=solution_count, find_extra=True
-            )
+        # The C search pauses after each batch of phase4 solutions. We evaluate a batch and only ask for
+        # the next one if none of the phase4 solutions so far happen to be PLL free.
+        with closing(
+            self.lt_phase4.solution_batches_via_c(batch_size=50, pt_states=pt_state_indexes, find_extra=True)
+        ) as phase4_batches:
+            for phase4_solutions in phase4_batches:
+                candidates = []
 
-            for phase4_solution, (pt0_state, pt1_state, pt2_state, pt3_state, pt4_state) in phase4_solutions:
-                wing_str_combo = phase4_pt_state_indexes_to_wing_str_combo[(pt0_state, pt1_state)]
-                phase3_solution = phase4_pt_state_indexes_to_phase3_solution[(pt0_state, pt1_state)]
+                for phase4_solution, (pt0_state, pt1_state, pt2_state, pt3_state, pt4_state) in phase4_solutions:
+                    phase3_solution = phase4_pt_state_indexes_to_phase3_solution[(pt0_state, pt1_state)]
 
-                if (phase3_solution, phase4_solution) in solutions_with_pll:
-                    continue
+                    if (phase3_solution, phase4_solution) not in solutions_with_pll:
+                        candidates.append((phase3_solution, phase4_solution))
 
-                self.state = original_state[:]
-                self.solution = original_solution[:]
+                # Apply the phase3 + phase4 solution of each candidate to its own copy of the cube, all at once
+                self.restore(original)
+                batch = RubiksCubeBatch(self, [self.state] * len(candidates))
+                batch.rotate_rows(
+                    [list(phase3_solution) + list(phase4_solution) for phase3_solution, phase4_solution in candidates]
+                )
 
-                for step in phase3_solution:
-                    self.rotate(step)
+                for index, (phase3_solution, phase4_solution) in enumerate(candidates):
+                    self.state = batch.state(index)
 
-                for step in phase4_solution:
-                    self.rotate(step)
-
-                if self.edge_solution_leads_to_pll_parity():
-                    solutions_with_pll.add((phase3_solution, phase4_solution))
-                else:
-                    if tuple(self.state) in solutions_without_pll_states:
-                        continue
+                    if self.edge_solution_leads_to_pll_parity():
+                        solutions_with_pll.add((phase3_solution, phase4_solution))
                     else:
-                        solutions_without_pll.append((phase3_solution, phase4_solution))
-                        solutions_without_pll_states.add(tuple(self.state))
+                        if tuple(self.state) in solutions_without_pll_states:
+                            continue
+                        else:
+                            solutions_without_pll.append((phase3_solution, phase4_solution))
+                            solutions_without_pll_states.add(tuple(self.state))
+
+                phase4_solution_count += len(phase4_solutions)
+                logger.warning(
+                    f"evaluated {phase4_solution_count} phase4 solutions, {len(solutions_without_pll)} solutions without PLL"
+                )
 
-            logger.warning(
-                f"found {len(phase4_solutions)} phase4 solutions with --solution-count {solution_count}, {len(solutions_without_pll)} solutions without PLL"
-            )
-            solution_count += 1000
+                if solutions_without_pll:
+                    break
+
+        if not solutions_without_pll:
+            logging.getLogger().setLevel(logging.INFO)
+            self.release(original)
+            raise NoIDASolution(f"{self.lt_phase4}: none of the {phase4_solution_count} phase4 solutions are PLL free")
 
         # sort solutions_without_pll by shortest phase3 + phase4 length
         by_length = []
@@ -1196,14 +1225,10 @@ class RubiksCube444(RubiksCube):
             PHASE_34_SOLUTIONS_TO_EVALUATE = 5
 
             for phase3_solution, phase4_solution in solutions_without_pll[:PHASE_34_SOLUTIONS_TO_EVALUATE]:
-                self.state = original_state[:]
-                self.solution = original_solution[:]
-
-                for step in phase3_solution:
-                    self.rotate(step)
+                self.restore(original)
 
-                for step in phase4_solution:
-                    self.rotate(step)
+                self.rotate_steps(phase3_solution)
+                self.rotate_steps(phase4_solution)
 
                 tmp_solution_len = len(self.solution)
                 self.solve_333()
@@ -1223,8 +1248,8 @@ class RubiksCube444(RubiksCube):
             min_phase34_solution = solutions_without_pll[0]
 
         logging.getLogger().setLevel(logging.INFO)
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
+        self.release(original)
         (phase3_solution, phase4_solution) = min_phase34_solution
 
         # apply the phase 3 solution
@@ -7,7 +7,8 @@ from typing import List
 from rubikscubennnsolver import RubiksCube, reverse_steps, wing_str_map, wing_strs_all
 from rubikscubennnsolver.LookupTable import LookupTable
 from rubikscubennnsolver.LookupTableIDAViaGraph import LookupTableIDAViaGraph
-from rubikscubennnsolver.misc import SolveError
+from rubikscubennnsolver.misc import SolveError, releases_checkpoints
+from rubikscubennnsolver.RubiksCubeBatch import RubiksCubeBatch
 from rubikscubennnsolver.RubiksCubeHighLow import highlow_edge_values_555
 from rubikscubennnsolver.swaps import swaps_555
 
@@ -1255,6 +1256,8 @@ class LookupTable555Phase2LRCenterStage(LookupTable):
     )
     # fmt: on
 
+    state_positions = LR_centers_555
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -1785,6 +1788,8 @@ class LookupTable555Phase3LRCenterStage(LookupTable):
     )
     # fmt: on
 
+    state_positions = LR_centers_555
+
     def __init__(self, parent, build_state_index=False):
         LookupTable.__init__(
             self,
@@ -2122,6 +2127,8 @@ class LookupTable555Phase5Centers(LookupTable):
         "RLRRLRRLRFFFFFFFFFLRLLRLLRLBBBBBBBBB",
     )
 
+    state_positions = LFRB_centers_555
+
     def __init__(self, parent, build_state_index=False):
         LookupTable.__init__(
             self,
@@ -2399,6 +2406,8 @@ class LookupTable555Phase5FBCenters(LookupTable):
         "FFFFFFFFFBBBBBBBBB",
     )
 
+    state_positions = FB_centers_555
+
     def __init__(self, parent, build_state_index=False):
         LookupTable.__init__(
             self,
@@ -2565,6 +2574,8 @@ class LookupTable555Phase6Centers(LookupTable):
     Average: 6.98 moves
     """
 
+    state_positions = centers_555
+
     def __init__(self, parent, build_state_index=False):
         LookupTable.__init__(
             self,
@@ -2861,6 +2872,8 @@ class LookupTable555UDCenterSolve(LookupTable):
 
     state_targets = ("UUUUUUUUULLLLRRRRDDDDDDDDD",)
 
+    state_positions = UD_centers_LR_t_centers_555
+
     def __init__(self, parent, build_state_index=False):
         LookupTable.__init__(
             self,
@@ -2918,6 +2931,8 @@ class LookupTable555LRCenterSolve(LookupTable):
 
     state_targets = ("LLLLLLLLLFFFFRRRRRRRRRBBBB",)
 
+    state_positions = LR_centers_FB_x_centers_555
+
     def __init__(self, parent, build_state_index=False):
         LookupTable.__init__(
             self,
@@ -2974,6 +2989,8 @@ class LookupTable555FBCenterSolve(LookupTable):
 
     state_targets = ("UUUUFFFFFFFFFBBBBBBBBBDDDD",)
 
+    state_positions = FB_centers_UD_t_centers_555
+
     def __init__(self, parent, build_state_index=False):
         LookupTable.__init__(
             self,
@@ -3141,10 +3158,14 @@ class RubiksCube555(RubiksCube):
     )
 
     def nuke_centers_specific(self, centers):
+        self.unshare_state()
+
         for square_index in centers:
             self.state[square_index] = "."
 
     def nuke_edges_specific(self, edges):
+        self.unshare_state()
+
         for square_index in edges:
             partner_index = edges_partner_555[square_index]
             self.state[square_index] = "."
@@ -3284,10 +3305,10 @@ class RubiksCube555(RubiksCube):
         result = "".join(result)
         return result
 
+    @releases_checkpoints
     def highlow_edges_print(self):
         # save cube state
-        original_state = self.state[:]
-        original_solution = self.solution[:]
+        original = self.checkpoint()
 
         self.nuke_corners()
         self.nuke_centers()
@@ -3300,10 +3321,10 @@ class RubiksCube555(RubiksCube):
                 orient_edge_state_index += 1
         self.print_cube(f"{self}: high/low edges")
 
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
+        self.release(original)
 
-    def edges_flip_orientation(self, must_be_uppercase=[], must_be_lowercase=[]):
+    def get_edges_to_flip(self, must_be_uppercase=[], must_be_lowercase=[]):
         state = edges_recolor_pattern_555(self.state[:])
         edges_state = "".join([state[index] for index in wings_for_edges_pattern_555])
 
@@ -3343,15 +3364,28 @@ class RubiksCube555(RubiksCube):
                 if edges_state[edge_state_index].islower():
                     to_flip.append(wing_str)
 
+        return to_flip
+
+    def get_edges_flip_permutation(self, to_flip):
+        """
+        Returns:
+            the permutation that swaps the two squares of each wing of the ``to_flip`` edges
+        """
+        permutation = list(range(len(self.state)))
+
         for square_index in wings_for_edges_pattern_555:
             partner_index = edges_partner_555[square_index]
-            square_value = self.state[square_index]
-            partner_value = self.state[partner_index]
-            wing_str = wing_str_map[square_value + partner_value]
+            wing_str = wing_str_map[self.state[square_index] + self.state[partner_index]]
 
             if wing_str in to_flip:
-                self.state[square_index] = partner_value
-                self.state[partner_index] = square_value
+                permutation[square_index] = partner_index
+                permutation[partner_index] = square_index
+
+        return permutation
+
+    def edges_flip_orientation(self, must_be_uppercase=[], must_be_lowercase=[]):
+        permutation = self.get_edges_flip_permutation(self.get_edges_to_flip(must_be_uppercase, must_be_lowercase))
+        self.state = [self.state[x] for x in permutation]
 
     def get_x_plane_z_plane_wing_strs(self):
         result = []
@@ -3440,6 +3474,7 @@ class RubiksCube555(RubiksCube):
     def group_centers_stage_UD(self, max_ida_threshold: int = None):
         self.group_centers_stage_FB(max_ida_threshold=max_ida_threshold)
 
+    @releases_checkpoints
     def eo_edges(self):
         """
         Our goal is to get the edges split into high/low groups but we do not care what
@@ -3449,8 +3484,7 @@ class RubiksCube555(RubiksCube):
         """
         logger.info("eo_edges called")
         permutations = []
-        original_state = self.state[:]
-        original_solution = self.solution[:]
+        original = self.checkpoint()
         tmp_solution_len = len(self.solution)
 
         # Build a list of the wing strings at each midge
@@ -3471,32 +3505,32 @@ class RubiksCube555(RubiksCube):
 
         # Put all 2048 starting states in a file and point ida-via-graph
         # at the file so it can solve all of them and apply the one that is the shortest.
-        lr_center_stage_states = []
-        eo_outer_orbit_states = []
-        eo_inner_orbit_states = []
+        #
+        # An edge is flipped if it must be uppercase but is lowercase or vice versa.  Flipping only swaps
+        # the squares of each wing so build the swaps for all 2048 permutations and apply them to a
+        # batch of cubes at once.
+        lowercase_wing_strs = set(self.get_edges_to_flip(wing_strs, []))
+        flip_permutations = []
 
         for permutation in permutations:
-            must_be_uppercase = []
-            must_be_lowercase = []
-            self.state = original_state[:]
+            to_flip = [
+                wing_str
+                for wing_str, uppercase in zip(wing_strs, permutation)
+                if uppercase == (wing_str in lowercase_wing_strs)
+            ]
+            flip_permutations.append(self.get_edges_flip_permutation(to_flip))
 
-            for wing_str, uppercase in zip(wing_strs, permutation):
-                if uppercase:
-                    must_be_uppercase.append(wing_str)
-                else:
-                    must_be_lowercase.append(wing_str)
+        batch = RubiksCubeBatch(self, [self.state] * len(permutations))
+        batch.permute_rows(flip_permutations)
 
-            # logger.info("%s: %s permutation %s" % (self, index, "".join(map(str, permutation))))
-            self.edges_flip_orientation(must_be_uppercase, must_be_lowercase)
-
-            # build lists of the states that we need to find state_indexes for
-            lr_center_stage_states.append(self.lt_phase3_lr_center_stage.state())
-            eo_outer_orbit_states.append(self.lt_phase3_eo_outer_orbit.state())
-            eo_inner_orbit_states.append(self.lt_phase3_eo_inner_orbit.state())
+        # build lists of the states that we need to find state_indexes for
+        lr_center_stage_states = batch.table_states(self.lt_phase3_lr_center_stage)
+        eo_outer_orbit_states = batch.table_states(self.lt_phase3_eo_outer_orbit)
+        eo_inner_orbit_states = batch.table_states(self.lt_phase3_eo_inner_orbit)
 
         # now we have a huge list of states to lookup, do a binary search on multiple states at once (this is drastically faster
-        # than binary searching for them individually).  state_index_multiple() will return a dict where the state is the key
-        # and the state_index is the value.
+        # than binary searching for them individually).  state_index_multiple() will return a list of the state_index for
+        # each state.
         lr_center_stage_eo_inner_orbit_state_indexes = self.lt_phase3_lr_center_stage.state_index_multiple(
             lr_center_stage_states
         )
@@ -3504,20 +3538,14 @@ class RubiksCube555(RubiksCube):
         eo_inner_orbit_state_indexes = self.lt_phase3_eo_inner_orbit.state_index_multiple(eo_inner_orbit_states)
 
         # build a list of tuples of the state indexes
-        pt_state_indexes = []
-        for lr_center_stage_eo_inner_orbit_state, eo_outer_orbit_state, eo_inner_orbit_state in zip(
-            lr_center_stage_states, eo_outer_orbit_states, eo_inner_orbit_states
-        ):
-            pt_state_indexes.append(
-                (
-                    lr_center_stage_eo_inner_orbit_state_indexes[lr_center_stage_eo_inner_orbit_state],
-                    eo_outer_orbit_state_indexes[eo_outer_orbit_state],
-                    eo_inner_orbit_state_indexes[eo_inner_orbit_state],
-                )
+        pt_state_indexes = list(
+            zip(
+                lr_center_stage_eo_inner_orbit_state_indexes, eo_outer_orbit_state_indexes, eo_inner_orbit_state_indexes
             )
+        )
 
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
+        self.release(original)
 
         # When solve_via_c is passed pt_state_indexes (2048 lines of states in this case), it will try all 2048 of them
         # to find the state that has the shortest solution.
@@ -3583,6 +3611,7 @@ class RubiksCube555(RubiksCube):
 
         return count
 
+    @releases_checkpoints
     def find_first_four_edges_to_pair(self):
         """
         phase-5 requires a 4-edge combo where none of the edges are in the z-plane.
@@ -3590,15 +3619,13 @@ class RubiksCube555(RubiksCube):
         different 4-edge combinations.  Try them all and see which one has the lowest
         phase-4 cost.
         """
-        original_state = self.state[:]
-        original_solution = self.solution[:]
+        original = self.checkpoint()
         original_solution_len = len(self.solution)
         results = []
 
         for wing_str_index, wing_str_combo in enumerate(itertools.combinations(wing_strs_all, 4)):
             wing_str_combo = sorted(wing_str_combo)
-            self.state = original_state[:]
-            self.solution = original_solution[:]
+            self.restore(original)
             self.lt_phase4.wing_strs = wing_str_combo
 
             if self.lt_phase4.solve():
@@ -3611,20 +3638,19 @@ class RubiksCube555(RubiksCube):
             else:
                 logger.debug(f"{wing_str_index+1}/495 {wing_str_combo} phase-4 solution length is >= 4 ")
 
-        self.lt_phase4.fh_txt_cache = {}
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
+        self.release(original)
         results.sort()
         return results
 
+    @releases_checkpoints
     def pair_first_four_edges(self, phase4_wing_str_combo: List[str]):
         tmp_solution_len = len(self.solution)
         self.lt_phase4.wing_strs = phase4_wing_str_combo
         self.lt_phase4.solve()
         self.print_cube_add_comment("4-edges prepped for pairing", tmp_solution_len)
 
-        original_state = self.state[:]
-        original_solution = self.solution[:]
+        original = self.checkpoint()
         tmp_solution_len = len(self.solution)
 
         self.edges_flip_orientation(phase4_wing_str_combo, [])
@@ -3633,24 +3659,24 @@ class RubiksCube555(RubiksCube):
         self.lt_phase5.solve_via_c()
 
         pair_four_edge_solution = self.solution[tmp_solution_len:]
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
+        self.release(original)
 
         for step in pair_four_edge_solution:
             self.rotate(step)
 
         self.print_cube_add_comment("x-plane edges paired, LR FB centers vertical bars", tmp_solution_len)
 
+    @releases_checkpoints
     def pair_last_eight_edges(self, call_print_cube: bool = True):
-        original_state = self.state[:]
-        original_solution = self.solution[:]
-        original_solution_len = len(original_solution)
-        tmp_solution_len = len(self.solution)
-
         # We need the edge swaps to be even for our edges lookup table to work.
         if self.edge_swaps_odd(False, 0, False):
             raise SolveError("edge swaps are odd, cannot pair last 8-edges")
 
+        original = self.checkpoint()
+        original_solution_len = len(self.solution)
+        tmp_solution_len = len(self.solution)
+
         self.edges_flip_orientation(wing_strs_all, [])
 
         yz_plane_edges = tuple(list(self.get_y_plane_wing_strs()) + list(self.get_z_plane_wing_strs()))
@@ -3661,14 +3687,15 @@ class RubiksCube555(RubiksCube):
         self.lt_phase6.solve_via_c()
 
         pair_eight_edge_solution = self.solution[original_solution_len:]
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
+        self.release(original)
 
         for step in pair_eight_edge_solution:
             self.rotate(step)
 
         self.print_cube_add_comment("last eight edges paired, centers solved", tmp_solution_len)
 
+    @releases_checkpoints
     def group_centers_phase1_and_2(self) -> None:
         """
         phase1 stages the centers on sides L and R
@@ -3686,8 +3713,7 @@ class RubiksCube555(RubiksCube):
         if self.centers_staged():
             return
 
-        original_state = self.state[:]
-        original_solution = self.solution[:]
+        original = self.checkpoint()
         tmp_solution_len = len(self.solution)
 
         # find multiple phase1 solutions
@@ -3699,8 +3725,7 @@ class RubiksCube555(RubiksCube):
 
         # find the phase2 solution for each phase1 solution
         for phase1_solution, (pt0_state, pt1_state, pt2_state, pt3_state, pt4_state) in phase1_solutions:
-            self.state = original_state[:]
-            self.solution = original_solution[:]
+            self.restore(original)
 
             for step in phase1_solution:
                 self.rotate(step)
@@ -3717,8 +3742,8 @@ class RubiksCube555(RubiksCube):
             pt_state_indexes_LR_centers_special.append(phase2_pt_state_indexes)
             phase2_pt_state_indexes_to_phase1_solution[phase2_pt_state_indexes] = phase1_solution
 
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
+        self.release(original)
 
         # stage the FB centers
         phase2_solutions = self.lt_FB_centers_stage.solutions_via_c(pt_states=pt_state_indexes, solution_count=1)
@@ -3759,6 +3784,7 @@ class RubiksCube555(RubiksCube):
 
         self.print_cube_add_comment("UD FB centers staged", tmp_solution_len)
 
+    @releases_checkpoints
     def pair_edges(self):
         # We need the edge swaps to be even for our phase6 lookup tables to work.
         if self.edge_swaps_odd(False, 0, False):
@@ -3766,17 +3792,15 @@ class RubiksCube555(RubiksCube):
 
         # phase 4
         # phase 5
-        original_state = self.state[:]
-        original_solution = self.solution[:]
-        original_solution_len = len(original_solution)
+        original = self.checkpoint()
+        original_solution_len = len(self.solution)
         pt_state_indexes = []
         phase5_pt_state_indexes_to_wing_str_combo = {}
 
         for phase4_solution_len, wing_str_combo in self.find_first_four_edges_to_pair():
             if phase4_solution_len >= 3:
                 break
-            self.state = original_state[:]
-            self.solution = original_solution[:]
+            self.restore(original)
 
             self.lt_phase4.wing_strs = wing_str_combo
             self.lt_phase4.solve()
@@ -3788,8 +3812,7 @@ class RubiksCube555(RubiksCube):
             phase5_pt_state_indexes_to_wing_str_combo[wing_str_combo_pt_state_indexes] = wing_str_combo
             pt_state_indexes.append(wing_str_combo_pt_state_indexes)
 
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
         phase5_solutions = self.lt_phase5.solutions_via_c(pt_states=pt_state_indexes, solution_count=500)
 
         # phase 6
@@ -3799,8 +3822,7 @@ class RubiksCube555(RubiksCube):
 
         for phase5_solution, (pt0_state, pt1_state, pt2_state, pt3_state, pt4_state) in phase5_solutions:
             wing_str_combo = phase5_pt_state_indexes_to_wing_str_combo[(pt0_state, pt1_state, pt2_state, pt3_state)]
-            self.state = original_state[:]
-            self.solution = original_solution[:]
+            self.restore(original)
 
             self.lt_phase4.wing_strs = wing_str_combo
             self.lt_phase4.solve()
@@ -3810,8 +3832,7 @@ class RubiksCube555(RubiksCube):
             self.lt_phase5_high_edge_midge.wing_strs = wing_str_combo
             self.lt_phase5_low_edge_midge.wing_strs = wing_str_combo
 
-            for step in phase5_solution:
-                self.rotate(step)
+            self.rotate_steps(phase5_solution)
 
             yz_plane_edges = tuple(list(self.get_y_plane_wing_strs()) + list(self.get_z_plane_wing_strs()))
             self.lt_phase6_high_edge_midge.ida_graph_node = None
@@ -3830,29 +3851,27 @@ class RubiksCube555(RubiksCube):
         phase5_solution = phase6_pt_state_indexes_to_phase5_solution[(pt0_state, pt1_state, pt2_state)]
 
         # apply the solution
+        self.release(original)
         self.state = self.post_eo_state
         self.solution = self.post_eo_solution[:]
 
         # phase 4
         tmp_solution_len = len(self.solution)
-        for step in phase4_solution:
-            self.rotate(step)
+        self.rotate_steps(phase4_solution)
 
         self.print_cube_add_comment("4-edges prepped for pairing", tmp_solution_len)
 
         # phase 5
         tmp_solution_len = len(self.solution)
 
-        for step in phase5_solution:
-            self.rotate(step)
+        self.rotate_steps(phase5_solution)
 
         self.print_cube_add_comment("x-plane edges paired, LR FB centers vertical bars", tmp_solution_len)
 
         # phase 6
         tmp_solution_len = len(self.solution)
 
-        for step in phase6_solution:
-            self.rotate(step)
+        self.rotate_steps(phase6_solution)
 
         self.print_cube_add_comment("last eight edges paired, centers solved", tmp_solution_len)
 
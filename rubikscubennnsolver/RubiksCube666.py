@@ -6,6 +6,7 @@ import sys
 from rubikscubennnsolver import reverse_steps
 from rubikscubennnsolver.LookupTable import LookupTable
 from rubikscubennnsolver.LookupTableIDAViaGraph import LookupTableIDAViaGraph
+from rubikscubennnsolver.misc import releases_checkpoints
 from rubikscubennnsolver.RubiksCube444 import RubiksCube444, solved_444
 from rubikscubennnsolver.RubiksCube444Misc import highlow_edge_mapping_combinations
 from rubikscubennnsolver.RubiksCube555 import RubiksCube555, solved_555
@@ -262,6 +263,8 @@ class LookupTable666LRInnerXCentersStage(LookupTable):
     Average: 6.03 moves
     """
 
+    state_positions = inner_x_centers_666
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -383,6 +386,8 @@ class LookupTable666UDInnerXCentersStage(LookupTable):
     """
 
     # fmt: off
+    state_positions = UFBD_inner_x_centers_666
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -437,6 +442,8 @@ class LookupTable666UDXCentersStage(LookupTable):
     """
 
     # fmt: off
+    state_positions = UFBD_outer_x_centers_666
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -490,6 +497,8 @@ class LookupTable666UDLeftObliqueCentersStage(LookupTable):
     """
 
     # fmt: off
+    state_positions = UFBD_left_oblique_edges_666
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -543,6 +552,8 @@ class LookupTable666UDRightObliqueCentersStage(LookupTable):
     """
 
     # fmt: off
+    state_positions = UFBD_right_oblique_edges_666
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -688,6 +699,8 @@ class LookupTable666UDLeftObliqueStage(LookupTable):
 
     state_targets = ("UUUUxxxxxxxxUUUU",)
 
+    state_positions = UFBD_left_oblique_edges_666
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -749,6 +762,8 @@ class LookupTable666UDRightObliqueStage(LookupTable):
 
     state_targets = ("UUUUxxxxxxxxUUUU",)
 
+    state_positions = UFBD_right_oblique_edges_666
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -806,6 +821,8 @@ class LookupTable666UDOuterXCenterStage(LookupTable):
     Average: 5.45 moves
     """
 
+    state_positions = UFBD_outer_x_centers_666
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -1010,6 +1027,8 @@ class LookupTable666Step50LRCenters(LookupTable):
         117, 118, 122, 123, 124, 125, 128, 129, 130, 131, 135, 136,  # Right
     )
 
+    state_positions = LR_inner_x_centers_oblique_edges_666
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -1215,6 +1234,8 @@ class LookupTable666UDInnerXCenterAndObliqueEdges(LookupTable):
     )
     # fmt: on
 
+    state_positions = UD_inner_x_centers_oblique_edges
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -1293,6 +1314,8 @@ class LookupTable666FBInnerXCenterAndObliqueEdges(LookupTable):
     )
     # fmt: on
 
+    state_positions = FB_inner_x_centers_oblique_edges
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -1376,6 +1399,8 @@ class LookupTable666LRObliqueEdges(LookupTable):
     )
     # fmt: on
 
+    state_positions = LR_oblique_edges_UFBD_inner_x_centers
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -1783,6 +1808,7 @@ class RubiksCube666(RubiksCubeNNNEvenEdges):
 
         return True
 
+    @releases_checkpoints
     def daisy_solve_centers_eo_edges(self):
         """
         The inner x-centers and oblique edges are staged. Daisy solve the centers so that our
@@ -1795,23 +1821,21 @@ class RubiksCube666(RubiksCubeNNNEvenEdges):
         # phase 5
         # - put LR centers such that they can be solved with L L' R R'
         # - EO the inside oribit of edges to prep for the 444 solver to pair those edges
-        original_state = self.state[:]
-        original_solution = self.solution[:]
+        original = self.checkpoint()
         tmp_solution_len = len(self.solution)
         pt_state_indexes_to_edge_mapping = {}
 
         # try all 2048 edge mappings
         for edges_to_flip_sets in highlow_edge_mapping_combinations.values():
             for edge_mapping in edges_to_flip_sets:
-                self.state = original_state[:]
-                self.solution = original_solution[:]
+                self.restore(original)
                 self.edge_mapping = edge_mapping
                 pt_state_indexes_to_edge_mapping[
                     tuple([pt.state_index() for pt in self.lt_step50.prune_tables])
                 ] = edge_mapping
 
-        self.state = original_state[:]
-        self.solution = original_solution[:]
+        self.restore(original)
+        self.release(original)
         phase5_solutions = self.lt_step50.solutions_via_c(
             pt_states=pt_state_indexes_to_edge_mapping.keys(), solution_count=1
         )
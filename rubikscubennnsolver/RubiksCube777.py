@@ -168,6 +168,8 @@ class LookupTable777Phase4TCenters(LookupTable):
     """
 
     # fmt: off
+    state_positions = UFBD_inner_t_centers_777
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -222,6 +224,8 @@ class LookupTable777Phase4XCenters(LookupTable):
     """
 
     # fmt: off
+    state_positions = UFBD_inner_x_centers_777
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -274,6 +278,8 @@ class LookupTable777Phase4LeftOblique(LookupTable):
     Average: 4.52 moves
     """
 
+    state_positions = UFBD_left_oblique_777
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -327,6 +333,8 @@ class LookupTable777Phase4RightOblique(LookupTable):
     Average: 4.52 moves
     """
 
+    state_positions = UFBD_right_oblique_777
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -383,6 +391,8 @@ class LookupTable777Phase4MiddleOblique(LookupTable):
     Average: 6.34 moves
     """
 
+    state_positions = UFBD_middle_oblique_777
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -577,6 +587,8 @@ class LookupTable777Phase5LeftOblique(LookupTable):
     Average: 6.27 moves
     """
 
+    state_positions = UFBD_left_oblique_777
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -635,6 +647,8 @@ class LookupTable777Phase5RightOblique(LookupTable):
     Average: 6.27 moves
     """
 
+    state_positions = UFBD_right_oblique_777
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -693,6 +707,8 @@ class LookupTable777Phase5MiddleOblique(LookupTable):
     Average: 6.34 moves
     """
 
+    state_positions = UFBD_middle_oblique_777
+
     def __init__(self, parent, build_state_index: bool = False):
         LookupTable.__init__(
             self,
@@ -929,6 +945,8 @@ class LookupTable777Step41(LookupTable):
     )
     # fmt: on
 
+    state_positions = LR_oblique_edges_and_outer_t_center
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -1032,6 +1050,8 @@ class LookupTable777Step42(LookupTable):
     )
     # fmt: on
 
+    state_positions = LR_inside_centers_and_left_oblique_edges
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -1135,6 +1155,8 @@ class LookupTable777Step43(LookupTable):
         "LRLRRRLRRRLRLRLRLLLRLLLRLR",
     )
 
+    state_positions = LR_inside_centers_and_outer_t_centers
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -1238,6 +1260,8 @@ class LookupTable777Step44(LookupTable):
     ]
     # fmt: on
 
+    state_positions = LR_inside_centers_and_right_oblique_edges
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -1405,6 +1429,8 @@ class LookupTable777Step51(LookupTable):
     )
     # fmt: on
 
+    state_positions = UD_oblique_edges_and_outer_t_center
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -1510,6 +1536,8 @@ class LookupTable777Step52(LookupTable):
     )
     # fmt: on
 
+    state_positions = UD_inside_centers_and_left_oblique_edges
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -1616,6 +1644,8 @@ class LookupTable777Step53(LookupTable):
     )
     # fmt: on
 
+    state_positions = UD_inside_centers_and_outer_t_centers
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -1722,6 +1752,8 @@ class LookupTable777Step54(LookupTable):
     ]
     # fmt: on
 
+    state_positions = UD_inside_centers_and_right_oblique_edges
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -1785,6 +1817,8 @@ class LookupTable777Step55(LookupTable):
 
     state_targets = ("LLLLLLLLLLLLLLLLLLLLLRRRRRRRRRRRRRRRRRRRRR", "RRRRLLLRRLLLRRLLLRRRRLLLLRRRLLRRRLLRRRLLLL")
 
+    state_positions = LR_centers_minus_outside_x_centers_777
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -1878,6 +1912,8 @@ class LookupTable777Step61(LookupTable):
 
     state_targets = ("UUUUUUUUUUUUUUUUUUUUUDDDDDDDDDDDDDDDDDDDDD", "DDDDUUUDDUUUDDUUUDDDDUUUUDDDUUDDDUUDDDUUUU")
 
+    state_positions = UD_centers_minus_outside_x_centers_777
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -1941,6 +1977,8 @@ class LookupTable777Step62(LookupTable):
 
     state_targets = ("LLLLLLLLLLLLLLLLLLLLLRRRRRRRRRRRRRRRRRRRRR", "RRRRLLLRRLLLRRLLLRRRRLLLLRRRLLRRRLLRRRLLLL")
 
+    state_positions = LR_centers_minus_outside_x_centers_777
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -2010,6 +2048,8 @@ class LookupTable777Step65(LookupTable):
 
     state_targets = ("FFFFFFFFFFFFFBBBBBBBBBBBBB", "BFFFBFFFBFFFBFBBBFBBBFBBBF")
 
+    state_positions = FB_inside_centers_and_outer_t_centers
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -2079,6 +2119,8 @@ class LookupTable777Step66(LookupTable):
 
     state_targets = ("BBBBBBBBBBBBFFFFFFFFFFFF", "FFFFFFFFFFFFBBBBBBBBBBBB")
 
+    state_positions = FB_oblique_edges_and_outer_t_center
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -2210,6 +2252,8 @@ class LookupTable777Step71(LookupTable):
 
     state_targets = ("UUUUUUUUUUUUUUUUUUUUUDDDDDDDDDDDDDDDDDDDDD",)
 
+    state_positions = UD_centers_minus_outside_x_centers_777
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -2311,6 +2355,8 @@ class LookupTable777Step72(LookupTable):
 
     state_targets = ("LLLLLLLLLLLLLLLLLLLLLRRRRRRRRRRRRRRRRRRRRR",)
 
+    state_positions = LR_centers_minus_outside_x_centers_777
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -2408,6 +2454,8 @@ class LookupTable777Step75(LookupTable):
 
     state_targets = ("FFFFFFFFFFFFFBBBBBBBBBBBBB",)
 
+    state_positions = FB_inside_centers_and_outer_t_centers
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -2502,6 +2550,8 @@ class LookupTable777Step76(LookupTable):
 
     state_targets = ("FFFFFFFFFFFFBBBBBBBBBBBB",)
 
+    state_positions = FB_oblique_edges_and_outer_t_center
+
     def __init__(self, parent, build_state_index=False):
         # fmt: off
         LookupTable.__init__(
@@ -0,0 +1,169 @@
+# standard libraries
+import logging
+from operator import itemgetter
+from typing import Any, List, Tuple
+
+try:
+    # third party libraries
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+class RubiksCubeBatch(object):
+    """
+    Many states of the same size cube.  With numpy the states are a (N, squares) uint8 array with one
+    row per state so a move, a sequence of moves or a different permutation per row is applied to
+    every row with a single gather.  Without numpy the states are a list of lists and each row is
+    permuted on its own, this is no faster than using the cube but gives the caller one code path.
+    """
+
+    def __init__(self, parent: Any, states: List[List[str]]):
+        """
+        Args:
+            parent: a cube of the same size as ``states``, its moves are used to permute the rows
+            states: a list of cube states, every square other than the 0 placeholder must be one character
+        """
+        self.parent = parent
+
+        if np is None:
+            self.states = [["x"] + list(state[1:]) for state in states]
+        else:
+            self.states = np.array(
+                [np.frombuffer(("x" + "".join(state[1:])).encode(), dtype=np.uint8) for state in states],
+                dtype=np.uint8,
+            ).reshape(len(states), len(parent.state))
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def state(self, index: int) -> List[str]:
+        """
+        Returns:
+            the state of row ``index`` in the format used by RubiksCube.state
+        """
+        if np is None:
+            return self.states[index][:]
+
+        return list(self.states[index].tobytes().decode())
+
+    def permute(self, permutation: Tuple[int]) -> None:
+        """
+        Apply ``permutation`` to every row, the new row is ``[row[x] for x in permutation]``
+        """
+        if np is None:
+            getter = itemgetter(*permutation)
+            self.states = [list(getter(state)) for state in self.states]
+        else:
+            self.states = self.states[:, permutation]
+
+    def permute_rows(self, permutations: List[Tuple[int]]) -> None:
+        """
+        Apply a different permutation to each row
+
+        Args:
+            permutations: one permutation per row
+        """
+        if len(permutations) != len(self.states):
+            raise ValueError(f"{len(permutations)} permutations for {len(self.states)} rows")
+
+        if np is None:
+            self.states = [
+                list(itemgetter(*permutation)(state)) for state, permutation in zip(self.states, permutations)
+            ]
+        elif permutations:
+            self.states = np.take_along_axis(self.states, np.array(permutations, dtype=np.intp), axis=1)
+
+    def rotate(self, step: str) -> None:
+        """
+        Apply ``step`` to every row
+        """
+        self.permute(self.parent.get_rotate_permutation(step))
+
+    def rotate_steps(self, steps: List[str]) -> None:
+        """
+        Apply all of ``steps`` to every row via a single permutation
+        """
+        self.permute(self.parent.get_rotate_steps_permutation(tuple(steps)))
+
+    def rotate_rows(self, steps_per_row: List[List[str]]) -> None:
+        """
+        Apply a different sequence of steps to each row.  With numpy the sequences are lined up in a
+        (N, longest sequence) array of moves so we do one gather per step for all of the rows.
+
+        Args:
+            steps_per_row: the steps to apply to each row, COMMENT steps are ignored
+        """
+        if len(steps_per_row) != len(self.states):
+            raise ValueError(f"{len(steps_per_row)} sequences of steps for {len(self.states)} rows")
+
+        steps_per_row = [[step for step in steps if step and not step.startswith("COMMENT")] for steps in steps_per_row]
+
+        if np is None:
+            self.permute_rows([self.parent.get_rotate_steps_permutation(tuple(steps)) for steps in steps_per_row])
+            return
+
+        # move 0 is the identity, it pads the sequences that are shorter than the longest one
+        move_indexes = {}
+        permutations = [tuple(range(len(self.parent.state)))]
+        max_steps = max([len(steps) for steps in steps_per_row], default=0)
+        moves = np.zeros((len(steps_per_row), max_steps), dtype=np.intp)
+
+        for row, steps in enumerate(steps_per_row):
+            for column, step in enumerate(steps):
+                move_index = move_indexes.get(step)
+
+                if move_index is None:
+                    move_index = len(permutations)
+                    move_indexes[step] = move_index
+                    permutations.append(self.parent.get_rotate_permutation(step))
+
+                moves[row, column] = move_index
+
+        permutations = np.array(permutations, dtype=np.intp)
+
+        for column in range(max_steps):
+            self.states = np.take_along_axis(self.states, permutations[moves[:, column]], axis=1)
+
+    def table_states(self, table: Any) -> List[str]:
+        """
+        Args:
+            table: a LookupTable whose parent is our parent
+
+        Returns:
+            what ``table.state()`` returns for each row.  For a table with ``state_positions`` each
+            character of the state only depends on one square so we call ``table.state()`` once per
+            distinct square value to build a map from (position, value) to state character and then
+            build every row's state with one fancy index.  For other tables we load each row into
+            our parent and call ``table.state()``.
+        """
+        original_state = self.parent.state
+
+        try:
+            if np is not None and table.state_positions is not None:
+                positions = np.array(table.state_positions, dtype=np.intp)
+                values = self.states[:, positions]
+                value_to_char = np.zeros((len(positions), 256), dtype=np.uint8)
+
+                for value in np.unique(values):
+                    self.parent.state = original_state[:]
+
+                    for position in table.state_positions:
+                        self.parent.state[position] = chr(value)
+
+                    value_to_char[:, value] = np.frombuffer(table.state().encode(), dtype=np.uint8)
+
+                chars = np.ascontiguousarray(value_to_char[np.arange(len(positions)), values])
+                return [row.decode() for row in chars.view(f"S{len(positions)}").ravel().tolist()]
+
+            result = []
+
+            for index in range(len(self.states)):
+                self.parent.state = self.state(index)
+                result.append(table.state())
+
+            return result
+        finally:
+            self.parent.state = original_state
@@ -229,15 +229,19 @@ class RubiksCubeNNNEven(RubiksCubeNNNEvenEdges):
             half_size = str(int(self.size / 2))
             wide_size = str(int(half_size) - 1 - center_orbit_id)
 
+            steps = []
+
             for step in fake_666.solution:
                 if step.startswith("COMMENT"):
-                    self.solution.append(step)
+                    steps.append(step)
                 elif step.startswith("3"):
-                    self.rotate(half_size + step[1:])
+                    steps.append(half_size + step[1:])
                 elif "w" in step:
-                    self.rotate(wide_size + step)
+                    steps.append(wide_size + step)
                 else:
-                    self.rotate(step)
+                    steps.append(step)
+
+            self.rotate_steps(steps)
 
         fake_666 = None
 
@@ -272,5 +276,4 @@ class RubiksCubeNNNEven(RubiksCubeNNNEvenEdges):
         fake_odd.print_cube("NNN odd cube")
         fake_odd.solve()
 
-        for step in fake_odd.solution:
-            self.rotate(step)
+        self.rotate_steps(fake_odd.solution)
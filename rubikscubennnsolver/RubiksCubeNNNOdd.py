@@ -296,15 +296,19 @@ class RubiksCubeNNNOdd(RubiksCubeNNNOddEdges):
         half_size = str(ceil(self.size / 2) - 1 - cycle)
         wide_size = str(ceil(self.size / 2) - 2 - center_orbit_id)
 
+        steps = []
+
         for step in self.fake_777.solution:
             if step.startswith("COMMENT"):
-                self.solution.append(step)
+                steps.append(step)
             elif step.startswith("3"):
-                self.rotate(half_size + step[1:])
+                steps.append(half_size + step[1:])
             elif "w" in step:
-                self.rotate(wide_size + step)
+                steps.append(wide_size + step)
             else:
-                self.rotate(step)
+                steps.append(step)
+
+        self.rotate_steps(steps)
 
         self.print_cube_add_comment(
             "NNN orbit %d/%d, cycle %d/%d, width %d, x-centers %s"
@@ -8,11 +8,12 @@ import shutil
 import subprocess
 import sys
 from collections import OrderedDict
+from operator import itemgetter
 from pprint import pformat
 from typing import List, Tuple, Union
 
 # rubiks cube libraries
-from rubikscubennnsolver.misc import get_swap_count
+from rubikscubennnsolver.misc import get_swap_count, releases_checkpoints
 from rubikscubennnsolver.RubiksSide import Side, SolveError, StuckInALoop
 
 if sys.version_info < (3, 6):
@@ -23,6 +24,17 @@ logger = logging.getLogger(__name__)
 HTML_DIRECTORY = "/tmp/rubiks-cube-NxNxN-solver/"
 HTML_FILENAME = os.path.join(HTML_DIRECTORY, "index.html")
 
+# (size, action) to the permutation for that action and an itemgetter that applies it, see rotate()
+rotate_permutations = {}
+rotate_getters = {}
+
+# the sizes whose swaps have been loaded into rotate_permutations
+rotate_permutations_loaded = set()
+
+# (size, steps) to an itemgetter that applies all of the steps at once, see rotate_steps()
+rotate_steps_getters = OrderedDict()
+ROTATE_STEPS_GETTERS_MAX = 1024
+
 # standardize wing string naming convention
 wing_str_map = {
     "UB": "UB",
@@ -491,6 +503,7 @@ class RubiksCube(object):
 
         self.size = int(self.size)
         self.solution = []
+        self.checkpoints = []
         self.ida_count = 0
         self._phase = None
         self.lt_init_called = False
@@ -667,6 +680,7 @@ class RubiksCube(object):
         """
         self.state = self.state_backup[:]
         self.solution = []
+        self.checkpoints = []
         self.original_state = self.state_backup[:]
         self.original_solution = []
 
@@ -738,6 +752,68 @@ class RubiksCube(object):
                 return False
         return True
 
+    def checkpoint(self) -> Tuple:
+        """
+        Save the state and solution so they can be put back via restore().  Checkpoints work like
+        savepoints, restoring a checkpoint releases the checkpoints that were taken after it.  Decorate
+        the method that takes the checkpoint with @releases_checkpoints so it is released even if the
+        method raises.
+
+        The token holds on to the ``self.solution`` list rather than a copy of it, restore() truncates
+        that list in place.  Copy ``self.solution`` if you need to keep it past a restore().
+
+        Returns:
+            a token to pass to restore() and release()
+        """
+        token = (len(self.checkpoints), self.state, self.solution, len(self.solution))
+        self.checkpoints.append(token)
+        return token
+
+    def _checkpoint_index(self, token: Tuple) -> int:
+        index = token[0]
+
+        if index >= len(self.checkpoints) or self.checkpoints[index] is not token:
+            raise ValueError(f"{self}: checkpoint {index} was released")
+
+        return index
+
+    def restore(self, token: Tuple) -> None:
+        """
+        Put the state and solution back to where they were when ``token`` was created.  The solution
+        only has steps appended to it so it is truncated in place, the cost is the number of steps done
+        since the checkpoint.  The state is not copied, see unshare_state().  The list that was ``self.solution`` when
+        ``token`` was created is truncated, any other reference to it is cut short as well.
+
+        Args:
+            token: from checkpoint()
+        """
+        index = self._checkpoint_index(token)
+        del self.checkpoints[index + 1 :]
+        (_, state, solution, solution_len) = token
+        self.state = state
+        del solution[solution_len:]
+        self.solution = solution
+
+    def unshare_state(self) -> None:
+        """
+        A checkpoint holds on to the ``self.state`` list instead of a copy of it, this is safe because
+        rotate() builds a new list for every move.  Call this before writing squares of ``self.state``
+        in place (nuke_corners, recolor, etc), ``self.state`` is copied if a checkpoint holds on to it.
+        """
+        for token in self.checkpoints:
+            if token[1] is self.state:
+                self.state = self.state[:]
+                break
+
+    def release(self, token: Tuple) -> None:
+        """
+        Drop ``token`` and the checkpoints that were taken after it
+
+        Args:
+            token: from checkpoint()
+        """
+        del self.checkpoints[self._checkpoint_index(token) :]
+
     def rotate_guts(self, action: str) -> None:
         """
         self.state is a dictionary where the key is the square_index and the value is that square side name
@@ -1208,9 +1284,73 @@ class RubiksCube(object):
         else:
             raise ValueError(f"Unsupported action {action}")
 
+    def build_rotate_permutation(self, action: str) -> Tuple[int]:
+        """
+        Apply ``action`` via rotate_guts() to a state where each square holds its own index
+
+        Args:
+            action: the step to apply to the cube
+
+        Returns:
+            the permutation for ``action``, the new state is ``[state[x] for x in permutation]``
+        """
+        original_state = self.state
+        original_solution = self.solution
+        self.state = list(range(len(original_state)))
+        self.solution = []
+
+        try:
+            self._rotate_uncached(action)
+            return tuple(self.state)
+        finally:
+            self.state = original_state
+            self.solution = original_solution
+
+    def load_rotate_permutations(self) -> None:
+        """
+        Load the swaps for every move of this size of cube, these come from swaps.py for 2x2x2
+        through 7x7x7 and from swaps_nnn.py for everything bigger.
+        """
+        # rubiks cube libraries
+        from rubikscubennnsolver.LookupTable import get_swaps
+
+        rotate_permutations_loaded.add(self.size)
+
+        for action, permutation in get_swaps(self.size).items():
+            key = (self.size, action)
+
+            if key not in rotate_permutations:
+                rotate_permutations[key] = permutation
+                rotate_getters[key] = itemgetter(*permutation)
+
+    def get_rotate_permutation(self, action: str) -> Tuple[int]:
+        """
+        The swaps for this size of cube are loaded the first time we are called, any ``action`` that
+        is not in them is built via build_rotate_permutation().  Both are cached for all cubes of this size.
+
+        Args:
+            action: the step to apply to the cube
+
+        Returns:
+            the permutation for ``action``, the new state is ``[state[x] for x in permutation]``
+        """
+        key = (self.size, action)
+
+        if self.size not in rotate_permutations_loaded:
+            self.load_rotate_permutations()
+
+        permutation = rotate_permutations.get(key)
+
+        if permutation is None:
+            permutation = self.build_rotate_permutation(action)
+            rotate_permutations[key] = permutation
+            rotate_getters[key] = itemgetter(*permutation)
+
+        return permutation
+
     def rotate(self, action: str) -> None:
         """
-        self.state is a dictionary where the key is the square_index and the value is that square side name
+        self.state is a list where the index is the square_index and the value is that square side name
         (U, F, etc). Apply the ``action`` step to the cube by updating self.state.
 
         Args:
@@ -1221,9 +1361,66 @@ class RubiksCube(object):
 
         if action.startswith("COMMENT"):
             self.solution.append(action)
+            return
+
+        getter = rotate_getters.get((self.size, action))
+
+        if getter is None:
+            self.get_rotate_permutation(action)
+            getter = rotate_getters[(self.size, action)]
+
+        self.state = list(getter(self.state))
+        self.solution.append(action)
+
+    def get_rotate_steps_permutation(self, steps: Tuple[str]) -> Tuple[int]:
+        """
+        Args:
+            steps: the steps to apply to the cube, COMMENT steps are ignored
+
+        Returns:
+            the permutation for doing all of ``steps``, the new state is ``[state[x] for x in permutation]``
+        """
+        permutation = tuple(range(len(self.state)))
+
+        for step in steps:
+            if not step.startswith("COMMENT"):
+                permutation = itemgetter(*self.get_rotate_permutation(step))(permutation)
 
+        return permutation
+
+    def rotate_steps(self, steps: List[str]) -> None:
+        """
+        Apply all of ``steps`` to the cube via a single permutation, this has the same result as calling
+        rotate() for each step.  The permutation is cached so replaying the same steps again is cheap.
+
+        Args:
+            steps: the steps to apply to the cube
+        """
+        steps = tuple(step for step in steps if step is not None)
+        key = (self.size, steps)
+        getter = rotate_steps_getters.get(key)
+
+        if getter is None:
+            getter = itemgetter(*self.get_rotate_steps_permutation(steps))
+            rotate_steps_getters[key] = getter
+
+            if len(rotate_steps_getters) > ROTATE_STEPS_GETTERS_MAX:
+                rotate_steps_getters.popitem(last=False)
+        else:
+            rotate_steps_getters.move_to_end(key)
+
+        self.state = list(getter(self.state))
+        self.solution.extend(steps)
+
+    def _rotate_uncached(self, action: str) -> None:
+        """
+        Apply ``action`` by way of rotate_guts(), this is only used to build the permutations for rotate()
+
+        Args:
+            action: the step to apply to the cube
+        """
         # fmt: off
-        elif action in (
+        if action in (
             "x2",
             "y2",
             "z2",
@@ -3681,6 +3878,7 @@ class RubiksCube(object):
             return True
         return False
 
+    @releases_checkpoints
     def get_edge_swap_count(self, edges_paired: bool, orbit: int, debug: bool = False) -> int:
         """
         Args:
@@ -3871,8 +4069,8 @@ class RubiksCube(object):
                 square1_with_x = square1 + "x"
                 square2_with_x = square2 + "x"
 
-                original_state = self.state[:]
-                original_solution = self.solution[:]
+                original = self.checkpoint()
+                self.unshare_state()
                 self.state[square_index] = square1_with_x
                 self.state[partner_index] = square2_with_x
 
@@ -3940,8 +4138,8 @@ class RubiksCube(object):
                     target_side = self.sideD
 
                 else:
-                    self.state = original_state[:]
-                    self.solution = original_solution[:]
+                    self.restore(original)
+                    self.release(original)
                     self.enable_print_cube = True
                     self.print_cube_layout()
                     msg = f"invalid wing {wing_str} at ({square_index}, {partner_index})"
@@ -3960,16 +4158,16 @@ class RubiksCube(object):
 
                         break
                 else:
-                    self.state = original_state[:]
-                    self.solution = original_solution[:]
+                    self.restore(original)
+                    self.release(original)
                     self.enable_print_cube = True
                     self.print_cube_layout()
                     msg = f"Could not find wing {wing_str} ({square_index}, {partner_index}) among {edge_to_check}"
                     self.print_cube(msg)
                     raise SolveError(msg)
 
-                self.state = original_state[:]
-                self.solution = original_solution[:]
+                self.restore(original)
+                self.release(original)
 
             current_edges.append(wing_str)
 
@@ -4112,6 +4310,7 @@ class RubiksCube(object):
 
         return solved
 
+    @releases_checkpoints
     def rotate_for_best_centers(self, staging: bool, centers: List[int]) -> bool:
         """
         Rotate the cube so that more centers are staged or solved
@@ -4128,8 +4327,8 @@ class RubiksCube(object):
         max_best_centers_solution = None
 
         # save cube state
-        original_state = self.state[:]
-        original_solution = self.solution[:]
+        original = self.checkpoint()
+        original_solution_len = len(self.solution)
 
         for upper_side_name in ("U", "D", "L", "F", "R", "B"):
             for front_side_name in ("F", "R", "B", "L", "U", "D"):
@@ -4137,8 +4336,7 @@ class RubiksCube(object):
                     continue
 
                 # Put the cube back in its original state
-                self.state = original_state[:]
-                self.solution = original_solution[:]
+                self.restore(original)
 
                 if upper_side_name == "U":
                     if front_side_name == "D":
@@ -4245,13 +4443,15 @@ class RubiksCube(object):
                 if best_centers > max_best_centers:
                     max_best_centers = best_centers
                     max_best_centers_state = self.state[:]
-                    max_best_centers_solution = self.solution[:]
+                    max_best_centers_solution = self.solution[original_solution_len:]
 
-        self.state = max_best_centers_state[:]
-        self.solution = max_best_centers_solution[:]
+        self.restore(original)
+        self.release(original)
+        self.state = max_best_centers_state
+        self.solution.extend(max_best_centers_solution)
 
         # Return True if we rotated the cube
-        if self.solution == original_solution:
+        if not max_best_centers_solution:
             return False
         else:
             return True
@@ -4484,6 +4684,8 @@ class RubiksCube(object):
             if self.use_nuke_centers:
                 self.nuke_centers()
 
+            self.unshare_state()
+
             for x in self.recolor_positions:
                 x_color = self.state[x]
                 x_new_color = self.recolor_map.get(x_color)
@@ -4506,13 +4708,13 @@ class RubiksCube(object):
         if not self.edges_paired():
             self.group_edges()
 
+    @releases_checkpoints
     def reduce_333_slow(self) -> None:
         """
         Solve the centers and pair the edges to reduce the cube to a 3x3x3 but try a few re-colorings to try
         to find a shorter solution.  This is only used when doing a FMC (Fewest Move Challenge).
         """
-        tmp_state = self.state[:]
-        tmp_solution = self.solution[:]
+        original = self.checkpoint()
         original_solution_len = len(self.solution)
 
         min_solution_len = None
@@ -4551,14 +4753,10 @@ class RubiksCube(object):
             else:
                 logger.warning("%s: (%s, %s) solution_len %d\n\n\n\n\n\n\n" % (self, top, bottom, solution_len))
 
-            self.state = tmp_state[:]
-            self.solution = tmp_solution[:]
+            self.restore(original)
 
-        for step in min_solution[original_solution_len:]:
-            if step.startswith("COMMENT"):
-                self.solution.append(step)
-            else:
-                self.rotate(step)
+        self.release(original)
+        self.rotate_steps(min_solution[original_solution_len:])
 
     def reduced_to_333(self) -> bool:
         """
@@ -4661,6 +4859,8 @@ class RubiksCube(object):
         """
         Set all of the corner squares to "."
         """
+        self.unshare_state()
+
         for side in list(self.sides.values()):
             for square_index in side.corner_pos:
                 self.state[square_index] = "."
@@ -4669,6 +4869,8 @@ class RubiksCube(object):
         """
         Set all of the center squares to "."
         """
+        self.unshare_state()
+
         for side in list(self.sides.values()):
             for square_index in side.center_pos:
                 self.state[square_index] = "."
@@ -4677,6 +4879,8 @@ class RubiksCube(object):
         """
         Set all of the edge squares to "."
         """
+        self.unshare_state()
+
         for side in list(self.sides.values()):
             for square_index in side.edge_pos:
                 self.state[square_index] = "."
@@ -141,8 +141,8 @@ struct ida_heuristic_result ida_heuristic_LR_oblique_edges_stage_777(char *cube)
             result.cost_to_goal = 12;
             break;
         default:
-            printf("invalid case %d\n", result.unpaired_count);
-            exit(1);
+            ida_printf("invalid case %d\n", result.unpaired_count);
+            ida_exit(1);
             break;
     }
 
@@ -285,8 +285,8 @@ struct ida_heuristic_result ida_heuristic_UD_oblique_edges_stage_777(char *cube)
             result.cost_to_goal = 12;
             break;
         default:
-            printf("invalid case %d\n", result.unpaired_count);
-            exit(1);
+            ida_printf("invalid case %d\n", result.unpaired_count);
+            ida_exit(1);
             break;
     }
 
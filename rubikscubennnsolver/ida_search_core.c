@@ -2,27 +2,171 @@
 #include "ida_search_core.h"
 
 #include <stdarg.h>
+#include <stddef.h>
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 #include <sys/time.h>
 #include <time.h>
 
+unsigned char output_format_jsonl = 0;
+
+jmp_buf *ida_exit_jmp = NULL;
+int ida_exit_rc = 0;
+
+// exit() for the command line and --server. When the search runs in-process via ida_lib_solve() we
+// return to ida_lib_solve() with rc instead, a bad arg or a missing table must not kill the python
+// interpreter.
+void ida_exit(int rc) {
+    if (ida_exit_jmp) {
+        ida_exit_rc = rc;
+        longjmp(*ida_exit_jmp, 1);
+    }
+
+    exit(rc);
+}
+
+struct ida_output *ida_output = NULL;
+
+// Make room for len more bytes in ida_output, returns 0 if the buffer could not be grown
+unsigned char ida_output_reserve(size_t len) {
+    size_t size = ida_output->size ? ida_output->size : 4096;
+    char *buffer = NULL;
+
+    while (size < ida_output->len + len) {
+        size *= 2;
+    }
+
+    if (size != ida_output->size) {
+        buffer = realloc(ida_output->buffer, size);
+
+        if (!buffer) {
+            return 0;
+        }
+
+        ida_output->buffer = buffer;
+        ida_output->size = size;
+    }
+
+    return 1;
+}
+
+// If the buffer cannot be grown the output is truncated and ida_output->failed is set, the search
+// itself carries on.
+void ida_vprintf(const char *fmt, va_list args) {
+    va_list args_copy;
+    int len;
+
+    if (!ida_output) {
+        vprintf(fmt, args);
+        return;
+    }
+
+    if (ida_output->failed) {
+        return;
+    }
+
+    va_copy(args_copy, args);
+    len = vsnprintf(NULL, 0, fmt, args_copy);
+    va_end(args_copy);
+
+    if (len < 0 || !ida_output_reserve(len + 1)) {
+        ida_output->failed = 1;
+        return;
+    }
+
+    vsnprintf(&ida_output->buffer[ida_output->len], ida_output->size - ida_output->len, fmt, args);
+    ida_output->len += len;
+}
+
+void ida_printf(const char *fmt, ...) {
+                va_list args;
+
+    va_start(args, fmt);
+    ida_vprintf(fmt, args);
+    va_end(args);
+}
+
+void ida_putchar(char c) {
+    if (!ida_output) {
+        putchar(c);
+        return;
+    }
+
+    if (ida_output->failed) {
+        return;
+    }
+
+    if (!ida_output_reserve(2)) {
+        ida_output->failed = 1;
+        return;
+    }
+
+    ida_output->buffer[ida_output->len++] = c;
+    ida_output->buffer[ida_output->len] = '\0';
+}
+
 void LOG(const char *fmt, ...) {
     char date[20];
+    char message[4096];
     struct timeval tv;
     va_list args;
 
     /* print the progname, version, and timestamp */
     gettimeofday(&tv, NULL);
     strftime(date, sizeof(date) / sizeof(*date), "%Y-%m-%dT%H:%M:%S", gmtime(&tv.tv_sec));
-    printf("[%s.%03d] ", date, (int)tv.tv_usec / 1000);
+
+    if (output_format_jsonl) {
+        // the message is kept verbatim so the caller can rebuild the text log
+        int len = snprintf(message, sizeof(message), "[%s.%03d] ", date, (int)tv.tv_usec / 1000);
+
+        va_start(args, fmt);
+        vsnprintf(&message[len], sizeof(message) - len, fmt, args);
+        va_end(args);
+
+        ida_printf("{\"type\": \"log\", \"message\": ");
+        print_json_string(message);
+        ida_printf("}\n");
+        return;
+    }
+
+    ida_printf("[%s.%03d] ", date, (int)tv.tv_usec / 1000);
 
     /* printf like normal */
     va_start(args, fmt);
-    vprintf(fmt, args);
+    ida_vprintf(fmt, args);
     va_end(args);
 }
 
+void print_json_string(const char *str) {
+    ida_putchar('"');
+
+    for (const unsigned char *p = (const unsigned char *)str; *p; p++) {
+        switch (*p) {
+            case '"':
+                ida_printf("\\\"");
+                break;
+            case '\\':
+                ida_printf("\\\\");
+                break;
+            case '\n':
+                ida_printf("\\n");
+                break;
+            case '\t':
+                ida_printf("\\t");
+                break;
+            default:
+                if (*p < 0x20) {
+                    ida_printf("\\u%04x", *p);
+                } else {
+                    ida_putchar(*p);
+                }
+        }
+    }
+
+    ida_putchar('"');
+}
+
 unsigned long hex_to_int(char value) {
     // This is faster than calling strtoul()
     switch (value) {
@@ -59,70 +203,169 @@ unsigned long hex_to_int(char value) {
         case 'f':
             return 15;
         default:
-            printf("ERROR: hex_to_int does not support '%c'\n", value);
-            exit(1);
+            ida_printf("ERROR: hex_to_int does not support '%c'\n", value);
+            ida_exit(1);
     };
 }
 
 unsigned long max(unsigned long a, unsigned long b) { return (a > b ? a : b); }
 
-// uthash references
-// http://troydhanson.github.io/uthash/index.html
-// https://cfsa-pmw.warwick.ac.uk/SDF/SDF_C/blob/3cf5bf49856ef9ee4080cf6722cf9058a1e28b01/src/uthash/tests/example.c
-inline void hash_add(struct key_value_pair **hashtable, char *state_key, unsigned long value) {
-    struct key_value_pair *s;
+// The table holds as many entries (plus a cube_bytes copy of the cube for each) as fit in budget_bytes,
+// rounded down to a power of 2. The entries are kept if the budget and cube_bytes have not changed so a
+// --server process only allocates the table once.
+void tt_init(struct transposition_table *tt, unsigned long long budget_bytes, unsigned long long cube_bytes) {
+    unsigned long long entry_bytes = sizeof(struct tt_entry) + cube_bytes;
+    unsigned long long size = 0;
+
+    if (budget_bytes >= entry_bytes) {
+        size = 1;
+
+        while (size * 2 * entry_bytes <= budget_bytes) {
+            size *= 2;
+        }
+    }
+
+    if (size != tt->size || cube_bytes != tt->cube_bytes) {
+        tt_free(tt);
+
+        if (size) {
+            tt->entries = calloc(size, sizeof(struct tt_entry));
+            tt->cubes = cube_bytes ? malloc(size * cube_bytes) : NULL;
+
+            if (!tt->entries || (cube_bytes && !tt->cubes)) {
+                ida_printf("ERROR: could not allocate a %llu byte transposition table\n", size * entry_bytes);
+                tt_free(tt);
+                ida_exit(1);
+            }
+
+            tt->size = size;
+            tt->cube_bytes = cube_bytes;
+        }
+    }
+}
+
+void tt_free(struct transposition_table *tt) {
+    if (tt->entries) {
+        free(tt->entries);
+    }
 
-    s = malloc(sizeof(struct key_value_pair));
-    strcpy(s->state, state_key);
-    s->value = value;
+    if (tt->cubes) {
+        free(tt->cubes);
+    }
 
-    HASH_ADD_STR(*hashtable, state, s);
+    tt->entries = NULL;
+    tt->cubes = NULL;
+    tt->cube_bytes = 0;
+    tt->size = 0;
+    tt->generation = 0;
 }
 
-inline struct key_value_pair *hash_find(struct key_value_pair **hashtable, char *state_key) {
-    struct key_value_pair *s = NULL;
-    HASH_FIND_STR(*hashtable, state_key, s);
-    return s;
+// Entries from an older generation are treated as empty so we only have to touch the whole table
+// when the generation counter wraps.
+void tt_new_generation(struct transposition_table *tt) {
+    tt->generation++;
+    tt->hits = 0;
+    tt->stores = 0;
+    tt->replacements = 0;
+
+    if (!tt->generation) {
+        memset(tt->entries, 0, tt->size * sizeof(struct tt_entry));
+        tt->generation = 1;
+    }
 }
 
-void hash_delete(struct key_value_pair **hashtable, struct key_value_pair *s) {
-    HASH_DEL(*hashtable, s);
-    free(s);
+unsigned long long tt_mix(unsigned long long hash, unsigned long long value) {
+    hash ^= value + 0x9e3779b97f4a7c15ULL + (hash << 6) + (hash >> 2);
+    return hash;
 }
 
-void hash_delete_all(struct key_value_pair **hashtable) {
-    struct key_value_pair *s, *tmp;
+unsigned long long tt_hash_bytes(char *buffer, unsigned long size) {
+    // FNV-1a
+    unsigned long long hash = 0xcbf29ce484222325ULL;
 
-    HASH_ITER(hh, *hashtable, s, tmp) {
-        HASH_DEL(*hashtable, s);
-        free(s);
+    for (unsigned long i = 0; i < size; i++) {
+        hash ^= (unsigned char)buffer[i];
+        hash *= 0x100000001b3ULL;
     }
+
+    return hash;
 }
 
-unsigned long hash_count(struct key_value_pair **hashtable) {
-    struct key_value_pair *s;
-    unsigned long count = 0;
+// Returns 1 if key (and cube) has already been reached with the same or a lower cost_to_here, else
+// records key and returns 0. When all TT_PROBE_LENGTH slots for key are in use the entry with the
+// highest cost_to_here is replaced, the shallow entries are kept as they prune the largest subtrees.
+unsigned char tt_prune(struct transposition_table *tt, struct tt_entry *key, char *cube) {
+    unsigned long long hash = key->cube_hash;
+    unsigned long long mask = tt->size - 1;
+    unsigned long long index = 0;
+    unsigned long long victim_index = 0;
+    struct tt_entry *entry = NULL;
+    struct tt_entry *victim = NULL;
+
+    for (unsigned char i = 0; i < 5; i++) {
+        hash = tt_mix(hash, key->pt_states[i]);
+    }
+    hash = tt_mix(hash, (key->prev_move_class << 16) | (key->orbit0_wide_quarter_turns << 8) |
+                            key->orbit1_wide_quarter_turns);
+
+    // splitmix64 finalizer
+    hash = (hash ^ (hash >> 30)) * 0xbf58476d1ce4e5b9ULL;
+    hash = (hash ^ (hash >> 27)) * 0x94d049bb133111ebULL;
+    hash = hash ^ (hash >> 31);
+
+    for (unsigned char i = 0; i < TT_PROBE_LENGTH; i++) {
+        index = (hash + i) & mask;
+        entry = &tt->entries[index];
+
+        if (entry->generation != tt->generation) {
+            if (!victim || victim->generation == tt->generation) {
+                victim = entry;
+                victim_index = index;
+            }
+            continue;
+        }
+
+        if (memcmp(entry, key, offsetof(struct tt_entry, cost_to_here)) == 0 &&
+            (!tt->cubes || memcmp(&tt->cubes[index * tt->cube_bytes], cube, tt->cube_bytes) == 0)) {
+            if (entry->cost_to_here <= key->cost_to_here) {
+                tt->hits++;
+                return 1;
+            }
 
-    for (s = *hashtable; s != NULL; s = (struct key_value_pair *)(s->hh.next)) {
-        count++;
+            entry->cost_to_here = key->cost_to_here;
+            return 0;
+        }
+
+        if (!victim || (victim->generation == tt->generation && entry->cost_to_here > victim->cost_to_here)) {
+            victim = entry;
+            victim_index = index;
+        }
     }
 
-    return count;
-}
+    if (victim->generation == tt->generation) {
+        tt->replacements++;
+    }
 
-void hash_print_all(struct key_value_pair **hashtable) {
-    struct key_value_pair *s;
+    *victim = *key;
+    victim->generation = tt->generation;
 
-    for (s = *hashtable; s != NULL; s = (struct key_value_pair *)(s->hh.next)) {
-        printf("key %s  value %u\n", s->state, s->value);
+    if (tt->cubes) {
+        memcpy(&tt->cubes[victim_index * tt->cube_bytes], cube, tt->cube_bytes);
     }
+
+    tt->stores++;
+    return 0;
 }
 
 void print_cube(char *cube, int size) {
     int squares_per_side = size * size;
     int square_count = squares_per_side * 6;
     int rows = size * 3;
-    printf("\n");
+
+    if (output_format_jsonl) {
+        return;
+    }
+    ida_printf("\n");
 
     for (int row = 1; row <= rows; row++) {
         // U
@@ -131,17 +374,17 @@ void print_cube(char *cube, int size) {
             int i_end = i + size - 1;
 
             for (int z = 0; z < size; z++) {
-                printf("  ");
+                ida_printf("  ");
             }
 
             for (; i <= i_end; i++) {
-                printf("%c ", cube[i]);
+                ida_printf("%c ", cube[i]);
             }
 
-            printf("\n");
+            ida_printf("\n");
 
             if (row == size) {
-                printf("\n");
+                ida_printf("\n");
             }
 
             // D
@@ -150,17 +393,17 @@ void print_cube(char *cube, int size) {
             int i_end = i + size - 1;
 
             if (row == ((size * 2) + 1)) {
-                printf("\n");
+                ida_printf("\n");
             }
 
             for (int z = 0; z < size; z++) {
-                printf("  ");
+                ida_printf("  ");
             }
 
             for (; i <= i_end; i++) {
-                printf("%c ", cube[i]);
+                ida_printf("%c ", cube[i]);
             }
-            printf("\n");
+            ida_printf("\n");
 
             // L, F, R, B
         } else {
@@ -169,34 +412,34 @@ void print_cube(char *cube, int size) {
             int i_end = i_start + size - 1;
             int i = i_start;
             for (; i <= i_end; i++) {
-                printf("%c ", cube[i]);
+                ida_printf("%c ", cube[i]);
             }
 
             // F
             i = i_start + squares_per_side;
             i_end = i + size - 1;
             for (; i <= i_end; i++) {
-                printf("%c ", cube[i]);
+                ida_printf("%c ", cube[i]);
             }
 
             // R
             i = i_start + (squares_per_side * 2);
             i_end = i + size - 1;
             for (; i <= i_end; i++) {
-                printf("%c ", cube[i]);
+                ida_printf("%c ", cube[i]);
             }
 
             // B
             i = i_start + (squares_per_side * 3);
             i_end = i + size - 1;
             for (; i <= i_end; i++) {
-                printf("%c ", cube[i]);
+                ida_printf("%c ", cube[i]);
             }
 
-            printf("\n");
+            ida_printf("\n");
         }
     }
-    printf("\n");
+    ida_printf("\n");
 }
 
 int strmatch(char *str1, char *str2) {
@@ -210,21 +453,26 @@ void print_moves(move_type *moves, int max_i) {
     int i = 0;
     int count = 0;
 
+    // --format jsonl prints a solution record instead
+    if (output_format_jsonl) {
+        return;
+    }
+
     while (moves[count] != MOVE_NONE) {
         count++;
     }
 
-    printf("SOLUTION (%d steps): ", count);
+    ida_printf("SOLUTION (%d steps): ", count);
 
     while (moves[i] != MOVE_NONE) {
-        printf("%s ", move2str[moves[i]]);
+        ida_printf("%s ", move2str[moves[i]]);
         i++;
 
         if (i >= max_i) {
             break;
         }
     }
-    printf("\n");
+    ida_printf("\n");
 }
 
 unsigned char wide_turn_count(move_type *moves) {
@@ -463,8 +711,8 @@ unsigned char moves_cancel_out(move_type prev_move, move_type move) {
         case Dw2:
             return (move == Dw2);
         default:
-            printf("ERROR: moves_cancel_out add support for %d\n", move);
-            exit(1);
+            ida_printf("ERROR: moves_cancel_out add support for %d\n", move);
+            ida_exit(1);
     }
 
     return 0;
@@ -833,8 +1081,8 @@ unsigned char steps_on_same_face_and_layer(move_type prev_move, move_type move)
             return 0;
 
         default:
-            printf("ERROR: steps_on_same_face_and_layer add support for %d\n", move);
-            exit(1);
+            ida_printf("ERROR: steps_on_same_face_and_layer add support for %d\n", move);
+            ida_exit(1);
     }
 
     return 0;
@@ -1001,8 +1249,8 @@ unsigned char steps_on_same_face(move_type prev_move, move_type move) {
             return 0;
 
         default:
-            printf("ERROR: steps_on_same_face add support for %d\n", move);
-            exit(1);
+            ida_printf("ERROR: steps_on_same_face add support for %d\n", move);
+            ida_exit(1);
     }
 
     return 0;
@@ -1261,8 +1509,8 @@ unsigned char steps_on_opposite_faces(move_type prev_move, move_type move) {
                     return 0;
             }
         default:
-            printf("ERROR: steps_on_opposite_layers add support for %d\n", move);
-            exit(1);
+            ida_printf("ERROR: steps_on_opposite_layers add support for %d\n", move);
+            ida_exit(1);
     }
 }
 
@@ -1335,8 +1583,8 @@ unsigned char steps_on_opposite_faces_in_order(move_type prev_move, move_type mo
             return 0;
 
         default:
-            printf("ERROR: steps_on_opposite_faces_in_order add support for %d\n", move);
-            exit(1);
+            ida_printf("ERROR: steps_on_opposite_faces_in_order add support for %d\n", move);
+            ida_exit(1);
     }
 }
 
@@ -2,7 +2,9 @@
 #ifndef _IDA_SEARCH_CORE_H
 #define _IDA_SEARCH_CORE_H
 
-#include "uthash.h"
+#include <setjmp.h>
+#include <stdarg.h>
+#include <stddef.h>
 
 typedef enum {
     MOVE_NONE,
@@ -125,7 +127,31 @@ static const move_type moves_777[MOVE_COUNT_777] = {
 void rotate_666(char *cube, char *cube_tmp, int array_size, move_type move);
 void rotate_777(char *cube, char *cube_tmp, int array_size, move_type move);
 
+// --format jsonl, every line we print is a JSON record, see print_json_string()
+extern unsigned char output_format_jsonl;
+
+// ida_exit() is exit() unless ida_lib_solve() set ida_exit_jmp, see ida_exit()
+extern jmp_buf *ida_exit_jmp;
+extern int ida_exit_rc;
+void ida_exit(int rc) __attribute__((noreturn));
+
+// Everything we print goes through ida_printf()/ida_putchar(). ida_output is NULL for the command line and
+// --server, the output is written to stdout. ida_lib_solve() points it at a buffer so the output is returned
+// to the caller, the process's stdout is left alone.
+struct ida_output {
+    char *buffer;
+    size_t len;
+    size_t size;
+    unsigned char failed;
+};
+
+extern struct ida_output *ida_output;
+void ida_vprintf(const char *fmt, va_list args);
+void ida_printf(const char *fmt, ...) __attribute__((format(printf, 1, 2)));
+void ida_putchar(char c);
+
 void LOG(const char *fmt, ...);
+void print_json_string(const char *str);
 unsigned long hex_to_int(char value);
 unsigned long max(unsigned long a, unsigned long b);
 
@@ -140,22 +166,38 @@ struct ida_heuristic_result {
     unsigned char unpaired_count;
 };
 
-// uthash references
-// http://troydhanson.github.io/uthash/index.html
-// https://cfsa-pmw.warwick.ac.uk/SDF/SDF_C/blob/3cf5bf49856ef9ee4080cf6722cf9058a1e28b01/src/uthash/tests/example.c
-//
-struct key_value_pair {
-    unsigned char state[64]; /* we'll use this field as the key */
-    unsigned int value;
-    UT_hash_handle hh; /* makes this structure hashable */
+// A fixed size, open addressing transposition table for the IDA search. Each entry remembers the lowest
+// cost_to_here that a node was reached with during the current generation (one IDA threshold), a node
+// that is reached again with the same or a higher cost_to_here can be pruned. The cube of each entry is
+// kept in cubes so a cube_hash collision is never mistaken for a hit.
+#define TT_PROBE_LENGTH 4
+
+struct tt_entry {
+    unsigned long long cube_hash;
+    unsigned int pt_states[5];
+    unsigned char orbit0_wide_quarter_turns;
+    unsigned char orbit1_wide_quarter_turns;
+    unsigned char prev_move_class;  // the moves allowed after prev_move, see move_matrix_class
+    unsigned char cost_to_here;
+    unsigned char generation;
+};
+
+struct transposition_table {
+    struct tt_entry *entries;
+    char *cubes;                    // cube_bytes for each entry, NULL if the search has no cube
+    unsigned long long cube_bytes;
+    unsigned long long size;  // the number of entries, always a power of 2
+    unsigned char generation;
+    unsigned long long hits;
+    unsigned long long stores;
+    unsigned long long replacements;
 };
 
-void hash_add(struct key_value_pair **hashtable, char *state_key, unsigned long value);
-struct key_value_pair *hash_find(struct key_value_pair **hashtable, char *state_key);
-void hash_delete(struct key_value_pair **hashtable, struct key_value_pair *s);
-void hash_delete_all(struct key_value_pair **hashtable);
-unsigned long hash_count(struct key_value_pair **hashtable);
-void hash_print_all(struct key_value_pair **hashtable);
+void tt_init(struct transposition_table *tt, unsigned long long budget_bytes, unsigned long long cube_bytes);
+void tt_free(struct transposition_table *tt);
+void tt_new_generation(struct transposition_table *tt);
+unsigned char tt_prune(struct transposition_table *tt, struct tt_entry *key, char *cube);
+unsigned long long tt_hash_bytes(char *buffer, unsigned long size);
 void print_cube(char *cube, int size);
 int strmatch(char *str1, char *str2);
 
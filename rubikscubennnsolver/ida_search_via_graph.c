@@ -7,7 +7,10 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <fcntl.h>
+#include <sys/mman.h>
 #include <sys/resource.h>
+#include <sys/stat.h>
 #include <sys/time.h>
 #include <time.h>
 #include <unistd.h>
@@ -16,6 +19,8 @@
 #include "ida_search_777.h"
 #include "ida_search_core.h"
 
+#define MAX_IDA_THRESHOLD 20
+
 unsigned long long ida_count = 0;
 unsigned long long ida_count_total = 0;
 unsigned long array_size;
@@ -35,7 +40,6 @@ unsigned int pt2_state_max = 0;
 unsigned int pt4_state_max = 0;
 unsigned int call_pt_simple = 0;
 
-#define MAX_IDA_THRESHOLD 20
 char pt_max = -1;
 unsigned char COST_LENGTH = 1;
 unsigned char STATE_LENGTH = 4;
@@ -47,7 +51,74 @@ unsigned int min_solution_count = 1;
 float cost_to_goal_multiplier = 0.0;
 move_type legal_moves[MOVE_MAX];
 move_type move_matrix[MOVE_MAX][MOVE_MAX];
-struct key_value_pair *ida_explored = NULL;
+
+// prev_moves with the same move_matrix row allow the same moves next, they share a class. A node's
+// children depend on its prev_move so the transposition table can only prune a node reached with
+// the same class.
+unsigned char move_matrix_class[MOVE_MAX];
+
+// --max-nodes and --timeout-ms bound the whole search. When either one runs out the search stops and
+// returns the solutions found so far, or exits with EXIT_BUDGET_EXHAUSTED if it has not found any.
+#define EXIT_BUDGET_EXHAUSTED 2
+unsigned long long max_nodes = 0;
+unsigned long long timeout_ms = 0;
+unsigned long long budget_node_count = 0;
+unsigned int budget_check_count = 0;
+unsigned char budget_exhausted = 0;
+struct timeval budget_start;
+
+// The nodes explored and the time spent at each IDA threshold, summed over every pt-states row.
+// These are printed in the --format jsonl stats record.
+struct threshold_stats {
+    unsigned int searches;
+    unsigned long long nodes;
+    float us;
+};
+
+struct threshold_stats threshold_stats[UCHAR_MAX + 1];
+
+// --transposition-table-mb, the entries are kept between --server requests
+struct transposition_table transposition_table;
+
+// The pt-states rows for a multi-start search, PT_STATES_WIDTH states per row
+#define PT_STATES_WIDTH 5
+unsigned int *pt_states_rows = NULL;
+unsigned int pt_states_row_count = 0;
+
+// Every solution found is recorded here when record_solutions is set (see ida_lib_solve)
+struct ida_lib_solution {
+    unsigned int pt_states[PT_STATES_WIDTH];
+    unsigned char move_count;
+    unsigned char moves[MAX_IDA_THRESHOLD];  // indexes into legal_moves
+};
+
+unsigned char record_solutions = 0;
+struct ida_lib_solution *found_solutions = NULL;
+unsigned int found_solution_count = 0;
+unsigned int found_solution_size = 0;
+
+// --root-split INDEX/COUNT splits the search across COUNT worker processes. Every worker walks the same
+// tree but only pushes the nodes at depth root_split_depth whose sequence number modulo COUNT is INDEX.
+// --shared-bound is a file mapped by every worker that holds a struct shared_bound, a worker stops
+// searching a threshold once the other workers have found the solutions it was looking for.
+struct shared_bound {
+    unsigned char f_cost;         // the lowest f_cost found by any worker
+    unsigned int solution_count;  // the number of solutions found by all workers
+};
+
+unsigned int root_split_index = 0;
+unsigned int root_split_count = 0;
+unsigned char root_split_depth = 1;
+unsigned long long root_split_sequence = 0;
+unsigned char shared_find_extra = 0;
+struct shared_bound *shared_bound = NULL;
+
+// --solution-batch N pauses the search after every N solutions. It prints a "END-OF-BATCH <solution count>"
+// line and waits for a line on stdin, "more" resumes the search where it left off and anything else ends
+// the search as if --solution-count had been reached. Without --solution-count there is no limit on the
+// number of solutions.
+#define END_OF_BATCH "END-OF-BATCH"
+unsigned int solution_batch = 0;
 
 // Supported IDA searches
 typedef enum {
@@ -193,8 +264,8 @@ unsigned char hash_cost_to_cost(unsigned char perfect_hash_cost) {
         case 'f':
             return 15;
         default:
-            printf("ERROR: invalid perfect_hash_cost %d\n", perfect_hash_cost);
-            exit(1);
+            ida_printf("ERROR: invalid perfect_hash_cost %d\n", perfect_hash_cost);
+            ida_exit(1);
     };
 }
 
@@ -302,8 +373,8 @@ void init_cube(char *cube, int size, lookup_table_type type, char *kociemba) {
             break;
 
         default:
-            printf("ERROR: init_cube() does not support this --type\n");
-            exit(1);
+            ida_printf("ERROR: init_cube() does not support this --type\n");
+            ida_exit(1);
     }
 }
 
@@ -324,8 +395,8 @@ struct ida_heuristic_result ida_heuristic(char *cube, lookup_table_type type) {
             return ida_heuristic_UD_oblique_edges_stage_777(cube);
 
         default:
-            printf("ERROR: ida_heuristic() does not support this --type\n");
-            exit(1);
+            ida_printf("ERROR: ida_heuristic() does not support this --type\n");
+            ida_exit(1);
     }
 }
 
@@ -341,13 +412,38 @@ struct StackNode {
     unsigned int pt3_state;
     unsigned int pt4_state;
     char *cube;
-    struct StackNode *next;
 };
 
-void push(struct StackNode **root, unsigned char cost_to_here, unsigned char cost_to_goal, move_type *moves_to_here,
+// The DFS stack never holds more than legal_move_count nodes per level plus the root so it is
+// allocated up front, along with a cube buffer for each slot, and reused by every ida_search().
+// Nothing is allocated per node.
+struct StackNode *stack_nodes = NULL;
+unsigned int stack_capacity = 0;
+char *stack_cubes = NULL;
+unsigned long stack_cubes_size = 0;
+
+void stack_reserve(unsigned int capacity, unsigned long cube_size_bytes) {
+    if (capacity > stack_capacity) {
+        stack_nodes = realloc(stack_nodes, sizeof(struct StackNode) * capacity);
+        stack_capacity = capacity;
+    }
+
+    if (capacity * cube_size_bytes > stack_cubes_size) {
+        stack_cubes = realloc(stack_cubes, capacity * cube_size_bytes);
+        stack_cubes_size = capacity * cube_size_bytes;
+    }
+}
+
+// The cube for a node lives in the cube buffer of its stack slot, the caller fills it in before the push
+void push(unsigned int *top, unsigned char cost_to_here, unsigned char cost_to_goal, move_type *moves_to_here,
           move_type prev_move, unsigned int pt0_state, unsigned int pt1_state, unsigned int pt2_state,
           unsigned int pt3_state, unsigned int pt4_state, char *cube) {
-    struct StackNode *node = (struct StackNode *)malloc(sizeof(struct StackNode));
+    if (*top >= stack_capacity) {
+        ida_printf("ERROR: ida_search() stack overflow, capacity %u\n", stack_capacity);
+        ida_exit(1);
+    }
+
+    struct StackNode *node = &stack_nodes[*top];
     node->cost_to_here = cost_to_here;
     node->cost_to_goal = cost_to_goal;
 
@@ -372,15 +468,8 @@ void push(struct StackNode **root, unsigned char cost_to_here, unsigned char cos
     node->pt2_state = pt2_state;
     node->pt3_state = pt3_state;
     node->pt4_state = pt4_state;
-    node->next = *root;
     node->cube = cube;
-    *root = node;
-}
-
-struct StackNode *pop(struct StackNode **root) {
-    struct StackNode *temp = *root;
-    *root = (*root)->next;
-    return temp;
+    (*top)++;
 }
 
 unsigned char pt_states_to_cost_simple(char *cube, lookup_table_type type, unsigned int prev_pt0_state,
@@ -463,8 +552,8 @@ unsigned char pt_states_to_cost_simple(char *cube, lookup_table_type type, unsig
             break;
 
         default:
-            printf("ERROR: pt_states_to_cost_simple() does not support this --type\n");
-            exit(1);
+            ida_printf("ERROR: pt_states_to_cost_simple() does not support this --type\n");
+            ida_exit(1);
     }
 
     if (pt_perfect_hash01) {
@@ -678,8 +767,8 @@ struct cost_to_goal_result pt_states_to_cost(char *cube, lookup_table_type type,
             break;
 
         default:
-            printf("ERROR: pt_states_to_cost() does not support this --type\n");
-            exit(1);
+            ida_printf("ERROR: pt_states_to_cost() does not support this --type\n");
+            ida_exit(1);
     }
 
     if (pt_perfect_hash01) {
@@ -750,8 +839,8 @@ void print_ida_summary(char *cube, lookup_table_type type, unsigned int pt0_stat
     size_t array_size_char = sizeof(char) * array_size;
     struct ida_heuristic_result heuristic;
 
-    printf("\n\n");
-    printf("       ");
+    ida_printf("\n\n");
+    ida_printf("       ");
 
     // header
     switch (type) {
@@ -759,84 +848,84 @@ void print_ida_summary(char *cube, lookup_table_type type, unsigned int pt0_stat
         case UD_OBLIQUE_EDGES_STAGE_PERFECT_HASH_777:
             break;
         default:
-            printf("UNPAIRED  EST  ");
+            ida_printf("UNPAIRED  EST  ");
             break;
     }
 
     if (pt_max == 4) {
-        printf("PT0  PT1  PT2  PT3  PT4  ");
+        ida_printf("PT0  PT1  PT2  PT3  PT4  ");
     } else if (pt_max == 3) {
-        printf("PT0  PT1  PT2  PT3  ");
+        ida_printf("PT0  PT1  PT2  PT3  ");
     } else if (pt_max == 2) {
-        printf("PT0  PT1  PT2  ");
+        ida_printf("PT0  PT1  PT2  ");
     } else if (pt_max == 1) {
-        printf("PT0  PT1  ");
+        ida_printf("PT0  PT1  ");
     } else if (pt_max == 0) {
-        printf("PT0  ");
+        ida_printf("PT0  ");
     }
 
     if (pt_perfect_hash01) {
-        printf("PER01  ");
+        ida_printf("PER01  ");
     }
 
     if (pt_perfect_hash02) {
-        printf("PER02  ");
+        ida_printf("PER02  ");
     }
 
     if (pt_perfect_hash12) {
-        printf("PER12  ");
+        ida_printf("PER12  ");
     }
 
     if (pt_perfect_hash34) {
-        printf("PER34  ");
+        ida_printf("PER34  ");
     }
 
-    printf("CTG  TRU  IDX\n");
+    ida_printf("CTG  TRU  IDX\n");
 
     // divider line
-    printf("       ");
+    ida_printf("       ");
     switch (type) {
         case NONE:
         case UD_OBLIQUE_EDGES_STAGE_PERFECT_HASH_777:
             break;
         default:
-            printf("========  ===  ");
+            ida_printf("========  ===  ");
             break;
     }
 
     if (pt_max == 4) {
-        printf("===  ===  ===  ===  ===  ");
+        ida_printf("===  ===  ===  ===  ===  ");
     } else if (pt_max == 3) {
-        printf("===  ===  ===  ===  ");
+        ida_printf("===  ===  ===  ===  ");
     } else if (pt_max == 2) {
-        printf("===  ===  ===  ");
+        ida_printf("===  ===  ===  ");
     } else if (pt_max == 1) {
-        printf("===  ===  ");
+        ida_printf("===  ===  ");
     } else if (pt_max == 0) {
-        printf("===  ");
+        ida_printf("===  ");
     }
 
     if (pt_perfect_hash01) {
-        printf("=====  ");
+        ida_printf("=====  ");
     }
 
     if (pt_perfect_hash02) {
-        printf("=====  ");
+        ida_printf("=====  ");
     }
 
     if (pt_perfect_hash12) {
-        printf("=====  ");
+        ida_printf("=====  ");
     }
 
     if (pt_perfect_hash34) {
-        printf("=====  ");
+        ida_printf("=====  ");
     }
 
-    printf("===  ===  ===\n");
+    ida_printf("===  ===  ===\n");
 
     ctg = pt_states_to_cost(cube, type, pt0_state, pt1_state, pt2_state, pt3_state, pt4_state);
 
-    printf(" INIT  ");
+    ida_printf(" INIT  ");
 
     switch (type) {
         case NONE:
@@ -844,38 +933,38 @@ void print_ida_summary(char *cube, lookup_table_type type, unsigned int pt0_stat
             break;
         default:
             heuristic = ida_heuristic(cube, type);
-            printf("%8d  %3d  ", heuristic.unpaired_count, heuristic.cost_to_goal);
+            ida_printf("%8d  %3d  ", heuristic.unpaired_count, heuristic.cost_to_goal);
             break;
     }
 
     if (pt_max >= 0) {
-        printf("%3d  ", ctg.pt0_cost);
+        ida_printf("%3d  ", ctg.pt0_cost);
     }
     if (pt_max >= 1) {
-        printf("%3d  ", ctg.pt1_cost);
+        ida_printf("%3d  ", ctg.pt1_cost);
     }
     if (pt_max >= 2) {
-        printf("%3d  ", ctg.pt2_cost);
+        ida_printf("%3d  ", ctg.pt2_cost);
     }
     if (pt_max >= 3) {
-        printf("%3d  ", ctg.pt3_cost);
+        ida_printf("%3d  ", ctg.pt3_cost);
     }
     if (pt_max >= 4) {
-        printf("%3d  ", ctg.pt4_cost);
+        ida_printf("%3d  ", ctg.pt4_cost);
     }
     if (pt_perfect_hash01) {
-        printf("%5d  ", ctg.perfect_hash01_cost);
+        ida_printf("%5d  ", ctg.perfect_hash01_cost);
     }
     if (pt_perfect_hash02) {
-        printf("%5d  ", ctg.perfect_hash02_cost);
+        ida_printf("%5d  ", ctg.perfect_hash02_cost);
     }
     if (pt_perfect_hash12) {
-        printf("%5d  ", ctg.perfect_hash12_cost);
+        ida_printf("%5d  ", ctg.perfect_hash12_cost);
     }
     if (pt_perfect_hash34) {
-        printf("%5d  ", ctg.perfect_hash34_cost);
+        ida_printf("%5d  ", ctg.perfect_hash34_cost);
     }
-    printf("%3d  %3d  %3d\n", ctg.cost_to_goal, steps_to_solved, 0);
+    ida_printf("%3d  %3d  %3d\n", ctg.cost_to_goal, steps_to_solved, 0);
 
     for (unsigned char i = 0; i < solution_len; i++) {
         unsigned char j = 0;
@@ -914,7 +1003,7 @@ void print_ida_summary(char *cube, lookup_table_type type, unsigned int pt0_stat
             pt0_state = read_state(pt0, (pt0_state * ROW_LENGTH) + offset);
         }
 
-        printf("%5s  ", move2str[solution[i]]);
+        ida_printf("%5s  ", move2str[solution[i]]);
         switch (type) {
             case NONE:
             case UD_OBLIQUE_EDGES_STAGE_PERFECT_HASH_777:
@@ -925,7 +1014,7 @@ void print_ida_summary(char *cube, lookup_table_type type, unsigned int pt0_stat
             case UD_OBLIQUE_EDGES_INNER_X_CENTERS_STAGE_666:
                 rotate_666(cube, cube_tmp, array_size, solution[i]);
                 heuristic = ida_heuristic(cube, type);
-                printf("%8d  %3d  ", heuristic.unpaired_count, heuristic.cost_to_goal);
+                ida_printf("%8d  %3d  ", heuristic.unpaired_count, heuristic.cost_to_goal);
                 break;
 
             case LR_OBLIQUE_EDGES_STAGE_777:
@@ -933,48 +1022,48 @@ void print_ida_summary(char *cube, lookup_table_type type, unsigned int pt0_stat
             case UD_OBLIQUE_EDGES_INNER_X_CENTERS_STAGE_777:
                 rotate_777(cube, cube_tmp, array_size, solution[i]);
                 heuristic = ida_heuristic(cube, type);
-                printf("%8d  %3d  ", heuristic.unpaired_count, heuristic.cost_to_goal);
+                ida_printf("%8d  %3d  ", heuristic.unpaired_count, heuristic.cost_to_goal);
                 break;
 
             default:
-                printf("ERROR: print_ida_summary() does not support this --type\n");
-                exit(1);
+                ida_printf("ERROR: print_ida_summary() does not support this --type\n");
+                ida_exit(1);
         }
 
         ctg = pt_states_to_cost(cube, type, pt0_state, pt1_state, pt2_state, pt3_state, pt4_state);
         steps_to_solved--;
 
         if (pt_max >= 0) {
-            printf("%3d  ", ctg.pt0_cost);
+            ida_printf("%3d  ", ctg.pt0_cost);
         }
         if (pt_max >= 1) {
-            printf("%3d  ", ctg.pt1_cost);
+            ida_printf("%3d  ", ctg.pt1_cost);
         }
         if (pt_max >= 2) {
-            printf("%3d  ", ctg.pt2_cost);
+            ida_printf("%3d  ", ctg.pt2_cost);
         }
         if (pt_max >= 3) {
-            printf("%3d  ", ctg.pt3_cost);
+            ida_printf("%3d  ", ctg.pt3_cost);
         }
         if (pt_max >= 4) {
-            printf("%3d  ", ctg.pt4_cost);
+            ida_printf("%3d  ", ctg.pt4_cost);
         }
         if (pt_perfect_hash01) {
-            printf("%5d  ", ctg.perfect_hash01_cost);
+            ida_printf("%5d  ", ctg.perfect_hash01_cost);
         }
         if (pt_perfect_hash02) {
-            printf("%5d  ", ctg.perfect_hash02_cost);
+            ida_printf("%5d  ", ctg.perfect_hash02_cost);
         }
         if (pt_perfect_hash12) {
-            printf("%5d  ", ctg.perfect_hash12_cost);
+            ida_printf("%5d  ", ctg.perfect_hash12_cost);
         }
         if (pt_perfect_hash34) {
-            printf("%5d  ", ctg.perfect_hash34_cost);
+            ida_printf("%5d  ", ctg.perfect_hash34_cost);
         }
 
-        printf("%3d  %3d  %3d\n", ctg.cost_to_goal, steps_to_solved, i + 1);
+        ida_printf("%3d  %3d  %3d\n", ctg.cost_to_goal, steps_to_solved, i + 1);
     }
-    printf("\n");
+    ida_printf("\n");
 }
 
 unsigned char parity_ok(char *cube, lookup_table_type type, move_type *moves_to_here) {
@@ -997,8 +1086,8 @@ unsigned char parity_ok(char *cube, lookup_table_type type, move_type *moves_to_
             }
 
         } else {
-            printf("ERROR: orbit0_wide_quarter_turns %d is not supported\n", orbit0_wide_quarter_turns);
-            exit(1);
+            ida_printf("ERROR: orbit0_wide_quarter_turns %d is not supported\n", orbit0_wide_quarter_turns);
+            ida_exit(1);
         }
     }
 
@@ -1018,8 +1107,8 @@ unsigned char parity_ok(char *cube, lookup_table_type type, move_type *moves_to_
             }
 
         } else {
-            printf("ERROR: orbit1_wide_quarter_turns %d is not supported\n", orbit1_wide_quarter_turns);
-            exit(1);
+            ida_printf("ERROR: orbit1_wide_quarter_turns %d is not supported\n", orbit1_wide_quarter_turns);
+            ida_exit(1);
         }
     }
 
@@ -1043,17 +1132,183 @@ unsigned char parity_ok(char *cube, lookup_table_type type, move_type *moves_to_
             return ida_search_complete_UD_oblique_edges_stage_777(cube);
 
         default:
-            printf("ERROR: parity_ok() does not support this --type\n");
-            exit(1);
+            ida_printf("ERROR: parity_ok() does not support this --type\n");
+            ida_exit(1);
     }
 
     return 1;
 }
 
+struct shared_bound *map_shared_bound(char *filename) {
+    struct stat file_stat;
+    struct shared_bound *buffer = NULL;
+    int fd = open(filename, O_RDWR);
+
+    if (fd == -1 || fstat(fd, &file_stat) != 0 || file_stat.st_size < sizeof(struct shared_bound)) {
+        ida_printf("ERROR: %s must be a %lu byte file\n", filename, sizeof(struct shared_bound));
+        ida_exit(1);
+    }
+
+    buffer = mmap(NULL, sizeof(struct shared_bound), PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    close(fd);
+
+    if (buffer == MAP_FAILED) {
+        ida_printf("ERROR: could not mmap %s\n", filename);
+        ida_exit(1);
+    }
+
+    return buffer;
+}
+
+// Returns 1 if the other --root-split workers have already found what a search at ida_threshold is looking for
+unsigned char search_cancelled(unsigned char ida_threshold) {
+    unsigned char f_cost = 0;
+
+    if (!shared_bound) {
+        return 0;
+    }
+
+    f_cost = __atomic_load_n(&shared_bound->f_cost, __ATOMIC_RELAXED);
+
+    // a shorter solution has been found
+    if (!shared_find_extra && f_cost < ida_threshold) {
+        return 1;
+    }
+
+    return f_cost <= ida_threshold &&
+           __atomic_load_n(&shared_bound->solution_count, __ATOMIC_RELAXED) >= min_solution_count;
+}
+
+void shared_bound_update(unsigned char f_cost) {
+    unsigned char bound = 0;
+
+    if (!shared_bound) {
+        return;
+    }
+
+    __atomic_add_fetch(&shared_bound->solution_count, 1, __ATOMIC_RELAXED);
+    bound = __atomic_load_n(&shared_bound->f_cost, __ATOMIC_RELAXED);
+
+    while (f_cost < bound && !__atomic_compare_exchange_n(&shared_bound->f_cost, &bound, f_cost, 0, __ATOMIC_RELAXED,
+                                                          __ATOMIC_RELAXED)) {
+    }
+}
+
+unsigned char search_budget_exhausted() {
+    struct timeval now;
+
+    if (budget_exhausted) {
+        return 1;
+    }
+
+    if (max_nodes && budget_node_count >= max_nodes) {
+        LOG("IDA budget exhausted, explored %'llu nodes (--max-nodes %'llu)\n", budget_node_count, max_nodes);
+        budget_exhausted = 1;
+
+    } else if (timeout_ms && (budget_check_count++ & 0x3FF) == 0) {
+        // gettimeofday() is not free so only look at the clock every 1024 calls
+        gettimeofday(&now, NULL);
+
+        if (((now.tv_sec - budget_start.tv_sec) * 1000) + ((now.tv_usec - budget_start.tv_usec) / 1000) >=
+            timeout_ms) {
+            LOG("IDA budget exhausted, explored %'llu nodes (--timeout-ms %'llu)\n", budget_node_count, timeout_ms);
+            budget_exhausted = 1;
+        }
+    }
+
+    return budget_exhausted;
+}
+
+// Returns 1 if the caller wants another batch of solutions
+unsigned char next_solution_batch() {
+    char *line = NULL;
+    size_t len = 0;
+    unsigned char more = 0;
+
+    ida_printf("%s %u\n", END_OF_BATCH, solution_count);
+    fflush(stdout);
+    more = getline(&line, &len, stdin) != -1 && strncmp(line, "more", 4) == 0;
+
+    if (line) {
+        free(line);
+    }
+
+    if (!more) {
+        LOG("IDA stopped after %'u solutions, no more solutions were requested\n", solution_count);
+        min_solution_count = solution_count;
+    }
+
+    return more;
+}
+
+void print_solution_jsonl(move_type *moves_to_here, unsigned char cost_to_here, unsigned char f_cost,
+                          unsigned int pt0_state, unsigned int pt1_state, unsigned int pt2_state, unsigned int pt3_state,
+                          unsigned int pt4_state) {
+    ida_printf("{\"type\": \"solution\", \"moves\": [");
+
+    for (unsigned char i = 0; i < cost_to_here; i++) {
+        ida_printf(i ? ", \"%s\"" : "\"%s\"", move2str[moves_to_here[i]]);
+    }
+
+    ida_printf("], \"f_cost\": %d, \"pt_states\": [%u, %u, %u, %u, %u]}\n", f_cost, pt0_state, pt1_state, pt2_state,
+               pt3_state, pt4_state);
+}
+
+void print_stats_jsonl(unsigned char found_solution) {
+    unsigned long long nodes = 0;
+    float us = 0.0;
+    unsigned char first = 1;
+
+    ida_printf("{\"type\": \"stats\", \"found_solution\": %s, \"budget_exhausted\": %s, \"thresholds\": [",
+               found_solution ? "true" : "false", budget_exhausted ? "true" : "false");
+
+    for (unsigned int i = 0; i <= UCHAR_MAX; i++) {
+        if (threshold_stats[i].searches) {
+            ida_printf("%s{\"threshold\": %u, \"searches\": %u, \"nodes\": %llu, \"seconds\": %.6f}",
+                       first ? "" : ", ", i, threshold_stats[i].searches, threshold_stats[i].nodes,
+                       threshold_stats[i].us / 1000000);
+            nodes += threshold_stats[i].nodes;
+            us += threshold_stats[i].us;
+            first = 0;
+        }
+    }
+
+    ida_printf("], \"nodes\": %llu, \"seconds\": %.6f, \"nodes_per_sec\": %llu}\n", nodes, us / 1000000,
+               us > 0 ? (unsigned long long)(nodes / (us / 1000000)) : 0);
+}
+
+void record_solution(move_type *moves_to_here, unsigned char cost_to_here, unsigned int pt0_state,
+                     unsigned int pt1_state, unsigned int pt2_state, unsigned int pt3_state, unsigned int pt4_state) {
+    struct ida_lib_solution *solution = NULL;
+
+    if (found_solution_count == found_solution_size) {
+        found_solution_size = found_solution_size ? found_solution_size * 2 : 64;
+        found_solutions = realloc(found_solutions, sizeof(struct ida_lib_solution) * found_solution_size);
+    }
+
+    solution = &found_solutions[found_solution_count++];
+    memset(solution, 0, sizeof(struct ida_lib_solution));
+    solution->pt_states[0] = pt0_state;
+    solution->pt_states[1] = pt1_state;
+    solution->pt_states[2] = pt2_state;
+    solution->pt_states[3] = pt3_state;
+    solution->pt_states[4] = pt4_state;
+    solution->move_count = cost_to_here;
+
+    for (unsigned char i = 0; i < cost_to_here; i++) {
+        for (unsigned char j = 0; j < legal_move_count; j++) {
+            if (legal_moves[j] == moves_to_here[i]) {
+                solution->moves[i] = j;
+                break;
+            }
+        }
+    }
+}
+
 struct ida_search_result ida_search(char *cube, unsigned int cube_size, lookup_table_type type,
                                     unsigned int init_pt0_state, unsigned int init_pt1_state,
                                     unsigned int init_pt2_state, unsigned int init_pt3_state,
-                                    unsigned int init_pt4_state, unsigned char use_uthash) {
+                                    unsigned int init_pt4_state) {
     struct ida_search_result search_result;
     unsigned char cost_to_goal = 0;
     unsigned char f_cost = 0;
@@ -1076,29 +1331,56 @@ struct ida_search_result ida_search(char *cube, unsigned int cube_size, lookup_t
     unsigned int pt4_state_offset = 0;
     move_type move;
     search_result.found_solution = 0;
-    char key[64];
+    struct tt_entry tt_key;
     move_type *prev_move_move_matrix = NULL;
     char cube_tmp[array_size];
+    char cube_node[array_size];
     size_t array_size_char = sizeof(char) * array_size;
     char *cube_copy = NULL;
+    unsigned int top = 0;
+    struct StackNode current;
+    struct StackNode *node = &current;
 
-    cube_copy = malloc(array_size_char);
-    memcpy(cube_copy, cube, array_size_char);
+    stack_reserve(1 + ((MAX_IDA_THRESHOLD + 1) * legal_move_count), cube_size ? array_size_char : 0);
+
+    if (cube_size) {
+        cube_copy = stack_cubes;
+        memcpy(cube_copy, cube, array_size_char);
+    } else {
+        // the root node still sees the cube, ida_search() never modifies it
+        cube_copy = cube;
+    }
 
     struct cost_to_goal_result ctg =
         pt_states_to_cost(cube, type, init_pt0_state, init_pt1_state, init_pt2_state, init_pt3_state, init_pt4_state);
-    struct StackNode *root = NULL;
-    struct StackNode *node = NULL;
 
-    push(&root, 0, ctg.cost_to_goal, NULL, MOVE_NONE, init_pt0_state, init_pt1_state, init_pt2_state,
+    push(&top, 0, ctg.cost_to_goal, NULL, MOVE_NONE, init_pt0_state, init_pt1_state, init_pt2_state,
          init_pt3_state, init_pt4_state, cube_copy);
+    cube_copy = NULL;
+    root_split_sequence = 0;
 
     for (unsigned char i = 0; i < legal_move_count; i++) {
         offset[i] = COST_LENGTH + ((STATE_LENGTH + COST_LENGTH) * i);
     }
 
-    while (root) {
-        node = pop(&root);
+    while (top) {
+        // Copy the node out of the stack, its children are pushed into the slot it occupied
+        top--;
+        current = stack_nodes[top];
+
+        if (cube_size) {
+            memcpy(cube_node, current.cube, array_size_char);
+            current.cube = cube_node;
+        }
+
+        // the other --root-split workers found the solutions we are looking for
+        if (search_cancelled(threshold)) {
+            return search_result;
+        }
+
+        if ((max_nodes || timeout_ms) && search_budget_exhausted()) {
+            return search_result;
+        }
 
         if (node->cost_to_goal == 0) {
             if (parity_ok(node->cube, type, node->moves_to_here)) {
@@ -1114,51 +1396,57 @@ struct ida_search_result ida_search(char *cube, unsigned int cube_size, lookup_t
                     LOG("IDA count %'llu, f_cost %d vs threshold %d (cost_to_here %d, cost_to_goal %d)\n", ida_count,
                         search_result.f_cost, threshold, node->cost_to_here, node->cost_to_goal);
                 }
+                shared_bound_update(f_cost);
                 print_moves(node->moves_to_here, node->cost_to_here);
 
+                if (output_format_jsonl) {
+                    print_solution_jsonl(node->moves_to_here, node->cost_to_here, f_cost, init_pt0_state,
+                                         init_pt1_state, init_pt2_state, init_pt3_state, init_pt4_state);
+                }
+
+                if (record_solutions) {
+                    record_solution(node->moves_to_here, node->cost_to_here, init_pt0_state, init_pt1_state,
+                                    init_pt2_state, init_pt3_state, init_pt4_state);
+                }
+
                 if (cube_size) {
                     print_cube(node->cube, cube_size);
                 }
 
+                if (solution_batch && solution_count % solution_batch == 0 && solution_count < min_solution_count) {
+                    next_solution_batch();
+                }
+
                 if (solution_count >= min_solution_count) {
                     return search_result;
                 }
             }
 
-            if (node->cube) {
-                free(node->cube);
-                node->cube = NULL;
-            }
-            free(node);
             continue;
         }
 
-        // The following works, it does reduce the number of nodes we explore but it does so at the cost
-        // of the memory to remember all of the nodes and the CPU to do the hash search to see if the
-        // node is one that has already been explored.
-        /*
-        if (use_uthash) {
-            // keep memory usage in check
-            if (ida_count % 1000000 == 0) {
-                hash_delete_all(&ida_explored);
-            }
-
-            sprintf(key, "%u-%u-%u-%u-%u-%u-%u-%u", node->pt0_state, node->pt1_state, node->pt2_state, node->pt3_state,
-                    node->pt4_state,
-                    orbit0_wide_quarter_turns ? get_orbit0_wide_quarter_turn_count(node->moves_to_here) : 0,
-                    orbit1_wide_quarter_turns ? get_orbit1_wide_quarter_turn_count(node->moves_to_here) : 0,
-                    node->cost_to_here);
-
-            if (hash_find(&ida_explored, key)) {
-                free(node);
+        // Skip nodes we have already explored at this threshold with the same or a lower cost_to_here. Only
+        // the parity of the wide quarter turns matters to parity_ok() so that is all we remember of them.
+        if (transposition_table.entries) {
+            tt_key.cube_hash = cube_size ? tt_hash_bytes(node->cube, array_size_char) : 0;
+            tt_key.pt_states[0] = node->pt0_state;
+            tt_key.pt_states[1] = node->pt1_state;
+            tt_key.pt_states[2] = node->pt2_state;
+            tt_key.pt_states[3] = node->pt3_state;
+            tt_key.pt_states[4] = node->pt4_state;
+            tt_key.orbit0_wide_quarter_turns =
+                orbit0_wide_quarter_turns ? get_orbit0_wide_quarter_turn_count(node->moves_to_here) % 2 : 0;
+            tt_key.orbit1_wide_quarter_turns =
+                orbit1_wide_quarter_turns ? get_orbit1_wide_quarter_turn_count(node->moves_to_here) % 2 : 0;
+            tt_key.prev_move_class = move_matrix_class[node->prev_move];
+            tt_key.cost_to_here = node->cost_to_here;
+
+            if (tt_prune(&transposition_table, &tt_key, node->cube)) {
                 continue;
             }
-            hash_add(&ida_explored, key, 0);
         }
-        */
 
         prev_move_move_matrix = move_matrix[node->prev_move];
-        cube_copy = NULL;
 
         switch (pt_max) {
             case 0:
@@ -1307,7 +1595,8 @@ struct ida_search_result ida_search(char *cube, unsigned int cube_size, lookup_t
             }
 
             if (cube_size) {
-                cube_copy = malloc(array_size_char);
+                // build the child cube in the stack slot it will be pushed to
+                cube_copy = &stack_cubes[top * array_size_char];
                 memcpy(cube_copy, node->cube, array_size_char);
 
                 if (cube_size == 6) {
@@ -1315,14 +1604,12 @@ struct ida_search_result ida_search(char *cube, unsigned int cube_size, lookup_t
                 } else if (cube_size == 7) {
                     rotate_777(cube_copy, cube_tmp, array_size, move);
                 } else {
-                    printf("ERROR: ida_search() does not have rotate_xxx() for this cube size\n");
-                    exit(1);
+                    ida_printf("ERROR: ida_search() does not have rotate_xxx() for this cube size\n");
+                    ida_exit(1);
                 }
 
                 // if the cube state did not change, continue
                 if (memcmp(node->cube, cube_copy, array_size_char) == 0) {
-                    free(cube_copy);
-                    cube_copy = NULL;
                     continue;
                 }
             }
@@ -1333,23 +1620,19 @@ struct ida_search_result ida_search(char *cube, unsigned int cube_size, lookup_t
                                              pt0_cost, pt1_cost, pt2_cost, pt3_cost, pt4_cost, cost_to_goal);
             }
             ida_count++;
+            budget_node_count++;
 
             if (node->cost_to_here + 1 + cost_to_goal <= threshold) {
-                push(&root, node->cost_to_here + 1, cost_to_goal, node->moves_to_here, move, pt0_state, pt1_state, pt2_state,
-                     pt3_state, pt4_state, cube_copy);
-            } else {
-                if (cube_copy) {
-                    free(cube_copy);
-                    cube_copy = NULL;
+                // --root-split, leave the nodes at root_split_depth that belong to the other workers
+                if (root_split_count && node->cost_to_here + 1 == root_split_depth &&
+                    root_split_sequence++ % root_split_count != root_split_index) {
+                    continue;
                 }
-            }
-        }
 
-        if (node->cube) {
-            free(node->cube);
-            node->cube = NULL;
+                push(&top, node->cost_to_here + 1, cost_to_goal, node->moves_to_here, move, pt0_state, pt1_state, pt2_state,
+                     pt3_state, pt4_state, cube_copy);
+            }
         }
-        free(node);
     }
 
     return search_result;
@@ -1358,8 +1641,7 @@ struct ida_search_result ida_search(char *cube, unsigned int cube_size, lookup_t
 struct ida_search_result ida_solve(char *cube, unsigned int cube_size, lookup_table_type type, unsigned int pt0_state,
                                    unsigned int pt1_state, unsigned int pt2_state, unsigned int pt3_state,
                                    unsigned int pt4_state, unsigned char min_ida_threshold,
-                                   unsigned char max_ida_threshold, unsigned char use_uthash,
-                                   unsigned char find_extra) {
+                                   unsigned char max_ida_threshold, unsigned char find_extra) {
     struct ida_search_result search_result;
     struct timeval stop, start, start_this_threshold;
     unsigned char pt0_cost = 0;
@@ -1394,10 +1676,12 @@ struct ida_search_result ida_solve(char *cube, unsigned int cube_size, lookup_ta
     for (threshold = min_ida_threshold; threshold <= max_ida_threshold; threshold++) {
         ida_count = 0;
         gettimeofday(&start_this_threshold, NULL);
-        hash_delete_all(&ida_explored);
 
-        search_result =
-            ida_search(cube, cube_size, type, pt0_state, pt1_state, pt2_state, pt3_state, pt4_state, use_uthash);
+        if (transposition_table.entries) {
+            tt_new_generation(&transposition_table);
+        }
+
+        search_result = ida_search(cube, cube_size, type, pt0_state, pt1_state, pt2_state, pt3_state, pt4_state);
 
         gettimeofday(&stop, NULL);
         ida_count_total += ida_count;
@@ -1408,6 +1692,14 @@ struct ida_search_result ida_solve(char *cube, unsigned int cube_size, lookup_ta
         unsigned int nodes_per_sec = nodes_per_us * 1000000;
         LOG("IDA threshold %d, explored %'llu nodes, took %.3fs, %'llu nodes-per-sec\n", threshold, ida_count,
             us / 1000000, nodes_per_sec);
+        threshold_stats[threshold].searches++;
+        threshold_stats[threshold].nodes += ida_count;
+        threshold_stats[threshold].us += us;
+
+        if (transposition_table.entries) {
+            LOG("transposition table %'llu hits, %'llu stores, %'llu replacements\n", transposition_table.hits,
+                transposition_table.stores, transposition_table.replacements);
+        }
 
         if (search_result.found_solution) {
             float us = ((stop.tv_sec - start.tv_sec) * 1000000) + ((stop.tv_usec - start.tv_usec));
@@ -1416,9 +1708,14 @@ struct ida_search_result ida_solve(char *cube, unsigned int cube_size, lookup_ta
             LOG("IDA found solution, explored %'llu total nodes, took %.3fs, %'llu nodes-per-sec\n\n", ida_count_total,
                 us / 1000000, nodes_per_sec);
 
-            if (solution_count >= min_solution_count || !find_extra) {
+            if (solution_count >= min_solution_count || !find_extra || budget_exhausted) {
                 return search_result;
             }
+        } else if (budget_exhausted) {
+            return search_result;
+        } else if (search_cancelled(threshold)) {
+            LOG("IDA cancelled at threshold %d, another worker found a solution\n", threshold);
+            break;
         }
     }
 
@@ -1426,57 +1723,233 @@ struct ida_search_result ida_solve(char *cube, unsigned int cube_size, lookup_ta
     return search_result;
 }
 
-char *read_file(char *filename) {
+char *read_file(char *filename, unsigned long *bufsize) {
+    struct stat file_stat;
+    char *buffer = NULL;
+    int fd = 0;
 
     if (access(filename, F_OK) != 0) {
-        printf("ERROR: file %s not found\n", filename);
-        exit(1);
+        ida_printf("ERROR: file %s not found\n", filename);
+        ida_exit(1);
     }
 
-    FILE *fh = fopen(filename, "rb");
-    unsigned long bufsize = 0;
-    char *buffer = NULL;
+    fd = open(filename, O_RDONLY);
+
+    if (fd == -1 || fstat(fd, &file_stat) != 0) {
+        ida_printf("ERROR: could not open %s\n", filename);
+        ida_exit(1);
+    }
+
+    *bufsize = file_stat.st_size;
+
+    // mmap the file instead of reading it into memory. This is near instant (reading a 128M file
+    // took ~140ms) and every process that maps the same table shares the pages in the page cache.
+    LOG("%s mmap begin\n", filename);
+    buffer = mmap(NULL, *bufsize, PROT_READ, MAP_SHARED, fd, 0);
+    LOG("%s mmap end\n", filename);
+    close(fd);
 
-    // Go to the end of the file
-    if (fseek(fh, 0L, SEEK_END) == 0) {
-        // Get the size of the file
-        bufsize = ftell(fh);
-        // LOG("%s bufsize is %lu\n", filename, bufsize);
+    if (buffer == MAP_FAILED) {
+        ida_printf("ERROR: could not mmap %s\n", filename);
+        ida_exit(1);
+    }
+
+    return buffer;
+}
 
-        if (bufsize == -1) {
-            printf("ERROR: no bufsize for %s\n", filename);
-            exit(1);
+// --server mode keeps every table it has read resident so that each table is only loaded once per process
+#define MAX_LOADED_FILES 64
+
+struct loaded_file {
+    char *filename;
+    char *buffer;
+    unsigned long size;
+};
+
+struct loaded_file loaded_files[MAX_LOADED_FILES];
+unsigned int loaded_file_count = 0;
+
+char *read_file_cached(char *filename) {
+    unsigned long bufsize = 0;
+
+    for (unsigned int i = 0; i < loaded_file_count; i++) {
+        if (strmatch(loaded_files[i].filename, filename)) {
+            return loaded_files[i].buffer;
         }
+    }
+
+    char *buffer = read_file(filename, &bufsize);
+
+    if (loaded_file_count < MAX_LOADED_FILES) {
+        loaded_files[loaded_file_count].filename = strdup(filename);
+        loaded_files[loaded_file_count].buffer = buffer;
+        loaded_files[loaded_file_count].size = bufsize;
+        loaded_file_count++;
+    }
 
-        // Allocate our buffer to that size
-        buffer = malloc(sizeof(char) * (bufsize + 1));
+    return buffer;
+}
+
+// --madvise random is a good fit for the IDA search which jumps all over the tables,
+// --madvise willneed asks the kernel to start reading the whole table in the background.
+void advise_file(unsigned char *buffer, int advice) {
+    if (!buffer) {
+        return;
+    }
 
-        // Go back to the start of the file
-        if (fseek(fh, 0L, SEEK_SET) != 0) {
-            printf("ERROR: could not seek to start of %s\n", filename);
-            exit(1);
+    for (unsigned int i = 0; i < loaded_file_count; i++) {
+        if (loaded_files[i].buffer == (char *)buffer) {
+            if (madvise(loaded_files[i].buffer, loaded_files[i].size, advice) != 0) {
+                LOG("madvise failed for %s\n", loaded_files[i].filename);
+            }
+            return;
         }
+    }
+}
 
-        // Read the entire file into memory. A 128M file take ~140ms to load.
-        LOG("%s fread begin\n", filename);
-        size_t new_len = fread(buffer, sizeof(char), bufsize, fh);
-        LOG("%s fread end\n", filename);
+void reset_globals() {
+    ida_count = 0;
+    ida_count_total = 0;
+    array_size = 0;
+    legal_move_count = 0;
+    threshold = 0;
+    pt0 = NULL;
+    pt1 = NULL;
+    pt2 = NULL;
+    pt3 = NULL;
+    pt4 = NULL;
+    pt_perfect_hash01 = NULL;
+    pt_perfect_hash02 = NULL;
+    pt_perfect_hash12 = NULL;
+    pt_perfect_hash34 = NULL;
+    pt1_state_max = 0;
+    pt2_state_max = 0;
+    pt4_state_max = 0;
+    call_pt_simple = 0;
+    pt_max = -1;
+    ROW_LENGTH = 0;
+    orbit0_wide_quarter_turns = 0;
+    orbit1_wide_quarter_turns = 0;
+    solution_count = 0;
+    min_solution_count = 1;
+    cost_to_goal_multiplier = 0.0;
+    pt_states_rows = NULL;
+    pt_states_row_count = 0;
+    record_solutions = 0;
+    found_solution_count = 0;
+    root_split_index = 0;
+    root_split_count = 0;
+    root_split_depth = 1;
+
+    shared_find_extra = 0;
+    solution_batch = 0;
+    output_format_jsonl = 0;
+    max_nodes = 0;
+    timeout_ms = 0;
+    budget_node_count = 0;
+    budget_check_count = 0;
+    budget_exhausted = 0;
+    memset(threshold_stats, 0, sizeof(threshold_stats));
+
+    if (shared_bound) {
+        munmap(shared_bound, sizeof(struct shared_bound));
+        shared_bound = NULL;
+    }
+}
 
-        if (ferror(fh) != 0) {
-            printf("ERROR: could not read %s\n", filename);
-            exit(1);
-        } else {
-            buffer[new_len++] = '\0';  // Just to be safe.
+struct pt_states_row_cost {
+    unsigned int line_index;
+    unsigned char cost_to_goal;
+};
+
+// Allocated by ida_main() for a single search. They are globals so ida_lib_solve() can free them when
+// the search fails part way through and ida_exit() returns there instead of exiting.
+char *search_cube = NULL;
+struct pt_states_row_cost *pt_states_row_costs = NULL;
+unsigned char pt_states_rows_owned = 0;  // pt_states_rows was read from --prune-table-states
+
+void free_search_allocations() {
+    if (search_cube) {
+        free(search_cube);
+        search_cube = NULL;
+    }
+
+    if (pt_states_row_costs) {
+        free(pt_states_row_costs);
+        pt_states_row_costs = NULL;
+    }
+
+    if (pt_states_rows_owned) {
+        free(pt_states_rows);
+        pt_states_rows = NULL;
+        pt_states_row_count = 0;
+        pt_states_rows_owned = 0;
+    }
+}
+
+int pt_states_row_cost_compare(const void *a, const void *b) {
+    const struct pt_states_row_cost *row_a = a;
+    const struct pt_states_row_cost *row_b = b;
+
+    if (row_a->cost_to_goal != row_b->cost_to_goal) {
+        return row_a->cost_to_goal - row_b->cost_to_goal;
+    }
+
+    // keep rows with the same heuristic in their original order
+    return (row_a->line_index > row_b->line_index) - (row_a->line_index < row_b->line_index);
+}
+
+void read_pt_states_file(char *filename) {
+    FILE *fh_read = NULL;
+    char *line = NULL;
+    size_t len = 0;
+    unsigned int row_size = 0;
+
+    if (access(filename, F_OK) != 0) {
+        ida_printf("ERROR: file %s not found\n", filename);
+        ida_exit(1);
+    }
+
+    fh_read = fopen(filename, "r");
+    pt_states_row_count = 0;
+    pt_states_rows_owned = 1;
+
+    while (getline(&line, &len, fh_read) != -1) {
+        unsigned char token_index = 0;
+        char *pt = strtok(line, ",");
+
+        if (pt_states_row_count == row_size) {
+            row_size = row_size ? row_size * 2 : 1024;
+            pt_states_rows = realloc(pt_states_rows, sizeof(unsigned int) * PT_STATES_WIDTH * row_size);
+        }
+        memset(&pt_states_rows[pt_states_row_count * PT_STATES_WIDTH], 0, sizeof(unsigned int) * PT_STATES_WIDTH);
+
+        while (pt != NULL && token_index < PT_STATES_WIDTH) {
+            pt_states_rows[(pt_states_row_count * PT_STATES_WIDTH) + token_index] = atoi(pt);
+            pt = strtok(NULL, ",");
+            token_index++;
         }
-        // LOG("%s is %dM\n", filename, bufsize / (1024 * 1024));
+
+        pt_states_row_count++;
     }
 
-    fclose(fh);
-    return buffer;
+    fclose(fh_read);
+
+    if (line) {
+        free(line);
+    }
 }
 
-int main(int argc, char *argv[]) {
+int ida_main(int argc, char *argv[]) {
+    // --format is needed before we LOG anything
+    for (unsigned char i = 1; i < argc - 1; i++) {
+        if (strmatch(argv[i], "--format") && strmatch(argv[i + 1], "jsonl")) {
+            output_format_jsonl = 1;
+        }
+    }
+
     LOG("main() begin\n");
+    gettimeofday(&budget_start, NULL);
     unsigned long prune_table_0_state = 0;
     unsigned long prune_table_1_state = 0;
     unsigned long prune_table_2_state = 0;
@@ -1485,9 +1958,11 @@ int main(int argc, char *argv[]) {
     unsigned char min_ida_threshold = 0;
     unsigned char max_ida_threshold = 30;
     unsigned char centers_only = 0;
-    unsigned char use_uthash = 0;
+    unsigned long long transposition_table_mb = 0;
     unsigned char find_extra = 0;
+    unsigned char solution_count_set = 0;
     char *prune_table_states_filename = NULL;
+    int mmap_advice = -1;
     lookup_table_type type = NONE;
     unsigned int cube_size_type = 0;
     unsigned int cube_size_kociemba = 0;
@@ -1543,13 +2018,15 @@ int main(int argc, char *argv[]) {
                 cube_size_type = 7;
 
             } else {
-                printf("ERROR: %s is an invalid --type\n", argv[i]);
-                exit(1);
+                ida_printf("ERROR: %s is an invalid --type\n", argv[i]);
+                ida_exit(1);
             }
 
         } else if (strmatch(argv[i], "--prune-table-0-filename")) {
             i++;
-            pt0 = read_file(argv[i]);
+            if (!pt0) {
+                pt0 = read_file_cached(argv[i]);
+            }
             pt_max = 0;
 
         } else if (strmatch(argv[i], "--prune-table-0-state")) {
@@ -1559,7 +2036,9 @@ int main(int argc, char *argv[]) {
 
         } else if (strmatch(argv[i], "--prune-table-1-filename")) {
             i++;
-            pt1 = read_file(argv[i]);
+            if (!pt1) {
+                pt1 = read_file_cached(argv[i]);
+            }
             pt_max = 1;
 
         } else if (strmatch(argv[i], "--prune-table-1-state")) {
@@ -1569,7 +2048,9 @@ int main(int argc, char *argv[]) {
 
         } else if (strmatch(argv[i], "--prune-table-2-filename")) {
             i++;
-            pt2 = read_file(argv[i]);
+            if (!pt2) {
+                pt2 = read_file_cached(argv[i]);
+            }
             pt_max = 2;
 
         } else if (strmatch(argv[i], "--prune-table-2-state")) {
@@ -1579,7 +2060,9 @@ int main(int argc, char *argv[]) {
 
         } else if (strmatch(argv[i], "--prune-table-3-filename")) {
             i++;
-            pt3 = read_file(argv[i]);
+            if (!pt3) {
+                pt3 = read_file_cached(argv[i]);
+            }
             pt_max = 3;
 
         } else if (strmatch(argv[i], "--prune-table-3-state")) {
@@ -1589,7 +2072,9 @@ int main(int argc, char *argv[]) {
 
         } else if (strmatch(argv[i], "--prune-table-4-filename")) {
             i++;
-            pt4 = read_file(argv[i]);
+            if (!pt4) {
+                pt4 = read_file_cached(argv[i]);
+            }
             pt_max = 4;
 
         } else if (strmatch(argv[i], "--prune-table-4-state")) {
@@ -1599,19 +2084,19 @@ int main(int argc, char *argv[]) {
 
         } else if (strmatch(argv[i], "--prune-table-perfect-hash01")) {
             i++;
-            pt_perfect_hash01 = read_file(argv[i]);
+            pt_perfect_hash01 = read_file_cached(argv[i]);
 
         } else if (strmatch(argv[i], "--prune-table-perfect-hash02")) {
             i++;
-            pt_perfect_hash02 = read_file(argv[i]);
+            pt_perfect_hash02 = read_file_cached(argv[i]);
 
         } else if (strmatch(argv[i], "--prune-table-perfect-hash12")) {
             i++;
-            pt_perfect_hash12 = read_file(argv[i]);
+            pt_perfect_hash12 = read_file_cached(argv[i]);
 
         } else if (strmatch(argv[i], "--prune-table-perfect-hash34")) {
             i++;
-            pt_perfect_hash34 = read_file(argv[i]);
+            pt_perfect_hash34 = read_file_cached(argv[i]);
 
         } else if (strmatch(argv[i], "--pt1-state-max")) {
             i++;
@@ -1629,6 +2114,18 @@ int main(int argc, char *argv[]) {
             i++;
             prune_table_states_filename = argv[i];
 
+        } else if (strmatch(argv[i], "--madvise")) {
+            i++;
+
+            if (strmatch(argv[i], "random")) {
+                mmap_advice = MADV_RANDOM;
+            } else if (strmatch(argv[i], "willneed")) {
+                mmap_advice = MADV_WILLNEED;
+            } else {
+                ida_printf("ERROR: --madvise %s is not supported, use random or willneed\n", argv[i]);
+                ida_exit(1);
+            }
+
         } else if (strmatch(argv[i], "--multiplier")) {
             i++;
             cost_to_goal_multiplier = atof(argv[i]);
@@ -1636,6 +2133,22 @@ int main(int argc, char *argv[]) {
         } else if (strmatch(argv[i], "--solution-count")) {
             i++;
             min_solution_count = atoi(argv[i]);
+            solution_count_set = 1;
+
+        } else if (strmatch(argv[i], "--solution-batch")) {
+            i++;
+            solution_batch = atoi(argv[i]);
+
+            if (!solution_batch) {
+                ida_printf("ERROR: --solution-batch must be at least 1\n");
+                ida_exit(1);
+            }
+
+            // the library captures the output and has no stdin to read "more" from
+            if (record_solutions) {
+                ida_printf("ERROR: --solution-batch is not supported by ida_search_via_graph.so\n");
+                ida_exit(1);
+            }
 
         } else if (strmatch(argv[i], "--min-ida-threshold")) {
             i++;
@@ -1648,11 +2161,51 @@ int main(int argc, char *argv[]) {
         } else if (strmatch(argv[i], "--centers-only")) {
             centers_only = 1;
 
-            // } else if (strmatch(argv[i], "--uthash")) {
-            //     use_uthash = 1;
+        } else if (strmatch(argv[i], "--transposition-table-mb")) {
+            i++;
+            transposition_table_mb = strtoull(argv[i], NULL, 10);
+
+        } else if (strmatch(argv[i], "--max-nodes")) {
+            i++;
+            max_nodes = strtoull(argv[i], NULL, 10);
+
+        } else if (strmatch(argv[i], "--timeout-ms")) {
+            i++;
+            timeout_ms = strtoull(argv[i], NULL, 10);
+
+        } else if (strmatch(argv[i], "--format")) {
+            i++;
+
+            if (!strmatch(argv[i], "text") && !strmatch(argv[i], "jsonl")) {
+                ida_printf("ERROR: --format %s is not supported, use text or jsonl\n", argv[i]);
+                ida_exit(1);
+            }
 
         } else if (strmatch(argv[i], "--find-extra")) {
             find_extra = 1;
+            shared_find_extra = 1;
+
+        } else if (strmatch(argv[i], "--root-split")) {
+            i++;
+
+            if (sscanf(argv[i], "%u/%u", &root_split_index, &root_split_count) != 2 || !root_split_count ||
+                root_split_index >= root_split_count) {
+                ida_printf("ERROR: --root-split %s must be INDEX/COUNT with INDEX < COUNT\n", argv[i]);
+                ida_exit(1);
+            }
+
+        } else if (strmatch(argv[i], "--root-split-depth")) {
+            i++;
+            root_split_depth = atoi(argv[i]);
+
+            if (!root_split_depth) {
+                ida_printf("ERROR: --root-split-depth must be at least 1\n");
+                ida_exit(1);
+            }
+
+        } else if (strmatch(argv[i], "--shared-bound")) {
+            i++;
+            shared_bound = map_shared_bound(argv[i]);
 
         } else if (strmatch(argv[i], "--orbit0-need-odd-w")) {
             orbit0_wide_quarter_turns = 1;
@@ -1919,15 +2472,36 @@ int main(int argc, char *argv[]) {
             }
 
         } else if (strmatch(argv[i], "-h") || strmatch(argv[i], "--help")) {
-            printf("\nida_search --kociemba KOCIEMBA_STRING --type 5x5x5-UD-centers-stage\n\n");
-            exit(0);
+            ida_printf("\nida_search --kociemba KOCIEMBA_STRING --type 5x5x5-UD-centers-stage\n\n");
+            ida_printf("--transposition-table-mb MB\n");
+            ida_printf("    skip nodes already reached at the current IDA threshold. Do not combine with\n");
+            ida_printf("    --find-extra or a --solution-count above 1, a node reached again via another path is\n");
+            ida_printf("    pruned so the solutions that pass through the same state as one already found are\n");
+            ida_printf("    never reported.\n\n");
+            ida_exit(0);
 
         } else {
-            printf("ERROR: %s is an invalid arg\n\n", argv[i]);
-            exit(1);
+            ida_printf("ERROR: %s is an invalid arg\n\n", argv[i]);
+            ida_exit(1);
         }
     }
 
+    if (solution_batch && !solution_count_set) {
+        min_solution_count = UINT_MAX;
+    }
+
+    if (mmap_advice != -1) {
+        advise_file(pt0, mmap_advice);
+        advise_file(pt1, mmap_advice);
+        advise_file(pt2, mmap_advice);
+        advise_file(pt3, mmap_advice);
+        advise_file(pt4, mmap_advice);
+        advise_file(pt_perfect_hash01, mmap_advice);
+        advise_file(pt_perfect_hash02, mmap_advice);
+        advise_file(pt_perfect_hash12, mmap_advice);
+        advise_file(pt_perfect_hash34, mmap_advice);
+    }
+
     if (type != NONE || pt_perfect_hash01 || pt_perfect_hash02 || pt_perfect_hash12 || pt_perfect_hash34 || cost_to_goal_multiplier) {
         call_pt_simple = 1;
     }
@@ -1966,82 +2540,112 @@ int main(int argc, char *argv[]) {
         move_matrix[i_move][j] = legal_moves[j];
     }
 
+    // MOVE_NONE is class 0, every other legal move shares the class of the first move with the same row
+    memset(move_matrix_class, 0, sizeof(move_matrix_class));
+    unsigned char move_matrix_class_count = 1;
+
+    for (unsigned char i = 0; i < legal_move_count; i++) {
+        i_move = legal_moves[i];
+        move_matrix_class[i_move] = move_matrix_class_count;
+
+        for (unsigned char j = 0; j < i; j++) {
+            if (memcmp(move_matrix[i_move], move_matrix[legal_moves[j]], sizeof(move_type) * legal_move_count) == 0) {
+                move_matrix_class[i_move] = move_matrix_class[legal_moves[j]];
+                break;
+            }
+        }
+
+        if (move_matrix_class[i_move] == move_matrix_class_count) {
+            move_matrix_class_count++;
+        }
+    }
+
     if (cube_size_kociemba) {
         if (!type) {
-            printf("ERROR: --type is required\n");
-            exit(1);
+            ida_printf("ERROR: --type is required\n");
+            ida_exit(1);
         }
 
         if (cube_size_type != cube_size_kociemba) {
-            printf("ERROR: --type cube size is %d, --kociemba cube size is %d\n", cube_size_type, cube_size_kociemba);
-            exit(1);
+            ida_printf("ERROR: --type cube size is %d, --kociemba cube size is %d\n", cube_size_type,
+                       cube_size_kociemba);
+            ida_exit(1);
         }
 
         cube_size = cube_size_kociemba;
         array_size = (cube_size * cube_size * 6) + 2;
         cube = malloc(sizeof(char) * array_size);
+        search_cube = cube;
 
         if (orbit1_wide_quarter_turns && cube_size != 6 && cube_size != 7) {
-            printf("ERROR cannot do avoid_oll on orbit1 for %dx%dx%d cubes\n", cube_size, cube_size, cube_size);
-            exit(1);
+            ida_printf("ERROR cannot do avoid_oll on orbit1 for %dx%dx%d cubes\n", cube_size, cube_size, cube_size);
+            ida_exit(1);
         }
 
         init_cube(cube, cube_size, type, kociemba);
     }
 
     ROW_LENGTH = COST_LENGTH + ((STATE_LENGTH + COST_LENGTH) * legal_move_count);
+    tt_init(&transposition_table, transposition_table_mb * 1024 * 1024, cube_size ? array_size : 0);
 
     if (prune_table_states_filename) {
-        FILE *fh_read = NULL;
-        char *line = NULL;
-        size_t len = 0;
-        ssize_t read = 0;
-        unsigned int line_index = 0;
+        read_pt_states_file(prune_table_states_filename);
+    }
+
+    if (pt_states_rows) {
         struct ida_search_result min_search_result;
         min_search_result.found_solution = 0;
         min_search_result.f_cost = 99;
         struct timeval pt_states_start, pt_states_stop;
         unsigned int pt_states_ida_count_total = 0;
+        unsigned int *row = NULL;
+        struct pt_states_row_cost *row_costs = NULL;
+        struct cost_to_goal_result ctg;
 
-        if (access(prune_table_states_filename, F_OK) != 0) {
-            printf("ERROR: file %s not found\n", prune_table_states_filename);
-            exit(1);
+        gettimeofday(&pt_states_start, NULL);
+
+        // Compute the heuristic for each row once and sort the rows by it. Each threshold pass then
+        // visits the most promising rows first and stops at the first row whose heuristic exceeds
+        // the threshold, all of the rows after it exceed it too. Skipping rows (and thresholds below
+        // the best row's heuristic) is only safe if the heuristic is admissible, --multiplier inflates
+        // it so every row is searched at every threshold.
+        unsigned char skip_rows = !cost_to_goal_multiplier;
+        row_costs = malloc(sizeof(struct pt_states_row_cost) * pt_states_row_count);
+        pt_states_row_costs = row_costs;
+
+        for (unsigned int line_index = 0; line_index < pt_states_row_count; line_index++) {
+            row = &pt_states_rows[line_index * PT_STATES_WIDTH];
+            ctg = pt_states_to_cost(cube, type, row[0], row[1], row[2], row[3], row[4]);
+            row_costs[line_index].line_index = line_index;
+            row_costs[line_index].cost_to_goal = ctg.cost_to_goal;
         }
 
-        gettimeofday(&pt_states_start, NULL);
+        qsort(row_costs, pt_states_row_count, sizeof(struct pt_states_row_cost), pt_states_row_cost_compare);
+
+        if (skip_rows && pt_states_row_count && row_costs[0].cost_to_goal > min_ida_threshold) {
+            min_ida_threshold = row_costs[0].cost_to_goal;
+        }
 
         for (unsigned char i_ida_threshold = min_ida_threshold; i_ida_threshold <= max_ida_threshold;
              i_ida_threshold++) {
             LOG("loop %d/%d\n", i_ida_threshold, max_ida_threshold);
 
-            fh_read = fopen(prune_table_states_filename, "r");
-            while ((read = getline(&line, &len, fh_read)) != -1) {
-                // printf("%s", line);
-                unsigned char token_index = 0;
-                char *pt;
-                pt = strtok(line, ",");
-
-                while (pt != NULL) {
-                    unsigned int token_value = atoi(pt);
-                    pt = strtok(NULL, ",");
-
-                    if (token_index == 0) {
-                        prune_table_0_state = token_value;
-                    } else if (token_index == 1) {
-                        prune_table_1_state = token_value;
-                    } else if (token_index == 2) {
-                        prune_table_2_state = token_value;
-                    } else if (token_index == 3) {
-                        prune_table_3_state = token_value;
-                    } else if (token_index == 4) {
-                        prune_table_4_state = token_value;
-                    }
-                    token_index++;
+            for (unsigned int i = 0; i < pt_states_row_count; i++) {
+                if ((skip_rows && row_costs[i].cost_to_goal > i_ida_threshold) || search_cancelled(i_ida_threshold) ||
+                    budget_exhausted) {
+                    break;
                 }
 
+                row = &pt_states_rows[row_costs[i].line_index * PT_STATES_WIDTH];
+                prune_table_0_state = row[0];
+                prune_table_1_state = row[1];
+                prune_table_2_state = row[2];
+                prune_table_3_state = row[3];
+                prune_table_4_state = row[4];
+
                 search_result = ida_solve(cube, cube_size, type, prune_table_0_state, prune_table_1_state,
                                           prune_table_2_state, prune_table_3_state, prune_table_4_state,
-                                          i_ida_threshold, i_ida_threshold, use_uthash, find_extra);
+                                          i_ida_threshold, i_ida_threshold, find_extra);
                 pt_states_ida_count_total += ida_count;
 
                 if (search_result.found_solution) {
@@ -2057,14 +2661,13 @@ int main(int argc, char *argv[]) {
                         break;
                     }
                 }
-
-                line_index++;
             }
-            fclose(fh_read);
 
             search_result = min_search_result;
 
-            if (search_result.found_solution) {
+            if (budget_exhausted) {
+                break;
+            } else if (search_result.found_solution) {
                 if (find_extra) {
                     if (solution_count >= min_solution_count) {
                         break;
@@ -2072,6 +2675,9 @@ int main(int argc, char *argv[]) {
                 } else {
                     break;
                 }
+            } else if (search_cancelled(i_ida_threshold)) {
+                LOG("IDA cancelled at threshold %d, another worker found a solution\n", i_ida_threshold);
+                break;
             }
         }
 
@@ -2082,10 +2688,6 @@ int main(int argc, char *argv[]) {
         LOG("all pt-states explored %'llu total nodes, took %.3fs, %'llu nodes-per-sec\n\n", pt_states_ida_count_total,
             us / 1000000, nodes_per_sec);
 
-        if (line) {
-            free(line);
-        }
-
     } else {
         if (!search_result.found_solution) {
             if (!min_ida_threshold) {
@@ -2097,15 +2699,169 @@ int main(int argc, char *argv[]) {
 
             search_result = ida_solve(cube, cube_size, type, prune_table_0_state, prune_table_1_state, prune_table_2_state,
                                       prune_table_3_state, prune_table_4_state, min_ida_threshold, max_ida_threshold,
-                                      use_uthash, find_extra);
+                                      find_extra);
         }
     }
 
     if (search_result.found_solution) {
-        print_ida_summary(cube, type, prune_table_0_state, prune_table_1_state, prune_table_2_state,
-                          prune_table_3_state, prune_table_4_state, search_result.solution, search_result.f_cost);
-    } else {
-        exit(1);
+        if (output_format_jsonl) {
+            // capture the summary table and print it as a "summary" record
+            struct ida_output *real_output = ida_output;
+            struct ida_output summary = {NULL, 0, 0, 0};
+
+            ida_output = &summary;
+            output_format_jsonl = 0;
+            print_ida_summary(cube, type, prune_table_0_state, prune_table_1_state, prune_table_2_state,
+                              prune_table_3_state, prune_table_4_state, search_result.solution, search_result.f_cost);
+            output_format_jsonl = 1;
+            ida_output = real_output;
+
+            ida_printf("{\"type\": \"summary\", \"text\": ");
+            print_json_string(summary.buffer ? summary.buffer : "");
+            ida_printf("}\n");
+            free(summary.buffer);
+        } else {
+            print_ida_summary(cube, type, prune_table_0_state, prune_table_1_state, prune_table_2_state,
+                              prune_table_3_state, prune_table_4_state, search_result.solution, search_result.f_cost);
+        }
     }
+
+    if (output_format_jsonl) {
+        print_stats_jsonl(search_result.found_solution);
+    }
+
+    free_search_allocations();
+
+    if (!search_result.found_solution) {
+        return budget_exhausted ? EXIT_BUDGET_EXHAUSTED : 1;
+    }
+
     LOG("main() end\n");
+    return 0;
+}
+
+// Each request is one line on stdin, the args are the same as the command line args but are tab separated.
+// The output for a request is terminated by a "END-OF-SEARCH <exit code>" line. A --solution-batch request
+// also prints a "END-OF-BATCH <solution count>" line after each batch and reads "more" or "stop" from stdin.
+#define MAX_SERVER_ARGS 128
+
+int ida_server() {
+    char *line = NULL;
+    size_t len = 0;
+    ssize_t read = 0;
+    char *server_argv[MAX_SERVER_ARGS];
+    int server_argc = 0;
+    int rc = 0;
+
+    while ((read = getline(&line, &len, stdin)) != -1) {
+        if (read && line[read - 1] == '\n') {
+            line[--read] = '\0';
+        }
+
+        if (!read) {
+            continue;
+        }
+
+        // split on tabs by hand, ida_main() uses strtok() when parsing --legal-moves
+        server_argc = 0;
+        server_argv[server_argc++] = "ida_search_via_graph";
+        server_argv[server_argc++] = line;
+
+        for (ssize_t j = 0; j < read; j++) {
+            if (line[j] == '\t') {
+                line[j] = '\0';
+
+                if (server_argc >= MAX_SERVER_ARGS) {
+                    ida_printf("ERROR: more than %d args\n", MAX_SERVER_ARGS);
+                    ida_exit(1);
+                }
+                server_argv[server_argc++] = &line[j + 1];
+            }
+        }
+
+        reset_globals();
+        rc = ida_main(server_argc, server_argv);
+        ida_printf("END-OF-SEARCH %d\n", rc);
+        fflush(stdout);
+    }
+
+    if (line) {
+        free(line);
+    }
+
+    return 0;
+}
+
+// Entry point for the python binding (ida_search_via_graph.so), see IDASearchLibrary in LookupTableIDAViaGraph.py
+//
+// - argv is the same as the command line args, --prune-table-N-filename is ignored for any table in prune_tables
+// - prune_tables is PT_STATES_WIDTH buffers holding the contents of each prune table .bin, NULL if not used
+// - pt_states is pt_states_count rows of PT_STATES_WIDTH states for a multi-start search, NULL if not used
+// - solutions/solutions_count are set to the solutions found, they are valid until the next call
+// - output is set to everything the search printed, the caller must free it via ida_lib_free(). It is NULL
+//   if the search printed nothing or the output could not be buffered, the search result is unaffected.
+// - returns the exit code ida_main() would have exited with, a failed search does not exit the process
+int ida_lib_solve(int argc, char *argv[], unsigned char **prune_tables, unsigned int *pt_states,
+                  unsigned int pt_states_count, struct ida_lib_solution **solutions, unsigned int *solutions_count,
+                  char **output) {
+    struct ida_output lib_output = {NULL, 0, 0, 0};
+    jmp_buf exit_jmp;
+    int rc = 0;
+
+    reset_globals();
+    record_solutions = 1;
+
+    for (unsigned char i = 0; i < PT_STATES_WIDTH; i++) {
+        if (prune_tables[i]) {
+            pt_max = i;
+        }
+    }
+
+    pt0 = prune_tables[0];
+    pt1 = prune_tables[1];
+    pt2 = prune_tables[2];
+    pt3 = prune_tables[3];
+    pt4 = prune_tables[4];
+
+    if (pt_states_count) {
+        pt_states_rows = pt_states;
+        pt_states_row_count = pt_states_count;
+    }
+
+    // capture everything we print so the caller can log it
+    ida_output = &lib_output;
+
+    // the error paths call ida_exit() which returns here with the exit code instead of exiting
+    if (setjmp(exit_jmp)) {
+        rc = ida_exit_rc;
+        free_search_allocations();
+    } else {
+        ida_exit_jmp = &exit_jmp;
+        rc = ida_main(argc, argv);
+    }
+
+    ida_exit_jmp = NULL;
+    ida_output = NULL;
+
+    if (lib_output.failed) {
+        free(lib_output.buffer);
+        lib_output.buffer = NULL;
+    }
+
+    *output = lib_output.buffer;
+
+    *solutions = found_solutions;
+    *solutions_count = found_solution_count;
+    reset_globals();
+    return rc;
+}
+
+void ida_lib_free(void *ptr) { free(ptr); }
+
+int main(int argc, char *argv[]) {
+    if (argc == 2 && strmatch(argv[1], "--server")) {
+        return ida_server();
+    }
+
+    return ida_main(argc, argv);
 }
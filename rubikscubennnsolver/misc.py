@@ -1,6 +1,7 @@
 # standard libraries
+import functools
 import logging
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -9,6 +10,32 @@ class SolveError(Exception):
     pass
 
 
+def releases_checkpoints(method: Callable) -> Callable:
+    """
+    Decorator for a method that takes checkpoints of a cube via ``checkpoint()``, the checkpoints it
+    took are released when it returns or raises. For a LookupTable method the checkpoints are those
+    of its parent cube.
+
+    Args:
+        method: a RubiksCube or LookupTable method
+
+    Returns:
+        the wrapped method
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cube = getattr(self, "parent", self)
+        depth = len(cube.checkpoints)
+
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            del cube.checkpoints[depth:]
+
+    return wrapper
+
+
 def find_index_for_value(list_foo: List[Any], target: Any, min_index: int) -> int:
     """
     Args:
@@ -1396,8 +1396,8 @@ void rotate_666(char *cube, char *cube_tmp, int array_size, move_type move) {
             break;
 
         default:
-            printf("ERROR: invalid move %d\n", move);
-            exit(1);
+            ida_printf("ERROR: invalid move %d\n", move);
+            ida_exit(1);
     }
 }
 
@@ -3441,7 +3441,7 @@ void rotate_777(char *cube, char *cube_tmp, int array_size, move_type move) {
             break;
 
         default:
-            printf("ERROR: invalid move %d\n", move);
-            exit(1);
+            ida_printf("ERROR: invalid move %d\n", move);
+            ida_exit(1);
     }
 }
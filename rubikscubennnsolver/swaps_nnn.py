@@ -0,0 +1,162 @@
+"""
+swaps.py only has the swaps for 2x2x2 through 7x7x7, it is built by utils/rotate-printer.py.  For
+bigger cubes we build the swaps the first time they are needed by running each move through
+RubiksCube.rotate_guts() and save them to lookup-tables/swaps-NxNxN.bin so we only do this once.
+
+The .bin file is a line with the space separated moves followed by one row per move, each row is
+the permutation for that move as little endian unsigned shorts.  That is enough for cubes up to
+104x104x104, we do not save the swaps for anything bigger.
+"""
+
+# standard libraries
+import array
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# rubiks cube libraries
+from rubikscubennnsolver import RubiksCube
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_TABLES = "lookup-tables/"
+
+# size to the swaps for each move of a cube that size
+swaps_nnn = {}
+
+
+def get_moves_nnn(size: int) -> List[str]:
+    """
+    Args:
+        size: the size of the cube
+
+    Returns:
+        the moves of a ``size`` cube, these match the keys of the swaps_NNN tables in swaps.py
+    """
+    if size % 2 == 0:
+        max_rows = int(size / 2)
+    else:
+        max_rows = int((size - 1) / 2)
+
+    moves = []
+
+    for side in ("U", "L", "F", "R", "B", "D"):
+        steps = [side]
+
+        if size >= 4:
+            steps.append(f"{side}w")
+            steps.append(f"2{side}")
+
+        for rows in range(3, max_rows + 1):
+            steps.append(f"{rows}{side}w")
+
+        # 5x5x5 only has the middle layer slices for U, L and F, 3D is the same as 3U'
+        if size >= 6 or (size == 5 and side in ("U", "L", "F")):
+            steps.append(f"3{side}")
+
+        for step in steps:
+            moves.extend((step, f"{step}'", f"{step}2"))
+
+    for rotation in ("x", "y", "z"):
+        moves.extend((rotation, f"{rotation}'", f"{rotation}2"))
+
+    return moves
+
+
+def build_swaps_nnn(size: int) -> Dict[str, Tuple[int]]:
+    """
+    Args:
+        size: the size of the cube
+
+    Returns:
+        the swaps for each move of a ``size`` cube
+    """
+    cube = RubiksCube("".join(side * size * size for side in "ULFRBD"), "ULFRBD")
+    return {move: cube.build_rotate_permutation(move) for move in get_moves_nnn(size)}
+
+
+def load_swaps_nnn(filename: str, moves: List[str]) -> Dict[str, Tuple[int]]:
+    """
+    Args:
+        filename: the .bin file to load
+        moves: the moves we expect to find in ``filename``
+
+    Returns:
+        the swaps for each move in ``filename`` or None if ``filename`` is not for ``moves``
+    """
+    with open(filename, "rb") as fh:
+        if fh.readline().decode().split() != moves:
+            return None
+
+        rows = array.array("H")
+        rows.frombytes(fh.read())
+
+    if sys.byteorder != "little":
+        rows.byteswap()
+
+    if len(rows) % len(moves):
+        return None
+
+    row_length = int(len(rows) / len(moves))
+    return {move: tuple(rows[index * row_length : (index + 1) * row_length]) for index, move in enumerate(moves)}
+
+
+def save_swaps_nnn(filename: str, swaps: Dict[str, Tuple[int]]) -> None:
+    """
+    Args:
+        filename: the .bin file to write
+        swaps: the swaps for each move
+    """
+    rows = array.array("H")
+
+    for swap in swaps.values():
+        rows.extend(swap)
+
+    if sys.byteorder != "little":
+        rows.byteswap()
+
+    # write to a temp file first so a concurrent solver never reads half a file
+    filename_tmp = f"{filename}.{os.getpid()}"
+
+    with open(filename_tmp, "wb") as fh:
+        fh.write((" ".join(swaps.keys()) + "\n").encode())
+        fh.write(rows.tobytes())
+
+    os.replace(filename_tmp, filename)
+
+
+def get_swaps_nnn(size: int) -> Dict[str, Tuple[int]]:
+    """
+    Args:
+        size: the size of the cube
+
+    Returns:
+        the swaps for each move of a ``size`` cube, applying a move sets square ``i`` to the value of
+        square ``swaps[step][i]``
+    """
+    swaps = swaps_nnn.get(size)
+
+    if swaps is not None:
+        return swaps
+
+    moves = get_moves_nnn(size)
+    filename = f"{LOOKUP_TABLES}swaps-{size}x{size}x{size}.bin"
+
+    if os.path.exists(filename):
+        swaps = load_swaps_nnn(filename, moves)
+
+        if swaps is None:
+            logger.warning(f"{filename} does not match the moves for a {size}x{size}x{size} cube, rebuilding it")
+
+    if swaps is None:
+        logger.info(f"building {filename}")
+        swaps = build_swaps_nnn(size)
+
+        if (size * size * 6) < 65536:
+            Path(LOOKUP_TABLES).mkdir(parents=True, exist_ok=True)
+            save_swaps_nnn(filename, swaps)
+
+    swaps_nnn[size] = swaps
+    return swaps
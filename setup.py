@@ -18,4 +18,5 @@ setup(
     author_email="dwalton76@gmail.com",
     license=license_text,
     packages=["rubikscubennnsolver"],
+    extras_require={"numpy": ["numpy"]},
 )
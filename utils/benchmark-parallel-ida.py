@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+"""
+Measure how the C IDA search scales when it is split across worker processes (see
+set_ida_search_workers() in rubikscubennnsolver/LookupTableIDAViaGraph.py) by solving the
+same cubes from the 10k-666 or 10k-777 corpora with a different number of workers each time.
+"""
+
+# standard libraries
+import argparse
+import datetime as dt
+import json
+import logging
+
+# rubiks cube libraries
+from rubikscubennnsolver import configure_logging
+from rubikscubennnsolver.LookupTableIDAViaGraph import set_ida_search_workers
+from rubikscubennnsolver.RubiksCube666 import RubiksCube666, solved_666
+from rubikscubennnsolver.RubiksCube777 import RubiksCube777, solved_777
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--size", type=str, default="6x6x6", choices=("6x6x6", "7x7x7"))
+parser.add_argument("--count", type=int, default=10, help="number of cubes to solve for each worker count")
+parser.add_argument("--workers", type=str, default="1,2,4", help="comma separated worker counts to benchmark")
+parser.add_argument("--root-split-depth", type=int, default=1)
+args = parser.parse_args()
+
+test_cubes_filename = f"utils/10k-{args.size[0] * 3}-cubes.json"
+
+with open(test_cubes_filename, "r") as fh:
+    kociemba_strings = json.load(fh)[args.size][: args.count]
+
+order = "URFDLB"
+
+if args.size == "6x6x6":
+    cube = RubiksCube666(solved_666, order)
+else:
+    cube = RubiksCube777(solved_777, order)
+
+results = []
+
+for workers in map(int, args.workers.split(",")):
+    set_ida_search_workers(workers, args.root_split_depth)
+    solution_total = 0
+    start_time = dt.datetime.now()
+
+    for index, kociemba_string in enumerate(kociemba_strings):
+        logger.warning(f"{workers} workers: {index + 1}/{len(kociemba_strings)} {args.size} cube: {kociemba_string}")
+        cube.solution = []
+        cube.load_state(kociemba_string, order)
+        cube.solve()
+        assert cube.solved(), f"{kociemba_string} was not solved"
+        solution_total += cube.get_solution_len_minus_rotates(cube.solution)
+
+    elapsed = (dt.datetime.now() - start_time).total_seconds()
+    results.append((workers, elapsed, solution_total / len(kociemba_strings)))
+
+base_elapsed = results[0][1]
+print(f"{args.size}, {len(kociemba_strings)} cubes, root split depth {args.root_split_depth}")
+print("workers  seconds  speedup  avg solution")
+
+for workers, elapsed, avg_solution in results:
+    print(f"{workers:7d}  {elapsed:7.2f}  {base_elapsed / elapsed:6.2f}x  {avg_solution:12.2f}")
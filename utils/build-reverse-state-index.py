@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+"""
+Build the .reverse_state_index file for one or more .state_index files.  LookupTable.reverse_state_index()
+uses it to map a state_index back to its state without scanning the .state_index file.
+"""
+# standard libraries
+import argparse
+import logging
+
+# rubiks cube libraries
+from rubikscubennnsolver import configure_logging
+from rubikscubennnsolver.LookupTable import build_reverse_state_index
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("filenames", nargs="+", help="lookup-tables/*.state_index files")
+args = parser.parse_args()
+
+for filename in args.filenames:
+    assert filename.endswith(".state_index"), f"{filename} is not a .state_index file"
+    filename_reverse_state_index = filename.replace(".state_index", ".reverse_state_index")
+    logger.info(f"{filename_reverse_state_index} begin")
+    build_reverse_state_index(filename, filename_reverse_state_index)
+    logger.info(f"{filename_reverse_state_index} end")
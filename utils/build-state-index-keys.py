@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+"""
+Convert one or more .state_index files to the mmappable .state_index_keys format that
+LookupTable.state_index() and LookupTable.state_index_multiple() search.
+"""
+# standard libraries
+import argparse
+import logging
+
+# rubiks cube libraries
+from rubikscubennnsolver import configure_logging
+from rubikscubennnsolver.LookupTable import build_state_index_keys
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("filenames", nargs="+", help="lookup-tables/*.state_index files")
+args = parser.parse_args()
+
+for filename in args.filenames:
+    assert filename.endswith(".state_index"), f"{filename} is not a .state_index file"
+    filename_state_index_keys = filename.replace(".state_index", ".state_index_keys")
+    logger.info(f"{filename_state_index_keys} begin")
+    build_state_index_keys(filename, filename_state_index_keys)
+    logger.info(f"{filename_state_index_keys} end")
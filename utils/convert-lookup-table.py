@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+"""
+Convert one or more lookup-table .txt files to the .packed format.  LookupTable uses the
+.packed file instead of the .txt file when it exists.
+"""
+# standard libraries
+import argparse
+import logging
+import os
+
+# rubiks cube libraries
+from rubikscubennnsolver import configure_logging
+from rubikscubennnsolver.LookupTable import convert_lookup_table
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("filenames", nargs="+", help="lookup-tables/*.txt files")
+args = parser.parse_args()
+
+for filename in args.filenames:
+    assert filename.endswith(".txt"), f"{filename} is not a .txt file"
+    filename_packed = filename.replace(".txt", ".packed")
+    convert_lookup_table(filename, filename_packed)
+    logger.info(
+        f"{filename} ({os.path.getsize(filename):,} bytes) -> {filename_packed} ({os.path.getsize(filename_packed):,} bytes)"
+    )
@@ -112,7 +112,8 @@ def main(c: bool) -> None:
             first_step = True
 
             for step in steps:
-                cube.rotate(step)
+                # rotate() uses swaps.py so go straight to rotate_guts() via build_rotate_permutation()
+                cube.state = [cube.state[x] for x in cube.build_rotate_permutation(step)]
                 cube.print_case_statement_C(step, first_step, size)
                 cube.state = copy(original_state)
                 first_step = False
@@ -132,7 +133,8 @@ def main(c: bool) -> None:
             rotate_mapper = {}
 
             for step in steps:
-                cube.rotate(step)
+                # rotate() uses swaps.py so go straight to rotate_guts() via build_rotate_permutation()
+                cube.state = [cube.state[x] for x in cube.build_rotate_permutation(step)]
                 rotate_mapper[step] = cube.print_case_statement_python()
                 cube.state = copy(original_state)
 